@@ -0,0 +1,158 @@
+"""Admission control for media sessions and outbound dialing.
+
+Every live call runs its whole pipeline on this process's event loop, so past
+some point one more call makes every call worse. `AdmissionController` keeps
+three signals:
+
+  sessions   active `/ws` media sessions, plus placements that were dialed
+             but haven't connected yet (reserved for `RESERVATION_TTL_SECS`)
+  loop lag   how late a periodic timer fires on the event loop (EWMA + peak)
+  cpu        this process's CPU time per wall second, as a fraction of a core
+
+The dialer (`start_campaign`, `/make-call`) only places new calls while the
+state is `ok`; it holds at `hold` (lag or CPU getting high) and `full`
+(sessions + reservations at MAX_CALLS). Each reservation counts as
+`pending_weight` of a session; dial_pacer sets it to the measured share of
+dials that connect. `/ws` itself only refuses a session
+at the hard ceiling or when the loop is badly lagging (`overloaded`), since
+that callee has already picked up.
+"""
+
+import asyncio
+import os
+import time
+
+from loguru import logger
+
+MAX_CALLS = int(os.getenv("MAX_CALLS", "20"))  # per process
+HOLD_LAG_MS = float(os.getenv("ADMISSION_HOLD_LAG_MS", "40"))
+REJECT_LAG_MS = float(os.getenv("ADMISSION_REJECT_LAG_MS", "200"))
+HOLD_CPU = float(os.getenv("ADMISSION_HOLD_CPU", "0.75"))  # fraction of one core
+RESERVATION_TTL_SECS = 90.0  # Twilio rings for up to ~60s before no-answer
+SAMPLE_SECS = 0.25
+CPU_WINDOW_SECS = 2.0
+HOLD_POLL_SECS = 1.0
+
+
+class AdmissionController:
+    """Tracks load for one server process; see the module docstring."""
+
+    def __init__(self, max_calls: int = MAX_CALLS):
+        self.max_calls = max_calls
+        self.active = 0
+        self.pending_weight = 1.0
+        self._reservations: dict[str, float] = {}  # call_sid → monotonic time placed
+        self._lag_ms = 0.0
+        self._lag_peak_ms = 0.0
+        self._cpu = 0.0
+        self._task: asyncio.Task | None = None
+        self.rejected = 0
+        self.held_secs = 0.0
+
+    # ── Monitor ──
+
+    def start(self):
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._monitor())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _monitor(self):
+        cpu_t, wall_t = time.process_time(), time.monotonic()
+        while True:
+            expected = time.monotonic() + SAMPLE_SECS
+            await asyncio.sleep(SAMPLE_SECS)
+            now = time.monotonic()
+            lag = max(0.0, (now - expected) * 1000)
+            self._lag_ms = 0.8 * self._lag_ms + 0.2 * lag
+            # Peak decays so one slow tick doesn't hold the dialer for long
+            self._lag_peak_ms = max(lag, self._lag_peak_ms * 0.9)
+            if now - wall_t >= CPU_WINDOW_SECS:
+                cpu = time.process_time()
+                self._cpu = (cpu - cpu_t) / (now - wall_t)
+                cpu_t, wall_t = cpu, now
+
+    # ── Reservations ──
+
+    def _pending(self) -> int:
+        cutoff = time.monotonic() - RESERVATION_TTL_SECS
+        for sid in [sid for sid, t in self._reservations.items() if t < cutoff]:
+            del self._reservations[sid]
+        return len(self._reservations)
+
+    def reserve(self, call_sid: str):
+        """A call was just placed; count it until it connects or ends."""
+        self._reservations[call_sid] = time.monotonic()
+
+    def release(self, call_sid: str):
+        self._reservations.pop(call_sid, None)
+
+    # ── Decisions ──
+
+    @property
+    def state(self) -> str:
+        if self._lag_ms >= REJECT_LAG_MS:
+            return "overloaded"
+        if self.active + self._pending() * self.pending_weight >= self.max_calls:
+            return "full"
+        if self._lag_ms >= HOLD_LAG_MS or self._lag_peak_ms >= REJECT_LAG_MS or self._cpu >= HOLD_CPU:
+            return "hold"
+        return "ok"
+
+    def can_place(self) -> bool:
+        """Whether the dialer may place another call now."""
+        return self.state == "ok"
+
+    async def wait_for_headroom(self, label: str = ""):
+        """Hold the dialer until there's room for another call."""
+        if self.can_place():
+            return
+        started = time.monotonic()
+        logger.warning(f"🚦 Holding dialer{f' for {label}' if label else ''}: {self.snapshot()}")
+        while not self.can_place():
+            await asyncio.sleep(HOLD_POLL_SECS)
+        waited = time.monotonic() - started
+        self.held_secs += waited
+        logger.info(f"🚦 Dialer resumed{f' for {label}' if label else ''} after {waited:.0f}s")
+
+    def admit(self) -> str | None:
+        """Claim a media session; returns the rejection reason, or None if admitted."""
+        if self.active >= self.max_calls:
+            reason = f"at ceiling ({self.active}/{self.max_calls} sessions)"
+        elif self._lag_ms >= REJECT_LAG_MS:
+            reason = f"event loop lagging {self._lag_ms:.0f}ms"
+        else:
+            self.active += 1
+            return None
+        self.rejected += 1
+        return reason
+
+    def end_session(self):
+        self.active = max(0, self.active - 1)
+
+    def snapshot(self) -> dict:
+        pending = self._pending()
+        return {
+            "state": self.state,
+            "active_sessions": self.active,
+            "pending_placements": pending,
+            "max_calls": self.max_calls,
+            "available": max(0, int(self.max_calls - self.active - pending * self.pending_weight)),
+            "pending_weight": round(self.pending_weight, 3),
+            "loop_lag_ms": round(self._lag_ms, 1),
+            "loop_lag_peak_ms": round(self._lag_peak_ms, 1),
+            "cpu": round(self._cpu, 3),
+            "rejected_sessions": self.rejected,
+            "dialer_held_secs": round(self.held_secs, 1),
+        }
+
+
+admission = AdmissionController()
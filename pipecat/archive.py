@@ -0,0 +1,252 @@
+"""Retention: move finished calls out of the hot database into monthly archive files.
+
+A call is archived once it's older than `ARCHIVE_AFTER_DAYS`, has a terminal
+status, has been analyzed, and has no booking still in flight. Its
+call_logs row, its contact (if any) and its transcript_fts turns move to
+`calls-YYYY-MM.db` under `db.ARCHIVE_DIR`, by the month it was created. Each
+batch is one transaction across the hot DB and the attached archive, so a
+call is always in exactly one place.
+
+Reads go through db.py's partition helpers (`attach_history`,
+`get_call_log`, `call_log_partitions`, and the spanning `search_transcripts`
+/ `refresh_campaign_counters`), which attach only the months a query can
+reach.
+
+Deleted rows leave free pages that new rows reuse. `--vacuum` returns them
+to the OS.
+
+    python archive.py [--days 90] [--dry-run] [--vacuum]
+"""
+
+import asyncio
+import os
+import re
+import threading
+
+from loguru import logger
+
+from db import (
+    ARCHIVE_DIR,
+    TURN_ROWID_STRIDE,
+    archive_path,
+    archive_schema,
+    get_db,
+)
+from outcomes import TERMINAL_STATUSES
+
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "90"))  # 0 disables archiving
+ARCHIVE_INTERVAL_SECS = 6 * 3600
+BATCH_CALLS = 500
+
+_ELIGIBLE = f"""
+    FROM main.call_logs cl
+    WHERE cl.created_at < datetime('now', ?)
+      AND cl.status IN ({", ".join("?" for _ in TERMINAL_STATUSES)})
+      AND cl.analyzed_at IS NOT NULL
+      AND NOT EXISTS (SELECT 1 FROM main.bookings b
+                      WHERE b.call_sid = cl.call_sid AND b.status IN ('pending', 'submitting'))
+"""
+
+
+def _columns(conn, schema: str, table: str) -> list[tuple[str, str]]:
+    return [(r[1], r[2]) for r in conn.execute(f"PRAGMA {schema}.table_info({table})")]
+
+
+def _create_like_hot(conn, schema: str, table: str):
+    """Create an archive table with the hot table's DDL, so `id` stays the INTEGER PRIMARY KEY."""
+    sql = conn.execute("SELECT sql FROM main.sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()[0]
+    sql = re.sub(rf"^CREATE TABLE (IF NOT EXISTS )?[\"`]?{table}[\"`]?", f"CREATE TABLE {schema}.{table}", sql)
+    # The archive has no agents table to reference
+    sql = re.sub(r",\s*FOREIGN KEY\s*\([^)]*\)\s*REFERENCES\s+\w+\s*\([^)]*\)", "", sql)
+    conn.execute(sql)
+
+
+def _ensure_schema(conn, schema: str):
+    """Archive tables follow the hot ones; columns added to the hot schema since are added here."""
+    for table in ("call_logs", "contacts"):
+        have = {r[1]: r[5] for r in conn.execute(f"PRAGMA {schema}.table_info({table})")}
+        if not have:
+            _create_like_hot(conn, schema, table)
+            continue
+        for name, decl in _columns(conn, "main", table):
+            if name not in have:
+                conn.execute(f"ALTER TABLE {schema}.{table} ADD COLUMN {name} {decl}")
+        if not have.get("id"):
+            # Written by older versions without the primary key; search joins turns to calls by id
+            conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {schema}.idx_{table}_id ON {table} (id)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_call_logs_call_sid ON call_logs (call_sid)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_call_logs_created ON call_logs (created_at, id)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_contacts_call_sid ON contacts (call_sid)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_contacts_campaign ON contacts (campaign_id, id)")
+    conn.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {schema}.transcript_fts USING fts5(
+            text,
+            role UNINDEXED,
+            tokenize = 'porter unicode61'
+        )
+    """)
+
+
+def _move(conn, schema: str, month: str, ids: list[int]):
+    """Copy one batch of calls (with contacts and FTS turns) into the archive and delete them from hot."""
+    marks = ", ".join("?" for _ in ids)
+    sids = [r[0] for r in conn.execute(
+        f"SELECT DISTINCT call_sid FROM main.call_logs WHERE id IN ({marks}) AND IFNULL(call_sid, '') != ''", ids
+    )]
+    sid_marks = ", ".join("?" for _ in sids)
+
+    cols = ", ".join(name for name, _ in _columns(conn, "main", "call_logs"))
+    conn.execute(f"INSERT INTO {schema}.call_logs ({cols}) SELECT {cols} FROM main.call_logs WHERE id IN ({marks})", ids)
+    for agent_id, n in conn.execute(
+        f"SELECT IFNULL(agent_id, ''), COUNT(*) FROM main.call_logs WHERE id IN ({marks}) GROUP BY 1", ids
+    ).fetchall():
+        conn.execute(
+            """INSERT INTO main.archive_partitions (month, agent_id, calls) VALUES (?, ?, ?)
+               ON CONFLICT (month, agent_id) DO UPDATE SET calls = calls + excluded.calls""",
+            (month, agent_id, n),
+        )
+
+    if sids:
+        # A contact goes with its call
+        cols = ", ".join(name for name, _ in _columns(conn, "main", "contacts"))
+        conn.execute(f"INSERT INTO {schema}.contacts ({cols}) SELECT {cols} FROM main.contacts WHERE call_sid IN ({sid_marks})", sids)
+        for campaign_id, n in conn.execute(
+            f"""SELECT campaign_id, COUNT(*) FROM main.contacts
+                WHERE call_sid IN ({sid_marks}) AND campaign_id IS NOT NULL GROUP BY campaign_id""",
+            sids,
+        ).fetchall():
+            conn.execute(
+                """INSERT INTO main.archive_campaigns (campaign_id, month, contacts) VALUES (?, ?, ?)
+                   ON CONFLICT (campaign_id, month) DO UPDATE SET contacts = contacts + excluded.contacts""",
+                (campaign_id, month, n),
+            )
+        conn.execute(f"DELETE FROM main.contacts WHERE call_sid IN ({sid_marks})", sids)
+
+    for call_id in ids:
+        turns = (call_id * TURN_ROWID_STRIDE, call_id * TURN_ROWID_STRIDE + TURN_ROWID_STRIDE - 1)
+        conn.execute(
+            f"""INSERT INTO {schema}.transcript_fts (rowid, text, role)
+                SELECT rowid, text, role FROM main.transcript_fts WHERE rowid BETWEEN ? AND ?""",
+            turns,
+        )
+        conn.execute("DELETE FROM main.transcript_fts WHERE rowid BETWEEN ? AND ?", turns)
+    conn.execute(f"DELETE FROM main.call_logs WHERE id IN ({marks})", ids)
+
+
+def archive_calls(
+    older_than_days: int = ARCHIVE_AFTER_DAYS, dry_run: bool = False, stop: threading.Event | None = None
+) -> dict:
+    """Archive eligible calls; returns calls moved (or, for a dry run, eligible) per month."""
+    params = (f"-{older_than_days} days", *TERMINAL_STATUSES)
+    conn = get_db()
+    months = conn.execute(
+        f"SELECT substr(cl.created_at, 1, 7) AS month, COUNT(*) {_ELIGIBLE} GROUP BY month ORDER BY month", params
+    ).fetchall()
+    if dry_run or not months:
+        conn.close()
+        return {"calls": sum(n for _, n in months), "months": {m: n for m, n in months}}
+
+    ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+    moved = {}
+    try:
+        for month, _ in months:
+            schema = archive_schema(month)
+            conn.execute(f"ATTACH DATABASE ? AS {schema}", (str(archive_path(month)),))
+            try:
+                _ensure_schema(conn, schema)
+                while not (stop and stop.is_set()):
+                    conn.execute("BEGIN IMMEDIATE")
+                    ids = [r[0] for r in conn.execute(
+                        f"SELECT cl.id {_ELIGIBLE} AND substr(cl.created_at, 1, 7) = ? ORDER BY cl.id LIMIT ?",
+                        (*params, month, BATCH_CALLS),
+                    )]
+                    if not ids:
+                        conn.rollback()
+                        break
+                    _move(conn, schema, month, ids)
+                    conn.commit()
+                    moved[month] = moved.get(month, 0) + len(ids)
+            finally:
+                if conn.in_transaction:
+                    conn.rollback()
+                conn.execute(f"DETACH DATABASE {schema}")
+    finally:
+        conn.close()
+    return {"calls": sum(moved.values()), "months": moved}
+
+
+def archive_summary() -> dict:
+    """Archived calls and file size per month."""
+    conn = get_db()
+    rows = conn.execute("SELECT month, SUM(calls) FROM archive_partitions GROUP BY month ORDER BY month DESC").fetchall()
+    conn.close()
+    return {
+        "archive_after_days": ARCHIVE_AFTER_DAYS,
+        "months": [
+            {
+                "month": month,
+                "calls": calls,
+                "bytes": archive_path(month).stat().st_size if archive_path(month).exists() else 0,
+            }
+            for month, calls in rows
+        ],
+    }
+
+
+class Archiver:
+    """Runs archive passes in the background every few hours; one per server process."""
+
+    def __init__(self, days: int = ARCHIVE_AFTER_DAYS, interval_secs: float = ARCHIVE_INTERVAL_SECS):
+        self._days = days
+        self._interval = interval_secs
+        self._task: asyncio.Task | None = None
+        self._stop = threading.Event()
+
+    def start(self):
+        if self._days <= 0 or (self._task and not self._task.done()):
+            return
+        self._stop.clear()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._stop.set()  # ends a pass in progress after its current batch
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                result = await asyncio.to_thread(archive_calls, self._days, stop=self._stop)
+                if result["calls"]:
+                    logger.info(f"🗄️ Archived {result['calls']} call(s): {result['months']}")
+            except Exception as e:
+                logger.error(f"🗄️ Archive pass failed: {e}")
+            await asyncio.sleep(self._interval)
+
+
+archiver = Archiver()
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    from db import init_db
+
+    parser = argparse.ArgumentParser(description="Archive old calls into monthly SQLite files")
+    parser.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS or 90)
+    parser.add_argument("--dry-run", action="store_true", help="only count eligible calls per month")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM the hot database afterwards")
+    args = parser.parse_args()
+    init_db()
+    print(json.dumps(archive_calls(args.days, dry_run=args.dry_run), indent=2))
+    if args.vacuum and not args.dry_run:
+        conn = get_db()
+        conn.execute("VACUUM")
+        conn.close()
+    print(json.dumps(archive_summary(), indent=2))
@@ -0,0 +1,281 @@
+"""Durable outbox for Cal.com bookings.
+
+`book_meeting` validates the request locally, writes the booking intent to the
+`bookings` table and returns to the LLM right away. `BookingWorker` submits
+pending rows to Cal.com in the background, retrying network errors, 429s and
+5xx responses with exponential backoff. Each row carries an idempotency key
+(call + event type + time + email), so a repeated tool call maps to the same
+row and a retried POST is sent with the same key. Final outcomes are written
+back to `call_logs.outcome` and `contacts.outcome`.
+
+Rows left in `submitting` by a crash are picked up again on the next start.
+"""
+
+import asyncio
+import hashlib
+import json
+
+import httpx
+from loguru import logger
+
+from db import get_db, update_call_log
+from scheduling import CAL_API_URL, CAL_TIMEZONE
+
+MAX_ATTEMPTS = 6
+RETRY_BASE_SECS = 5.0
+RETRY_MAX_SECS = 300.0
+POLL_SECS = 15.0
+MAX_CONCURRENT = 4
+
+
+def idempotency_key(call_sid: str, event_type_id: str, start: str, email: str) -> str:
+    raw = "|".join([call_sid, str(event_type_id), start, email.lower()])
+    return hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+
+def enqueue_booking(
+    agent_id: str,
+    call_sid: str,
+    api_key: str,
+    event_type_id: str,
+    name: str,
+    email: str,
+    start: str,
+    phone: str = "",
+) -> tuple[int, bool]:
+    """Persist a booking intent. Returns (booking id, created); created is False for a duplicate.
+
+    Raises ValueError if `event_type_id` isn't a Cal.com (numeric) event type id."""
+    event_type_id = str(event_type_id).strip()
+    if not event_type_id.isdigit():
+        raise ValueError(f"invalid Cal.com event type id {event_type_id!r}")
+    key = idempotency_key(call_sid or agent_id, event_type_id, start, email)
+    conn = get_db()
+    c = conn.cursor()
+    c.execute(
+        """INSERT OR IGNORE INTO bookings
+           (idempotency_key, agent_id, call_sid, cal_api_key, event_type_id, name, email, phone, start_time)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        (key, agent_id, call_sid, api_key, event_type_id, name, email, phone, start),
+    )
+    created = c.rowcount == 1
+    booking_id = c.execute("SELECT id FROM bookings WHERE idempotency_key = ?", (key,)).fetchone()[0]
+    conn.commit()
+    conn.close()
+    if created:
+        logger.info(f"📥 Booking {booking_id} queued for {name} at {start} (key={key})")
+    booking_worker.wake()
+    return booking_id, created
+
+
+def get_booking(booking_id: int) -> dict | None:
+    conn = get_db()
+    row = conn.execute("SELECT * FROM bookings WHERE id = ?", (booking_id,)).fetchone()
+    conn.close()
+    return dict(row) if row else None
+
+
+def _retry_delay(attempts: int) -> float:
+    return min(RETRY_MAX_SECS, RETRY_BASE_SECS * 2 ** (attempts - 1))
+
+
+class BookingWorker:
+    """Submits queued bookings to Cal.com; one per process."""
+
+    def __init__(self):
+        self._task: asyncio.Task | None = None
+        self._wake = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(MAX_CONCURRENT)
+        self._waiters: dict[int, list[asyncio.Future]] = {}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if self.running:
+            return
+        conn = get_db()
+        # A crash mid-submit leaves rows in 'submitting'; the idempotency key makes resubmitting safe
+        recovered = conn.execute(
+            "UPDATE bookings SET status = 'pending' WHERE status = 'submitting'"
+        ).rowcount
+        conn.commit()
+        conn.close()
+        if recovered:
+            logger.warning(f"📥 Recovered {recovered} booking(s) interrupted mid-submit")
+        self._task = asyncio.create_task(self._run())
+        logger.info("📥 Booking outbox worker started")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def wake(self):
+        """Submit new bookings now instead of at the next poll."""
+        try:
+            self.start()
+        except RuntimeError:
+            return  # no running event loop; the next worker start picks the row up
+        self._wake.set()
+
+    async def wait_for(self, booking_id: int, timeout: float) -> str | None:
+        """Final status ('booked' or 'failed') of a booking, or None if it's still in flight after `timeout`."""
+        row = get_booking(booking_id)
+        if row and row["status"] in ("booked", "failed"):
+            return row["status"]
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(booking_id, []).append(waiter)
+        try:
+            return await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            waiters = self._waiters.get(booking_id, [])
+            if waiter in waiters:
+                waiters.remove(waiter)
+            if not waiters:
+                self._waiters.pop(booking_id, None)
+
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            try:
+                rows = self._claim_due()
+                if rows:
+                    await asyncio.gather(*(self._submit(row) for row in rows))
+                    continue  # more may have become due meanwhile
+            except Exception as e:
+                logger.error(f"📥 Booking outbox error: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self._next_due_in())
+            except asyncio.TimeoutError:
+                pass
+
+    def _next_due_in(self) -> float:
+        """Seconds until the earliest pending retry, capped at POLL_SECS."""
+        conn = get_db()
+        row = conn.execute(
+            """SELECT MIN(strftime('%s', next_attempt_at)) - strftime('%s', 'now')
+               FROM bookings WHERE status = 'pending'"""
+        ).fetchone()
+        conn.close()
+        if row[0] is None:
+            return POLL_SECS
+        return min(POLL_SECS, max(0.5, float(row[0])))
+
+    def _claim_due(self) -> list[dict]:
+        conn = get_db()
+        rows = conn.execute(
+            """SELECT * FROM bookings
+               WHERE status = 'pending' AND next_attempt_at <= datetime('now')
+               ORDER BY id LIMIT ?""",
+            (MAX_CONCURRENT * 4,),
+        ).fetchall()
+        if rows:
+            conn.executemany(
+                "UPDATE bookings SET status = 'submitting', updated_at = datetime('now') WHERE id = ?",
+                [(r["id"],) for r in rows],
+            )
+            conn.commit()
+        conn.close()
+        return [dict(r) for r in rows]
+
+    async def _submit(self, row: dict):
+        async with self._semaphore:
+            attempts = row["attempts"] + 1
+            try:
+                event_type_id = int(row["event_type_id"])
+            except (TypeError, ValueError):
+                # Rows queued before enqueue-time validation; retrying won't help
+                self._finish(row, attempts, "failed", last_error=f"invalid event type id {row['event_type_id']!r}")
+                return
+            booking_data = {
+                "eventTypeId": event_type_id,
+                "start": row["start_time"],
+                "responses": {"name": row["name"], "email": row["email"]},
+                "timeZone": str(CAL_TIMEZONE),
+                "language": "en",
+                "metadata": {
+                    "source": "voice_agent",
+                    "phone": row["phone"] or "",
+                    "call_sid": row["call_sid"] or "",
+                    "idempotency_key": row["idempotency_key"],
+                },
+            }
+            try:
+                async with httpx.AsyncClient() as client:
+                    resp = await client.post(
+                        f"{CAL_API_URL}/bookings",
+                        params={"apiKey": row["cal_api_key"]},
+                        headers={"Idempotency-Key": row["idempotency_key"]},
+                        json=booking_data,
+                        timeout=15.0,
+                    )
+            except Exception as e:
+                self._retry_or_fail(row, attempts, f"network: {e}")
+                return
+
+            logger.info(f"📅 Cal.com response for booking {row['id']}: {resp.status_code} — {resp.text[:300]}")
+            if resp.status_code in (200, 201):
+                try:
+                    data = resp.json()
+                    data = data.get("booking") or data
+                    uid = str(data.get("uid") or data.get("id") or "")
+                except (ValueError, AttributeError):
+                    uid = ""
+                self._finish(row, attempts, "booked", cal_booking_uid=uid)
+            elif resp.status_code in (408, 425, 429) or resp.status_code >= 500:
+                self._retry_or_fail(row, attempts, f"HTTP {resp.status_code}: {resp.text[:200]}")
+            else:
+                # Rejected (slot taken, bad email, ...) — retrying won't help
+                self._finish(row, attempts, "failed", last_error=f"HTTP {resp.status_code}: {resp.text[:200]}")
+
+    def _retry_or_fail(self, row: dict, attempts: int, error: str):
+        if attempts >= MAX_ATTEMPTS:
+            self._finish(row, attempts, "failed", last_error=error)
+            return
+        delay = _retry_delay(attempts)
+        logger.warning(f"📥 Booking {row['id']} attempt {attempts} failed ({error}); retrying in {delay:.0f}s")
+        conn = get_db()
+        conn.execute(
+            """UPDATE bookings SET status = 'pending', attempts = ?, last_error = ?,
+               next_attempt_at = datetime('now', ?), updated_at = datetime('now') WHERE id = ?""",
+            (attempts, error, f"+{int(delay)} seconds", row["id"]),
+        )
+        conn.commit()
+        conn.close()
+
+    def _finish(self, row: dict, attempts: int, status: str, last_error: str = "", cal_booking_uid: str = ""):
+        outcome = "scheduled" if status == "booked" else "booking-failed"
+        conn = get_db()
+        conn.execute(
+            """UPDATE bookings SET status = ?, attempts = ?, last_error = ?, cal_booking_uid = ?,
+               updated_at = datetime('now') WHERE id = ?""",
+            (status, attempts, last_error or None, cal_booking_uid or None, row["id"]),
+        )
+        if row["call_sid"]:
+            note = json.dumps({"booking_id": row["id"], "start": row["start_time"], "error": last_error or None})
+            conn.execute(
+                "UPDATE contacts SET outcome = ?, notes = ? WHERE call_sid = ?",
+                (outcome, note, row["call_sid"]),
+            )
+        conn.commit()
+        conn.close()
+        if row["call_sid"]:
+            update_call_log(row["call_sid"], outcome=outcome)  # keeps the stats rollups in step
+        for waiter in self._waiters.pop(row["id"], []):
+            if not waiter.done():
+                waiter.set_result(status)
+        if status == "booked":
+            logger.info(f"✅ Booking {row['id']} confirmed for {row['name']} at {row['start_time']} (uid={cal_booking_uid})")
+        else:
+            logger.error(f"❌ Booking {row['id']} failed after {attempts} attempt(s): {last_error}")
+
+
+booking_worker = BookingWorker()
@@ -7,10 +7,10 @@ Multi-agent: all config loaded from SQLite database.
 import os
 import sys
 import json
+import time
 import asyncio
 from datetime import datetime
 
-import httpx
 from dotenv import load_dotenv
 from loguru import logger
 from pipecat.audio.vad.silero import SileroVADAnalyzer
@@ -19,19 +19,14 @@ from pipecat.pipeline.pipeline import Pipeline
 from pipecat.pipeline.runner import PipelineRunner
 from pipecat.pipeline.task import PipelineParams, PipelineTask
 from pipecat.processors.aggregators.llm_context import LLMContext
-from pipecat.processors.aggregators.sentence import SentenceAggregator
 from pipecat.processors.aggregators.llm_response_universal import (
     LLMContextAggregatorPair,
     LLMUserAggregatorParams,
 )
 from pipecat.runner.types import RunnerArguments
 from pipecat.runner.utils import parse_telephony_websocket
-from pipecat.serializers.twilio import TwilioFrameSerializer
 from pipecat.services.cartesia.tts import CartesiaTTSService, GenerationConfig
 from pipecat.services.deepgram.stt import DeepgramSTTService
-from pipecat.services.openai.llm import OpenAILLMService
-from pipecat.services.cerebras.llm import CerebrasLLMService
-from pipecat.services.groq.llm import GroqLLMService
 from pipecat.transports.websocket.fastapi import (
     FastAPIWebsocketParams,
     FastAPIWebsocketTransport,
@@ -41,17 +36,59 @@ from pipecat.adapters.schemas.function_schema import FunctionSchema
 from pipecat.adapters.schemas.tools_schema import ToolsSchema
 
 from pipecat.frames.frames import (
+    EndFrame,
+    InterruptionFrame,
+    LLMFullResponseEndFrame,
     TTSSpeakFrame,
     TranscriptionFrame,
     TextFrame,
 )
 from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
 
+from audio_codec import FastTwilioFrameSerializer
+from booking_outbox import booking_worker, enqueue_booking, get_booking
+from call_metrics import MetricsCollector
+from call_replay import TapeRecorder, should_tape
+from context_manager import ContextWindowManager
+from dial_pacer import dial_pacer
+from llm_router import RoutedLLMService, resolve_routing
+from prompt_cache import prefix_warmer
+from recording import CallRecorder
+from scheduling import (
+    SlotCache,
+    get_slot_cache,
+    handle_check_availability,
+    parse_time,
+    speak_time,
+)
+from output_filter import StreamingOutputFilter
+from speculative import SpeculativeResponder
+from text_chunker import AdaptiveTextChunker, TimedSentenceAggregator
+from vad_batch import BatchedSileroVADAnalyzer
+
 load_dotenv(override=True)
 
 logger.remove(0)
 logger.add(sys.stderr, level="DEBUG")
 
+# "adaptive" flushes the first clause of each response to TTS early;
+# "sentence" keeps the old full-sentence SentenceAggregator for A/B comparison.
+TTS_CHUNKING = os.getenv("TTS_CHUNKING", "adaptive")
+
+# Conversation history budget (tokens, excluding the system prompt); 0 disables folding
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "2500"))
+CONTEXT_KEEP_TURNS = int(os.getenv("CONTEXT_KEEP_TURNS", "6"))
+
+# Start the LLM on stable Deepgram interims; commit only if the final transcript matches
+SPECULATIVE_LLM = os.getenv("SPECULATIVE_LLM", "1") == "1"
+SPECULATIVE_SIMILARITY = float(os.getenv("SPECULATIVE_SIMILARITY", "0.9"))
+
+# Share one Silero session across calls and batch their inference; 0 = stock per-call analyzer
+VAD_BATCHING = os.getenv("VAD_BATCHING", "1") == "1"
+
+# Times past the cached availability wait this long for Cal.com's answer before "pending confirmation"
+BOOKING_CONFIRM_SECS = float(os.getenv("BOOKING_CONFIRM_SECS", "4"))
+
 # ── Voicemail detection ──
 VOICEMAIL_PHRASES = [
     "voice message system",
@@ -97,6 +134,17 @@ tools = ToolsSchema(standard_tools=[
         },
         required=["name", "email", "preferred_time"],
     ),
+    FunctionSchema(
+        name="check_availability",
+        description="Get open appointment times for the inspection. Use before suggesting or booking a time, and offer the customer times from this list.",
+        properties={
+            "date": {
+                "type": "string",
+                "description": "Optional YYYY-MM-DD day the customer asked about. Omit to get the next open times."
+            },
+        },
+        required=[],
+    ),
     FunctionSchema(
         name="end_call",
         description="End the phone call. Use when the conversation is naturally complete — after booking, after they decline, or when they want to hang up.",
@@ -111,8 +159,15 @@ tools = ToolsSchema(standard_tools=[
 ])
 
 
-async def handle_book_meeting(args: dict, cal_api_key: str, cal_event_type_id: str) -> str:
-    """Handle the book_meeting function call."""
+async def handle_book_meeting(
+    args: dict,
+    cal_api_key: str,
+    cal_event_type_id: str,
+    slot_cache: SlotCache | None = None,
+    agent_id: str = "",
+    call_sid: str = "",
+) -> str:
+    """Handle the book_meeting function call: validate locally, then queue for Cal.com."""
     name = args.get("name", "")
     email = args.get("email", "").strip().lower().replace(" ", "")
     preferred_time = args.get("preferred_time", "")
@@ -128,45 +183,77 @@ async def handle_book_meeting(args: dict, cal_api_key: str, cal_event_type_id: s
     if not cal_api_key:
         logger.warning("No CAL_API_KEY for this agent")
         return f"Inspection noted for {name} at {preferred_time}. Confirmation will be sent to {email}."
-
+    if not str(cal_event_type_id).strip().isdigit():
+        logger.warning(f"Invalid Cal.com event type id for this agent: {cal_event_type_id!r}")
+        return "ERROR: Booking isn't set up for this agent. Let the customer know someone will call back to confirm their appointment."
+
+    requested = parse_time(preferred_time)
+    if requested is None:
+        return f"ERROR: Could not read the time '{preferred_time}'. Confirm the day and time with the customer and pass it as an ISO 8601 datetime."
+    if requested < datetime.now(requested.tzinfo):
+        return f"ERROR: That time ({preferred_time}) has already passed. Ask the customer for a future date and time, then try again."
+
+    # Check the requested time against cached availability before queueing; times past the
+    # cached week (is_open() is None) go straight to Cal.com
+    is_open = await slot_cache.is_open(requested) if slot_cache is not None else None
+    if is_open is False:
+        options = ", ".join(speak_time(s) for s in await slot_cache.nearest(requested))
+        logger.info(f"📅 {preferred_time} not open; offering: {options}")
+        if not options:
+            return "ERROR: There are no open times in the next week. Let the customer know someone will call back to schedule."
+        return f"ERROR: {speak_time(requested)} is not available. Offer the customer one of these open times instead: {options}."
+
+    # Queue the booking; the outbox worker submits it to Cal.com with retries
     try:
-        async with httpx.AsyncClient() as client:
-            # Ensure time has timezone offset
-            start_time = preferred_time
-            if "T" in start_time and "+" not in start_time and "Z" not in start_time and "-" not in start_time.split("T")[1]:
-                start_time = start_time + "-06:00"  # Default to CST
-
-            booking_data = {
-                "eventTypeId": int(cal_event_type_id),
-                "start": start_time,
-                "responses": {"name": name, "email": email},
-                "timeZone": "America/Chicago",
-                "language": "en",
-                "metadata": {"source": "voice_agent", "phone": phone},
-            }
-            logger.info(f"📅 Cal.com request: {json.dumps(booking_data)}")
-
-            resp = await client.post(
-                "https://api.cal.com/v1/bookings",
-                params={"apiKey": cal_api_key},
-                json=booking_data,
-            )
-            logger.info(f"📅 Cal.com response: {resp.status_code} — {resp.text[:500]}")
-
-            if resp.status_code in (200, 201):
-                return f"Successfully booked for {name} at {preferred_time}. Confirmation sent to {email}."
-            else:
-                error_msg = resp.text[:200]
-                logger.error(f"Cal.com booking failed: {resp.status_code} — {error_msg}")
-                if "past" in error_msg.lower():
-                    return f"ERROR: That time ({preferred_time}) has already passed. Ask the customer for a future date and time, then try again."
-                elif "email" in error_msg.lower():
-                    return f"ERROR: The email address '{email}' is not valid. Ask the customer to spell out their full email address again (it needs to be a real email like name@example.com)."
-                else:
-                    return f"ERROR: Could not book the appointment. There was a scheduling conflict or error. Ask the customer for a different time and try again."
+        booking_id, created = enqueue_booking(
+            agent_id, call_sid, cal_api_key, cal_event_type_id, name, email, requested.isoformat(), phone
+        )
     except Exception as e:
-        logger.error(f"Cal.com error: {e}")
-        return f"ERROR: Could not connect to the booking system. Apologize and let the customer know someone will call back to confirm their appointment."
+        logger.error(f"Failed to queue booking: {e}")
+        return "ERROR: Could not save the booking. Apologize and let the customer know someone will call back to confirm their appointment."
+    if slot_cache is not None:
+        slot_cache.remove(requested)
+    if not created:
+        return f"This appointment was already requested for {name} at {speak_time(requested)}. Don't book it again."
+    if is_open is None:
+        # Not checked against availability: give Cal.com's first attempt a moment before claiming a booking
+        status = await booking_worker.wait_for(booking_id, BOOKING_CONFIRM_SECS)
+        if status == "failed":
+            error = (get_booking(booking_id) or {}).get("last_error") or ""
+            logger.info(f"📅 Unverified time {preferred_time} rejected: {error}")
+            return f"ERROR: {speak_time(requested)} couldn't be booked; it may not be available. Ask the customer for another day and time."
+        if status is None:
+            return (
+                f"Requested {speak_time(requested)} for {name}; it is pending confirmation. Tell the customer the time "
+                f"is requested, not confirmed, and a confirmation will be emailed to {email} once it's booked."
+            )
+    return f"Booked for {name} at {speak_time(requested)}. Confirmation will be sent to {email}."
+
+
+def make_vad_analyzer(params: VADParams | None = None):
+    if VAD_BATCHING:
+        return BatchedSileroVADAnalyzer(params=params)
+    return SileroVADAnalyzer(params=params)
+
+
+def preload(agent_ids: list[str] | None = None) -> dict:
+    """Warm what the first call would otherwise pay for: Silero's ONNX session and the
+    LLM provider modules the given agents route to. Called once at server startup."""
+    from db import get_llm_routing, list_agents
+    from llm_router import preload_providers
+
+    timings = {}
+    started = time.perf_counter()
+    make_vad_analyzer()
+    timings["vad_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+    started = time.perf_counter()
+    if agent_ids is None:
+        agent_ids = [a["id"] for a in list_agents()]
+    providers = preload_providers([get_llm_routing(a) for a in agent_ids])
+    timings["providers"] = providers
+    timings["providers_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return timings
 
 
 async def run_bot(
@@ -179,25 +266,37 @@ async def run_bot(
     cal_event_type_id: str,
     call_sid: str = "",
     agent_id: str = "",
+    output_filters: list[str] | None = None,
+    llm_routing: dict | None = None,
+    call_context: str = "",
+    record_audio: bool = False,
+    services: dict | None = None,
+    tape: TapeRecorder | None = None,
+    call_metrics: dict | None = None,
 ):
-    """Run the voice agent pipeline with agent-specific config."""
-
-    llm = OpenAILLMService(
-        api_key=os.getenv("OPENAI_API_KEY"),
-        model="gpt-4o-mini",
-        params=OpenAILLMService.InputParams(
-            temperature=0.4,
-            max_completion_tokens=100,
-        ),
+    """Run the voice agent pipeline with agent-specific config.
+
+    `services` replaces the "stt", "llm" and/or "tts" services (call replays);
+    `tape` records the call for replay; `call_metrics` receives the call's metrics."""
+    services = services or {}
+
+    # Routes each turn to the fastest healthy provider (default: OpenAI gpt-4o-mini only)
+    llm = services.get("llm") or RoutedLLMService.from_config(
+        llm_routing,
+        temperature=0.4,
+        max_completion_tokens=100,
     )
 
-    stt = DeepgramSTTService(
+    stt = services.get("stt") or DeepgramSTTService(
         api_key=os.getenv("DEEPGRAM_API_KEY"),
     )
 
-    tts = CartesiaTTSService(
+    tts = services.get("tts") or CartesiaTTSService(
         api_key=os.getenv("CARTESIA_API_KEY"),
         voice_id=voice_id,
+        # The adaptive chunker already decides chunk boundaries; re-aggregating
+        # inside the TTS would hold clauses back until the sentence ends.
+        aggregate_sentences=TTS_CHUNKING != "adaptive",
         params=CartesiaTTSService.InputParams(
             generation_config=GenerationConfig(
                 speed=1.0,
@@ -206,17 +305,43 @@ async def run_bot(
         ),
     )
 
-    # Pre-seed greeting so LLM knows what it already said
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "assistant", "content": greeting},
-    ]
+    # Static agent prompt first (identical for every call → cacheable prefix),
+    # then per-contact details, then the pre-seeded greeting so the LLM knows
+    # what it already said
+    messages = [{"role": "system", "content": system_prompt}]
+    if call_context:
+        messages.append({"role": "system", "content": call_context})
+    messages.append({"role": "assistant", "content": greeting})
 
     context = LLMContext(messages, tools)
+
+    if tape:
+        tape.configure(
+            agent_id=agent_id,
+            system_prompt=system_prompt,
+            greeting=greeting,
+            voice_id=voice_id,
+            call_context=call_context,
+            output_filters=output_filters,
+            pipeline={
+                "tts_chunking": TTS_CHUNKING,
+                "context_max_tokens": CONTEXT_MAX_TOKENS,
+                "speculative_llm": SPECULATIVE_LLM and "llm" not in services,
+                "vad_batching": VAD_BATCHING,
+            },
+        )
+
+    warmup_key = agent_id or call_sid
+    prefix_warmer.register(
+        warmup_key,
+        system_prompt,
+        llm.get_llm_adapter().to_provider_tools_format(tools),
+        route=resolve_routing(llm_routing)["providers"][0],
+    )
     user_aggregator, assistant_aggregator = LLMContextAggregatorPair(
         context,
         user_params=LLMUserAggregatorParams(
-            vad_analyzer=SileroVADAnalyzer(
+            vad_analyzer=make_vad_analyzer(
                 params=VADParams(
                     confidence=0.85,
                     min_volume=0.6,
@@ -232,18 +357,28 @@ async def run_bot(
     greeting_sent = False
     transcript_buffer = ""  # accumulate early transcripts for VM detection
     call_transcript = []  # list of {"role": "user"|"assistant", "text": "..."} for saving
+    call_metrics = {} if call_metrics is None else call_metrics  # saved to call_logs.metrics
     user_spoke_event = asyncio.Event()  # signals that user said something before greeting
 
+    # Open Cal.com slots for this agent, shared across its calls
+    slot_cache = get_slot_cache(cal_api_key, cal_event_type_id)
+
     # Register function call handlers
     async def on_book_meeting(params: FunctionCallParams):
-        result = await handle_book_meeting(params.arguments, cal_api_key, cal_event_type_id)
+        result = await handle_book_meeting(
+            params.arguments, cal_api_key, cal_event_type_id, slot_cache, agent_id=agent_id, call_sid=call_sid
+        )
         await params.result_callback(result)
 
+    async def on_check_availability(params: FunctionCallParams):
+        await params.result_callback(await handle_check_availability(params.arguments, slot_cache))
+
     async def on_end_call(params: FunctionCallParams):
         await params.result_callback("Ending call now.")
         await task.cancel()
 
     llm.register_function("book_meeting", on_book_meeting)
+    llm.register_function("check_availability", on_check_availability)
     llm.register_function("end_call", on_end_call)
 
     # ── Voicemail detection + greeting gate processor ──
@@ -270,6 +405,7 @@ async def run_bot(
                             voicemail_detected = True
                             logger.warning(f"📵 VOICEMAIL DETECTED: '{phrase}' — hanging up")
                             if call_sid:
+                                dial_pacer.voicemail(call_sid)
                                 try:
                                     from db import update_call_log
                                     update_call_log(call_sid, status="no-answer", outcome="voicemail")
@@ -293,33 +429,33 @@ async def run_bot(
 
     # ── Bot response transcript collector ──
     class BotTranscriptCollector(FrameProcessor):
-        """Captures bot text output for transcript logging."""
+        """Captures bot text output for transcript logging.
+        Drops internal thoughts / stage directions via the agent's output filter."""
         def __init__(self):
             super().__init__()
             self._current_response = []
+            self._filter = StreamingOutputFilter(output_filters)
+
+        async def _release(self, frames):
+            for f in frames:
+                self._current_response.append(f.text)
+                await self.push_frame(f)
 
         async def process_frame(self, frame, direction):
             await super().process_frame(frame, direction)
             if isinstance(frame, TextFrame) and frame.text.strip():
-                text = frame.text.strip()
-                # Filter out pure ellipsis, internal thoughts, and stage directions
-                if text in ("...", "…", ".", ".."):
-                    return  # Don't push to TTS or transcript
-                text_lower = text.lower()
-                # Catch internal thoughts / stage directions / self-talk
-                if any(p in text_lower for p in (
-                    "we need to", "we wait", "user hasn't", "user hasn't",
-                    "there's no action", "waiting for user", "no action",
-                    "note:", "internal:", "[action", "(action",
-                    "wait for user", "wait for response",
-                    "(waiting", "waiting for response", "whenever you're ready",
-                    "just need your", "got it—just need",
-                )):
-                    logger.debug(f"🚫 Filtering internal thought: {text}")
-                    return  # Don't push internal thoughts to TTS
-                self._current_response.append(frame.text)
+                hits_before = self._filter.hits.total()
+                released = self._filter.feed(frame.text, frame)
+                if self._filter.hits.total() > hits_before:
+                    logger.debug(f"🚫 Filtering internal thought: {frame.text.strip()}")
+                await self._release(released)
+                return
+            if isinstance(frame, InterruptionFrame):
+                self._filter.reset()  # held text was never spoken; drop it
+            elif isinstance(frame, (LLMFullResponseEndFrame, EndFrame)):
+                await self._release(self._filter.flush())
             # When we get a non-text frame after collecting text, flush
-            elif self._current_response:
+            if self._current_response and not self._filter.holding:
                 full_text = "".join(self._current_response).strip()
                 if full_text:
                     call_transcript.append({"role": "assistant", "text": full_text})
@@ -339,21 +475,64 @@ async def run_bot(
 
     greeting_gate = GreetingGate()
 
-    # Aggregate LLM token stream into full sentences before TTS
-    sentence_aggregator = SentenceAggregator()
+    # Aggregate LLM token stream into clauses/sentences before TTS
+    if TTS_CHUNKING == "adaptive":
+        sentence_aggregator = AdaptiveTextChunker()
+    else:
+        sentence_aggregator = TimedSentenceAggregator()
+
+    # Keep the history under a token budget on long calls
+    context_manager = ContextWindowManager(
+        max_history_tokens=CONTEXT_MAX_TOKENS,
+        keep_turns=CONTEXT_KEEP_TURNS,
+        metrics=call_metrics,
+    )
+
+    metrics_collector = MetricsCollector(
+        call_metrics,
+        on_llm_usage=lambda usage: prefix_warmer.mark_used(warmup_key),
+        on_ttfb=dial_pacer.record_ttfb,  # live turn latency for campaign pacing
+    )
+
+    # Speculation sends side requests through the router; off when the LLM is replaced (replays)
+    speculate = SPECULATIVE_LLM and "llm" not in services
+    speculative = SpeculativeResponder(
+        context,
+        llm,
+        similarity=SPECULATIVE_SIMILARITY,
+        is_enabled=lambda: speculate and not greeting_playing,
+        metrics=call_metrics,
+    )
+
+    # Caller + bot audio to a stereo WAV; after the output so bot audio is what was actually sent
+    recorder = CallRecorder(call_sid, metrics=call_metrics) if record_audio else None
+
+    def tap(point: str) -> list:
+        return [tape.tap(point)] if tape else []
 
     # Rebuild pipeline with VM detector, bot collector, sentence aggregator, and greeting gate
     pipeline = Pipeline(
         [
             transport.input(),
             stt,
+            *tap("stt"),
+            speculative.interim_tap(),
             vm_detector,
             user_aggregator,
+            context_manager,
+            *tap("llm_in"),
+            speculative,
             llm,
+            *tap("llm_out"),
             sentence_aggregator,
             bot_collector,
+            *tap("tts_in"),
             tts,
+            *tap("tts_out"),
+            metrics_collector,
             transport.output(),
+            *tap("out"),
+            *([recorder] if recorder else []),
             greeting_gate,
             assistant_aggregator,
         ]
@@ -375,35 +554,12 @@ async def run_bot(
     @transport.event_handler("on_client_connected")
     async def on_client_connected(transport_ref, client):
         nonlocal warmup_task
-        logger.info("✅ Transport client connected — starting LLM cache warmup")
-        warmup_task = asyncio.create_task(_warmup_llm_cache())
-
-    async def _warmup_llm_cache():
-        """Pre-warm the LLM prompt cache in background."""
-        try:
-            import httpx as _httpx
-            warmup_messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "assistant", "content": greeting},
-                {"role": "user", "content": "Hello?"},
-            ]
-            async with _httpx.AsyncClient() as _client:
-                resp = await _client.post(
-                    "https://api.openai.com/v1/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {os.getenv('OPENAI_API_KEY')}",
-                        "Content-Type": "application/json",
-                    },
-                    json={
-                        "model": "gpt-4o-mini",
-                        "messages": warmup_messages,
-                        "max_tokens": 1,
-                    },
-                    timeout=5.0,
-                )
-                logger.info(f"🔥 LLM cache pre-warmed (status={resp.status_code})")
-        except Exception as e:
-            logger.warning(f"⚠️ LLM cache warmup failed: {e}")
+        logger.info("✅ Transport client connected — checking shared prompt prefix cache")
+        # Only warms if no request for this agent refreshed the cache recently
+        if "llm" not in services:
+            warmup_task = asyncio.create_task(prefix_warmer.warm(warmup_key))
+        if slot_cache is not None:
+            asyncio.create_task(slot_cache.prefetch())
 
     @task.event_handler("on_pipeline_started")
     async def on_pipeline_started(task_ref, frame):
@@ -434,7 +590,28 @@ async def run_bot(
     @transport.event_handler("on_client_disconnected")
     async def on_client_disconnected(transport_ref, client):
         logger.info("📞 Call disconnected")
+        call_metrics["tts_chunking"] = {"arm": TTS_CHUNKING, **sentence_aggregator.stats()}
+        logger.info(f"✂️ TTS chunking ({TTS_CHUNKING}): {call_metrics['tts_chunking']}")
+        call_metrics["context"] = context_manager.stats()
+        call_metrics["latency"] = metrics_collector.summary()
+        logger.info(
+            f"⏱️ LLM TTFB {call_metrics['latency']['llm_ttfb']} | "
+            f"cached prompt tokens {call_metrics['latency']['cached_ratio']:.0%} | "
+            f"history tokens max={call_metrics['context']['max_history_tokens']} "
+            f"folded={call_metrics['context']['folded_turns']} (budget={CONTEXT_MAX_TOKENS})"
+        )
+        call_metrics["llm_routes"] = llm.stats()
+        call_metrics["speculation"] = speculative.stats()
+        if speculate:
+            logger.info(f"🔮 Speculation: {call_metrics['speculation']}")
+        if recorder:
+            recorder.stop()
+        call_metrics["output_filter_hits"] = bot_collector._filter.stats()
+        if call_metrics["output_filter_hits"]:
+            logger.info(f"🚫 Output filter hits: {call_metrics['output_filter_hits']}")
+
         # Flush any remaining bot text
+        bot_collector._current_response += [f.text for f in bot_collector._filter.flush()]
         if bot_collector._current_response:
             full_text = "".join(bot_collector._current_response).strip()
             if full_text:
@@ -450,9 +627,29 @@ async def run_bot(
                 from db import update_call_log
                 update_call_log(call_sid, transcript=transcript_json)
                 logger.info(f"💾 Saved transcript ({len(transcript_with_greeting)} turns) for {call_sid}")
+                from outcomes import outcome_analyzer
+                outcome_analyzer.wake()
             except Exception as e:
                 logger.error(f"Failed to save transcript: {e}")
 
+        if call_sid:
+            try:
+                from db import update_call_log
+                update_call_log(call_sid, metrics=json.dumps(call_metrics))
+                if recorder:
+                    update_call_log(call_sid, recording_path=str(recorder.path))
+            except Exception as e:
+                logger.error(f"Failed to save call metrics: {e}")
+
+        if tape:
+            tape.finish(call_metrics)
+            try:
+                path = await asyncio.to_thread(tape.save)
+                if path:
+                    logger.info(f"📼 Saved call tape {path}")
+            except Exception as e:
+                logger.error(f"Failed to save call tape: {e}")
+
         await task.cancel()
 
     runner = PipelineRunner(handle_sigint=handle_sigint)
@@ -469,6 +666,7 @@ async def bot(runner_args: RunnerArguments):
 
     # Agent config is passed as stream parameters from server.py
     system_prompt = body_data.get("system_prompt", "You are a helpful assistant.")
+    call_context = body_data.get("call_context", "")
     greeting = body_data.get("greeting", "Hello, how can I help you?")
     voice_id = body_data.get("voice_id", "86e30c1d-714b-4074-a1f2-1cb6b552fb49")
     cal_api_key = body_data.get("cal_api_key", "")
@@ -476,9 +674,22 @@ async def bot(runner_args: RunnerArguments):
 
     agent_id = body_data.get("agent_id", "")
 
+    output_filters = None
+    llm_routing = None
+    record_audio = False
+    tape = TapeRecorder(call_sid) if call_sid and should_tape() else None
+    if agent_id:
+        try:
+            from db import get_output_filters, get_llm_routing, recording_enabled
+            output_filters = get_output_filters(agent_id)
+            llm_routing = get_llm_routing(agent_id)
+            record_audio = recording_enabled(agent_id, call_sid)
+        except Exception as e:
+            logger.error(f"Failed to load agent runtime config: {e}")
+
     logger.info(f"📋 Call {call_sid}: agent={agent_id}, voice={voice_id}, greeting_len={len(greeting)}")
 
-    serializer = TwilioFrameSerializer(
+    serializer = FastTwilioFrameSerializer(
         stream_sid=call_data["stream_id"],
         call_sid=call_data["call_id"],
         account_sid=os.getenv("TWILIO_ACCOUNT_SID", ""),
@@ -505,4 +716,9 @@ async def bot(runner_args: RunnerArguments):
         cal_event_type_id,
         call_sid=call_sid,
         agent_id=agent_id,
+        output_filters=output_filters,
+        llm_routing=llm_routing,
+        call_context=call_context,
+        record_audio=record_audio,
+        tape=tape,
     )
@@ -0,0 +1,73 @@
+"""Per-call latency and usage metrics collected from pipecat MetricsFrames.
+
+Pipecat emits MetricsFrames (TTFB, token usage) when the PipelineTask runs with
+enable_metrics / enable_usage_metrics. This processor sits after the TTS,
+records the values into the call's metrics dict, and passes every frame on.
+"""
+
+from pipecat.frames.frames import Frame, MetricsFrame
+from pipecat.metrics.metrics import LLMUsageMetricsData, TTFBMetricsData
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+
+
+def summarize_ms(values: list[float]) -> dict:
+    """avg/p50/p95/max of a list of millisecond values."""
+    if not values:
+        return {"count": 0}
+    s = sorted(values)
+    return {
+        "count": len(s),
+        "avg": round(sum(s) / len(s), 1),
+        "p50": round(s[len(s) // 2], 1),
+        "p95": round(s[min(len(s) - 1, int(len(s) * 0.95))], 1),
+        "max": round(s[-1], 1),
+    }
+
+
+class MetricsCollector(FrameProcessor):
+    """Collects LLM/TTS TTFB and LLM token usage for one call."""
+
+    def __init__(self, metrics: dict, on_llm_usage=None, on_ttfb=None):
+        super().__init__()
+        self.metrics = metrics
+        self._on_llm_usage = on_llm_usage
+        self._on_ttfb = on_ttfb  # (kind "llm" | "tts", ms), as each value arrives
+        self.llm_ttfb_ms = metrics.setdefault("llm_ttfb_ms", [])
+        self.tts_ttfb_ms = metrics.setdefault("tts_ttfb_ms", [])
+        self.llm_usage = metrics.setdefault("llm_usage", [])
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if isinstance(frame, MetricsFrame):
+            for data in frame.data:
+                if isinstance(data, TTFBMetricsData) and data.value:
+                    kind = "llm" if "LLM" in data.processor else "tts" if "TTS" in data.processor else None
+                    if kind:
+                        ms = round(data.value * 1000, 1)
+                        (self.llm_ttfb_ms if kind == "llm" else self.tts_ttfb_ms).append(ms)
+                        if self._on_ttfb:
+                            self._on_ttfb(kind, ms)
+                elif isinstance(data, LLMUsageMetricsData):
+                    usage = data.value
+                    self.llm_usage.append({
+                        "prompt_tokens": usage.prompt_tokens,
+                        "completion_tokens": usage.completion_tokens,
+                        "cached_tokens": usage.cache_read_input_tokens or 0,
+                    })
+                    if self._on_llm_usage:
+                        self._on_llm_usage(usage)
+
+        await self.push_frame(frame, direction)
+
+    def summary(self) -> dict:
+        prompt = sum(u["prompt_tokens"] for u in self.llm_usage)
+        cached = sum(u["cached_tokens"] for u in self.llm_usage)
+        return {
+            "llm_ttfb": summarize_ms(self.llm_ttfb_ms),
+            "tts_ttfb": summarize_ms(self.tts_ttfb_ms),
+            "prompt_tokens": prompt,
+            "cached_tokens": cached,
+            "cached_ratio": round(cached / prompt, 3) if prompt else 0.0,
+            "completion_tokens": sum(u["completion_tokens"] for u in self.llm_usage),
+        }
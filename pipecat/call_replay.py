@@ -0,0 +1,619 @@
+"""Call tapes: record what a call heard and what the services answered, then replay it offline.
+
+A tape is one gzipped JSON-lines file per call under `TAPES_DIR/<date>/`. The
+first line holds the run_bot config (prompt, greeting, call context, output
+filters, pipeline knobs). Each later line is an event, timed in seconds from
+pipeline start, written by taps placed around the services in `run_bot`:
+
+  - after the STT: caller audio (μ-law, base64) and interim/final transcripts
+  - before and after the LLM stage: each request and its streamed response
+    (text chunks and function calls). Speculative replies land here too, since
+    the speculative responder sits inside that stage.
+  - around the TTS: the text of each request, its TTFB and the audio length
+  - after the output: when the bot started and stopped speaking
+  - last line: the call's metrics as saved to call_logs.metrics
+
+`replay()` runs the tape back through the real `run_bot`, so the aggregators,
+gates, filters and chunker all run for real. Only the edges are stubbed:
+
+  - the transport plays the caller audio in real time, which keeps VAD and
+    turn-taking live
+  - the STT emits the recorded transcripts at their recorded times
+  - the LLM answers each request with the recorded response nearest in time,
+    using the recorded TTFB and gaps between chunks
+  - the TTS answers with the recorded TTFB for that text (the median when
+    chunking changed the text) and silence of a recorded length per character
+
+Function calls are not executed (booking has side effects, and the tape holds
+the follow-up response anyway), speculation is off (it calls OpenAI itself),
+and nothing is written to the database.
+
+A replay reports the recorded and replayed per-stage latency: the
+MetricsCollector's LLM/TTS TTFB plus the turn latency, which runs from the
+caller's last final transcript to the bot starting to speak. Both are
+measured the same way from both tapes. To A/B a pipeline change, replay the
+same tapes with and without it. `--set` overrides a `bot` module knob:
+
+    python call_replay.py tapes/2026-10-19/ [--set TTS_CHUNKING=sentence] [--concurrency 4]
+
+Replays run in real time: a 3-minute call takes 3 minutes.
+Enable taping on live calls with RECORD_TAPES (the fraction of calls taped, e.g. 1).
+"""
+
+import asyncio
+import base64
+import gzip
+import json
+import os
+import random
+import time
+from datetime import date, datetime
+from pathlib import Path
+from statistics import median
+from typing import AsyncGenerator
+
+from loguru import logger
+from pipecat.frames.frames import (
+    BotStartedSpeakingFrame,
+    BotStoppedSpeakingFrame,
+    CancelFrame,
+    EndFrame,
+    Frame,
+    FunctionCallInProgressFrame,
+    InputAudioRawFrame,
+    InterimTranscriptionFrame,
+    LLMContextFrame,
+    LLMFullResponseEndFrame,
+    LLMFullResponseStartFrame,
+    LLMTextFrame,
+    MetricsFrame,
+    OutputAudioRawFrame,
+    StartFrame,
+    TextFrame,
+    TranscriptionFrame,
+    TTSAudioRawFrame,
+    TTSSpeakFrame,
+    TTSStartedFrame,
+    TTSStoppedFrame,
+)
+from pipecat.metrics.metrics import TTFBMetricsData
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+from pipecat.services.llm_service import LLMService
+from pipecat.services.stt_service import STTService
+from pipecat.services.tts_service import TTSService
+from pipecat.transports.base_input import BaseInputTransport
+from pipecat.transports.base_output import BaseOutputTransport
+from pipecat.transports.base_transport import BaseTransport, TransportParams
+from pipecat.utils.time import time_now_iso8601
+
+from audio_codec import pcm16_to_ulaw, ulaw_to_pcm16
+from call_metrics import summarize_ms
+
+TAPES_DIR = Path(os.getenv("TAPES_DIR", Path(__file__).parent / "tapes"))
+RECORD_TAPES = float(os.getenv("RECORD_TAPES", "0"))  # fraction of live calls taped; 0 disables
+TAPE_VERSION = 1
+SAMPLE_RATE = 8000
+
+DEFAULT_TTS_TTFB_MS = 200.0  # for tapes without TTS timing
+DEFAULT_SECS_PER_CHAR = 0.065  # ~15 characters of speech per second
+
+
+def should_tape() -> bool:
+    return RECORD_TAPES > 0 and random.random() < RECORD_TAPES
+
+
+# ── Recording ──
+
+class _Tap(FrameProcessor):
+    """Passes every frame on; downstream ones are shown to the tape first."""
+
+    def __init__(self, tape: "TapeRecorder", point: str):
+        super().__init__()
+        self._tape = tape
+        self._point = point
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+        if direction == FrameDirection.DOWNSTREAM:
+            self._tape.observe(self._point, frame)
+        await self.push_frame(frame, direction)
+
+
+class TapeRecorder:
+    """Builds one call's tape in memory; `save()` writes it once the call has ended."""
+
+    def __init__(self, call_sid: str = ""):
+        self.call_sid = call_sid
+        self.header = {
+            "type": "call",
+            "version": TAPE_VERSION,
+            "call_sid": call_sid,
+            "recorded_at": datetime.now().isoformat(timespec="seconds"),
+            "sample_rate": SAMPLE_RATE,
+        }
+        self.events: list[dict] = []
+        self._t0: float | None = None
+        self._tts_bytes = 0
+
+    def configure(self, **config):
+        """What run_bot was called with, so a replay can call it the same way."""
+        self.header.update(config)
+
+    def tap(self, point: str) -> FrameProcessor:
+        """A pass-through processor recording the frames seen at `point`
+        ("stt", "llm_in", "llm_out", "tts_in", "tts_out" or "out")."""
+        return _Tap(self, point)
+
+    def _add(self, kind: str, **fields):
+        self.events.append({"t": round(time.monotonic() - self._t0, 4), "type": kind, **fields})
+
+    def observe(self, point: str, frame: Frame):
+        if self._t0 is None:
+            self._t0 = time.monotonic()  # the StartFrame, at the first tap
+        if point == "stt":
+            if isinstance(frame, InputAudioRawFrame):
+                self.header["sample_rate"] = frame.sample_rate
+                self._add("audio", data=base64.b64encode(pcm16_to_ulaw(frame.audio)).decode())
+            elif isinstance(frame, TranscriptionFrame):
+                self._add("transcript", text=frame.text)
+            elif isinstance(frame, InterimTranscriptionFrame):
+                self._add("interim", text=frame.text)
+        elif point == "llm_in":
+            if isinstance(frame, LLMContextFrame):
+                self._add("llm_request")
+        elif point == "llm_out":
+            if isinstance(frame, LLMFullResponseStartFrame):
+                self._add("llm_start")
+            elif isinstance(frame, LLMTextFrame):
+                self._add("llm_text", text=frame.text)
+            elif isinstance(frame, LLMFullResponseEndFrame):
+                self._add("llm_end")
+            elif isinstance(frame, FunctionCallInProgressFrame):
+                self._add("function_call", name=frame.function_name, arguments=frame.arguments)
+        elif point == "tts_in":
+            if isinstance(frame, (TextFrame, TTSSpeakFrame)) and frame.text.strip():
+                self._add("tts_request", text=frame.text.strip())
+        elif point == "tts_out":
+            if isinstance(frame, MetricsFrame):
+                for data in frame.data:
+                    if isinstance(data, TTFBMetricsData) and data.value and "TTS" in data.processor:
+                        self._add("tts_ttfb", ms=round(data.value * 1000, 1))
+            elif isinstance(frame, TTSAudioRawFrame):
+                self._tts_bytes += len(frame.audio)
+            elif isinstance(frame, TTSStoppedFrame) and self._tts_bytes:
+                self._add("tts_audio", secs=round(self._tts_bytes / (2 * self.header["sample_rate"]), 3))
+                self._tts_bytes = 0
+        elif point == "out":
+            if isinstance(frame, BotStartedSpeakingFrame):
+                self._add("bot_started")
+            elif isinstance(frame, BotStoppedSpeakingFrame):
+                self._add("bot_stopped")
+
+    def finish(self, metrics: dict):
+        self.events.append({"type": "metrics", "metrics": metrics})
+
+    def save(self) -> Path | None:
+        """Write the tape (blocking; call off the event loop). Tapes without a call_sid aren't kept."""
+        if not self.call_sid:
+            return None
+        path = TAPES_DIR / date.today().isoformat() / f"{self.call_sid}.jsonl.gz"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with gzip.open(path, "wt", compresslevel=6) as f:
+            for record in (self.header, *self.events):
+                f.write(json.dumps(record, separators=(",", ":")) + "\n")
+        return path
+
+
+def load_tape(path: str | Path) -> tuple[dict, list[dict]]:
+    with gzip.open(path, "rt") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    if not records or records[0].get("type") != "call" or records[0].get("version") != TAPE_VERSION:
+        raise ValueError(f"{path}: not a version {TAPE_VERSION} call tape")
+    return records[0], records[1:]
+
+
+def turn_latencies(events: list[dict]) -> list[float]:
+    """ms from the caller's last final transcript to the bot starting to speak, per answered turn.
+
+    Transcripts that arrive while the bot is talking don't open a turn, so a
+    pause between chunks of one reply is never counted as an answer."""
+    latencies, heard, speaking = [], None, False
+    for e in events:
+        if e["type"] == "transcript" and not speaking:
+            heard = e["t"]
+        elif e["type"] == "bot_started":
+            if heard is not None:
+                latencies.append(round((e["t"] - heard) * 1000, 1))
+            heard, speaking = None, True
+        elif e["type"] == "bot_stopped":
+            speaking = False
+    return latencies
+
+
+def _llm_responses(events: list[dict]) -> list[dict]:
+    """Recorded LLM responses, each timed from the request that produced it.
+
+    A response with no request since the previous one was triggered by a
+    function result; it is timed from the end of the response that called."""
+    responses, request_at, current = [], None, None
+    for e in events:
+        kind = e["type"]
+        if kind == "llm_request":
+            request_at = e["t"]
+        elif kind == "llm_start":
+            after_tool = request_at is None
+            at = responses[-1]["end_at"] if after_tool and responses else (request_at or e["t"])
+            current = {"at": at, "after_tool": after_tool, "chunks": [], "calls": []}
+            request_at = None
+        elif current is None:
+            continue
+        elif kind == "llm_text":
+            current["chunks"].append((e["t"] - current["at"], e["text"]))
+        elif kind == "function_call":
+            current["calls"].append(e["name"])
+        elif kind == "llm_end":
+            current["end"] = e["t"] - current["at"]
+            current["end_at"] = e["t"]
+            responses.append(current)
+            current = None
+    return responses
+
+
+# ── Replay services ──
+
+class _Clock:
+    """Seconds since the replay started; shared by the replay transport and services."""
+
+    def __init__(self):
+        self._t0: float | None = None
+
+    def start(self):
+        if self._t0 is None:
+            self._t0 = time.monotonic()
+
+    def now(self) -> float:
+        return time.monotonic() - self._t0 if self._t0 is not None else 0.0
+
+    async def until(self, t: float):
+        await asyncio.sleep(max(0.0, t - self.now()))
+
+
+class ReplaySTTService(STTService):
+    """Emits the tape's transcripts at their recorded times; the audio it receives is ignored."""
+
+    def __init__(self, clock: _Clock, events: list[dict], **kwargs):
+        super().__init__(**kwargs)
+        self._replay_clock = clock
+        self._events = [e for e in events if e["type"] in ("transcript", "interim")]
+        self._task = None
+
+    async def start(self, frame: StartFrame):
+        await super().start(frame)
+        self._replay_clock.start()
+        if not self._task:
+            self._task = self.create_task(self._play())
+
+    async def stop(self, frame: EndFrame):
+        await super().stop(frame)
+        await self._stop_task()
+
+    async def cancel(self, frame: CancelFrame):
+        await super().cancel(frame)
+        await self._stop_task()
+
+    async def _stop_task(self):
+        if self._task:
+            await self.cancel_task(self._task)
+            self._task = None
+
+    async def _play(self):
+        for e in self._events:
+            await self._replay_clock.until(e["t"])
+            frame_class = TranscriptionFrame if e["type"] == "transcript" else InterimTranscriptionFrame
+            await self.push_frame(frame_class(e["text"], "", time_now_iso8601()))
+
+    async def run_stt(self, audio: bytes) -> AsyncGenerator[Frame, None]:
+        return
+        yield  # transcripts come from the tape, on its clock
+
+
+class ReplayLLMService(LLMService):
+    """Answers each request with the recorded response nearest in time, at the recorded pace.
+
+    Responses are matched by time rather than by count, so a pipeline change
+    that asks the LLM more or less often than the recorded call did still
+    lines up with the conversation. Recorded function calls are logged, not
+    run; their follow-up response plays straight after, like a result would
+    have triggered it."""
+
+    MATCH_SLACK_SECS = 5.0  # a request further than this from any recorded one is logged as unmatched
+
+    def __init__(self, clock: _Clock, events: list[dict], **kwargs):
+        super().__init__(**kwargs)
+        self._replay_clock = clock
+        self._responses = _llm_responses(events)
+        self._cursor = 0
+        self._played = 0
+        self._skipped = 0
+        self._unmatched = 0
+
+    def can_generate_metrics(self) -> bool:
+        return True
+
+    def _pick(self) -> list[dict]:
+        now = self._replay_clock.now()
+        candidates = [i for i in range(self._cursor, len(self._responses)) if not self._responses[i]["after_tool"]]
+        if not candidates:
+            return []
+        i = min(candidates, key=lambda i: abs(self._responses[i]["at"] - now))
+        if abs(self._responses[i]["at"] - now) > self.MATCH_SLACK_SECS:
+            self._unmatched += 1
+        self._skipped += sum(1 for j in candidates if j < i)
+        picked = [self._responses[i]]
+        while picked[-1]["calls"] and i + 1 < len(self._responses) and self._responses[i + 1]["after_tool"]:
+            i += 1
+            picked.append(self._responses[i])
+        self._cursor = i + 1
+        return picked
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+        if isinstance(frame, LLMContextFrame):
+            await self._respond(self._pick())
+        else:
+            await self.push_frame(frame, direction)
+
+    async def _respond(self, responses: list[dict]):
+        if not responses:
+            logger.warning("📼 Replay: no recorded LLM response left for this request")
+            self._unmatched += 1
+        started = time.monotonic()
+        for response in responses:
+            await self.push_frame(LLMFullResponseStartFrame())
+            await self.start_ttfb_metrics()
+            for offset, text in response["chunks"]:
+                await asyncio.sleep(max(0.0, started + offset - time.monotonic()))
+                await self.stop_ttfb_metrics()
+                await self._push_llm_text(text)
+            for name in response["calls"]:
+                logger.debug(f"📼 Replay: skipping recorded function call {name}")
+            await asyncio.sleep(max(0.0, started + response["end"] - time.monotonic()))
+            await self.push_frame(LLMFullResponseEndFrame())
+            self._played += 1
+            started += response["end"]
+
+    def stats(self) -> dict:
+        return {
+            "replay": {
+                "recorded": len(self._responses),
+                "played": self._played,
+                "skipped": self._skipped,
+                "unmatched": self._unmatched,
+            }
+        }
+
+
+class ReplayTTSService(TTSService):
+    """Silence of the recorded length per character, after the recorded TTFB for that text."""
+
+    def __init__(self, events: list[dict], **kwargs):
+        super().__init__(**kwargs)
+        requests = [e["text"] for e in events if e["type"] == "tts_request"]
+        ttfbs = [e["ms"] for e in events if e["type"] == "tts_ttfb"]
+        audio_secs = sum(e["secs"] for e in events if e["type"] == "tts_audio")
+        # TTFBs pair with requests in order only if every request reported one
+        self._ttfb_by_text = dict(zip(requests, ttfbs)) if len(requests) == len(ttfbs) else {}
+        self._median_ttfb = median(ttfbs) if ttfbs else DEFAULT_TTS_TTFB_MS
+        chars = sum(len(t) for t in requests)
+        self._secs_per_char = audio_secs / chars if audio_secs and chars else DEFAULT_SECS_PER_CHAR
+
+    def can_generate_metrics(self) -> bool:
+        return True
+
+    async def run_tts(self, text: str, context_id: str) -> AsyncGenerator[Frame, None]:
+        await self.start_ttfb_metrics()
+        await asyncio.sleep(self._ttfb_by_text.get(text.strip(), self._median_ttfb) / 1000)
+        yield TTSStartedFrame(context_id=context_id)
+        silence = bytes(2 * int(len(text.strip()) * self._secs_per_char * self.sample_rate))
+        for i in range(0, len(silence), self.chunk_size):
+            await self.stop_ttfb_metrics()
+            yield TTSAudioRawFrame(silence[i:i + self.chunk_size], self.sample_rate, 1, context_id=context_id)
+        yield TTSStoppedFrame(context_id=context_id)
+
+
+# ── Replay transport ──
+
+class _ReplayInput(BaseInputTransport):
+    """Plays the tape's caller audio in real time, then hangs up when the recorded call did."""
+
+    def __init__(self, transport: "ReplayTransport", params: TransportParams, **kwargs):
+        super().__init__(params, **kwargs)
+        self._transport = transport
+        self._task = None
+
+    async def start(self, frame: StartFrame):
+        await super().start(frame)
+        if self._task:
+            return
+        self._transport.clock.start()
+        await self._transport._call_event_handler("on_client_connected", None)
+        self._task = self.create_task(self._play())
+        await self.set_transport_ready(frame)
+
+    async def stop(self, frame: EndFrame):
+        await super().stop(frame)
+        await self._stop_task()
+
+    async def cancel(self, frame: CancelFrame):
+        await super().cancel(frame)
+        await self._stop_task()
+
+    async def _stop_task(self):
+        if self._task:
+            await self.cancel_task(self._task)
+            self._task = None
+
+    async def _play(self):
+        clock, rate = self._transport.clock, self._transport.sample_rate
+        for t, data in self._transport.audio:
+            await clock.until(t)
+            await self.push_audio_frame(InputAudioRawFrame(ulaw_to_pcm16(data), rate, 1))
+        await clock.until(self._transport.ended_at)
+        await self._transport._call_event_handler("on_client_disconnected", None)
+
+
+class _ReplayOutput(BaseOutputTransport):
+    """Takes the bot's audio at the pace the websocket transport would send it."""
+
+    def __init__(self, params: TransportParams, **kwargs):
+        super().__init__(params, **kwargs)
+        self._send_interval = 0.0
+        self._next_send_time = 0.0
+
+    async def start(self, frame: StartFrame):
+        await super().start(frame)
+        self._send_interval = self.audio_chunk_size / 2 / self.sample_rate
+        await self.set_transport_ready(frame)
+
+    async def write_audio_frame(self, frame: OutputAudioRawFrame) -> bool:
+        now = time.monotonic()
+        sleep = max(0.0, self._next_send_time - now)
+        await asyncio.sleep(sleep)
+        self._next_send_time = (now if sleep == 0 else self._next_send_time) + self._send_interval
+        return True
+
+
+class ReplayTransport(BaseTransport):
+    """Stands in for the Twilio websocket transport during a replay."""
+
+    def __init__(self, clock: _Clock, header: dict, events: list[dict]):
+        super().__init__()
+        self.clock = clock
+        self.sample_rate = header.get("sample_rate", SAMPLE_RATE)
+        self.audio = [(e["t"], base64.b64decode(e["data"])) for e in events if e["type"] == "audio"]
+        self.ended_at = max((e["t"] for e in events if "t" in e), default=0.0)
+        params = TransportParams(audio_in_enabled=True, audio_out_enabled=True)
+        self._input = _ReplayInput(self, params)
+        self._output = _ReplayOutput(params)
+        self._register_event_handler("on_client_connected")
+        self._register_event_handler("on_client_disconnected")
+
+    def input(self) -> FrameProcessor:
+        return self._input
+
+    def output(self) -> FrameProcessor:
+        return self._output
+
+
+# ── Replay ──
+
+def _samples(metrics: dict, events: list[dict]) -> dict:
+    return {
+        "turn_ms": turn_latencies(events),
+        "llm_ttfb_ms": metrics.get("llm_ttfb_ms", []),
+        "tts_ttfb_ms": metrics.get("tts_ttfb_ms", []),
+    }
+
+
+def _summary(samples: dict) -> dict:
+    return {
+        "turn": summarize_ms(samples["turn_ms"]),
+        "llm_ttfb": summarize_ms(samples["llm_ttfb_ms"]),
+        "tts_ttfb": summarize_ms(samples["tts_ttfb_ms"]),
+    }
+
+
+def apply_overrides(overrides: dict[str, str]):
+    """Set `bot` module knobs (e.g. TTS_CHUNKING) for the replays that follow."""
+    import bot
+
+    for name, value in overrides.items():
+        if not hasattr(bot, name):
+            raise ValueError(f"bot has no setting {name}")
+        current = getattr(bot, name)
+        if isinstance(current, bool):
+            setattr(bot, name, value.lower() in ("1", "true", "yes"))
+        else:
+            setattr(bot, name, type(current)(value))
+
+
+async def replay(path: str | Path) -> dict:
+    """Replay one tape through run_bot; returns recorded vs replayed latency samples."""
+    import bot
+
+    header, events = load_tape(path)
+    clock = _Clock()
+    replayed = TapeRecorder()  # the replay's own tape, so turn latency is measured the same way
+    llm = ReplayLLMService(clock, events)
+    call_metrics = {}
+    await bot.run_bot(
+        ReplayTransport(clock, header, events),
+        False,
+        header.get("system_prompt", ""),
+        header.get("greeting", ""),
+        header.get("voice_id", ""),
+        "",  # no Cal.com: recorded function calls aren't run
+        "",
+        agent_id=header.get("agent_id", ""),
+        output_filters=header.get("output_filters"),
+        call_context=header.get("call_context", ""),
+        services={
+            "stt": ReplaySTTService(clock, events),
+            "llm": llm,
+            "tts": ReplayTTSService(events, aggregate_sentences=bot.TTS_CHUNKING != "adaptive"),
+        },
+        tape=replayed,
+        call_metrics=call_metrics,
+    )
+    recorded = next((e["metrics"] for e in reversed(events) if e["type"] == "metrics"), {})
+    return {
+        "tape": str(path),
+        "call_sid": header.get("call_sid", ""),
+        "recorded": _samples(recorded, events),
+        "replay": _samples(call_metrics, replayed.events),
+        "llm": llm.stats()["replay"],
+        "tts_chunking": call_metrics.get("tts_chunking"),
+    }
+
+
+async def replay_all(paths: list[Path], concurrency: int = 4) -> dict:
+    """Replay tapes side by side; per-tape and pooled latency summaries."""
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one(path: Path) -> dict:
+        async with gate:
+            logger.info(f"📼 Replaying {path}")
+            return await replay(path)
+
+    results = await asyncio.gather(*(one(p) for p in paths))
+    pooled = {
+        side: {key: [v for r in results for v in r[side][key]] for key in ("turn_ms", "llm_ttfb_ms", "tts_ttfb_ms")}
+        for side in ("recorded", "replay")
+    }
+    return {
+        "tapes": [
+            {**{k: r[k] for k in ("tape", "call_sid", "llm", "tts_chunking")},
+             "recorded": _summary(r["recorded"]), "replay": _summary(r["replay"])}
+            for r in results
+        ],
+        "recorded": _summary(pooled["recorded"]),
+        "replay": _summary(pooled["replay"]),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Replay call tapes and compare per-stage latency")
+    parser.add_argument("tapes", nargs="+", help="tape files or directories of them")
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=VALUE",
+                        help="override a bot.py setting for the replay, e.g. TTS_CHUNKING=sentence")
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    paths = []
+    for arg in args.tapes:
+        p = Path(arg)
+        paths.extend(sorted(p.rglob("*.jsonl.gz")) if p.is_dir() else [p])
+    apply_overrides(dict(s.split("=", 1) for s in args.set))
+    print(json.dumps(asyncio.run(replay_all(paths, args.concurrency)), indent=2))
@@ -0,0 +1,195 @@
+"""Token-bounded LLM context for long calls.
+
+The leading system messages (the ~10k-token static prompt with the knowledge
+base, and the per-call details) are always kept, as are the last `keep_turns`
+user turns verbatim. When the conversation history goes over
+`max_history_tokens`, the oldest turns are folded into a short structured
+summary of what the caller already told us (email, appointment day/time,
+qualification answers), which is sent as a system message right after them.
+The system prompt stays first and unchanged, so the cached prompt prefix is
+not disturbed.
+"""
+
+import json
+import re
+
+from loguru import logger
+from pipecat.frames.frames import Frame, LLMContextFrame
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+
+from tokens import count_tokens
+
+SUMMARY_HEADER = "Summary of earlier in this call (older turns removed — do not ask for these again):"
+
+
+def _role(message) -> str | None:
+    # LLMContext may also hold provider-specific message objects; treat them as opaque
+    return message.get("role") if isinstance(message, dict) else None
+
+
+def message_tokens(message) -> int:
+    if not isinstance(message, dict):
+        return count_tokens(str(message)) + 4
+    content = message.get("content") or ""
+    if not isinstance(content, str):
+        content = json.dumps(content)
+    if message.get("tool_calls"):
+        content += json.dumps(message["tool_calls"])
+    return count_tokens(content) + 4  # per-message overhead
+
+
+# ── Field extraction ──
+
+EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+SPOKEN_EMAIL_RE = re.compile(r"([\w.+-]+)\s+at\s+([\w-]+)\s+dot\s+(com|net|org|edu|gov|io|us|co)\b", re.I)
+DAY_RE = re.compile(
+    r"\b(today|tomorrow|monday|tuesday|wednesday|thursday|friday|saturday|sunday|next week)\b", re.I
+)
+TIME_RE = re.compile(
+    r"\b(\d{1,2}(?::\d{2})?\s*(?:am|pm|a\.m\.|p\.m\.)|noon|morning|afternoon|evening|"
+    r"(?:one|two|three|four|five|six|seven|eight|nine|ten|eleven|twelve)(?:\s+o'clock|\s+thirty)?)\b",
+    re.I,
+)
+
+# Assistant question keywords → field that the caller's next answer fills
+QUESTION_FIELDS = [
+    ("email", ("email",)),
+    ("appointment_time", ("what time",)),
+    ("appointment_day", ("what day", "which day")),
+    ("pain_point", ("biggest impact", "leaks", "rust", "energy bills")),
+    ("building_type", ("describe your building", "type of building")),
+    ("roof_size", ("square feet", "size of your")),
+    ("roof_age_warranty", ("how old", "warranty")),
+    ("role", ("your role", "describes your role")),
+    ("decision_maker", ("decision maker", "board approval")),
+    ("ownership", ("are you the owner", "facility manager")),
+    ("roof_condition", ("storm", "damage", "the roof")),
+]
+
+
+def _question_field(text: str) -> str | None:
+    text = text.lower()
+    for field, keywords in QUESTION_FIELDS:
+        if any(k in text for k in keywords):
+            return field
+    return None
+
+
+def extract_fields(messages: list[dict], fields: dict) -> dict:
+    """Collect caller info (email, appointment day/time, qualification answers) into `fields`.
+
+    An assistant question sets which field the next user message answers; a
+    question left unanswered is kept as fields["_pending"] for the next call.
+    """
+    pending_field = fields.pop("_pending", None)
+    for msg in messages:
+        content = msg.get("content") if isinstance(msg, dict) else None
+        if not isinstance(content, str) or not content:
+            continue
+        if _role(msg) == "assistant":
+            pending_field = _question_field(content) or pending_field
+        elif _role(msg) == "user":
+            if m := EMAIL_RE.search(content):
+                fields["email"] = m.group(0).lower()
+            elif m := SPOKEN_EMAIL_RE.search(content):
+                fields["email"] = f"{m.group(1)}@{m.group(2)}.{m.group(3)}".lower()
+            elif pending_field == "email":
+                fields["email"] = content.strip()[:160]  # spelled out; keep as said
+            if pending_field in ("appointment_day", "appointment_time"):
+                # "Tuesday at 3" answers both questions
+                if m := DAY_RE.search(content):
+                    fields["appointment_day"] = m.group(1).lower()
+                if m := TIME_RE.search(content):
+                    fields["appointment_time"] = m.group(1).lower()
+            elif pending_field and pending_field != "email":
+                fields[pending_field] = content.strip()[:160]
+            pending_field = None
+        elif _role(msg) == "tool":
+            fields["tool_result"] = content.strip()[:160]
+    if pending_field:
+        fields["_pending"] = pending_field
+    return fields
+
+
+class ContextWindowManager(FrameProcessor):
+    """Enforces a token budget on the conversation history before each LLM call.
+
+    Place between the user context aggregator and the LLM. Folds old turns in
+    place in the shared LLMContext, so the assistant aggregator keeps appending
+    to the trimmed history.
+    """
+
+    def __init__(self, max_history_tokens: int = 2500, keep_turns: int = 6, metrics: dict | None = None):
+        super().__init__()
+        self._max_history_tokens = max_history_tokens
+        self._keep_turns = keep_turns
+        self.fields = {}  # collected caller info from folded turns
+        self.folded_turns = 0
+        self._history_tokens = (metrics if metrics is not None else {}).setdefault("context_history_tokens", [])
+
+    def _absorb(self, turn: list[dict]):
+        """Pull structured fields out of a turn before it is dropped."""
+        extract_fields(turn, self.fields)
+
+    def _summary_message(self) -> dict:
+        lines = [SUMMARY_HEADER]
+        lines += [f"- {k}: {v}" for k, v in self.fields.items() if not k.startswith("_")]
+        lines.append(f"- earlier turns folded: {self.folded_turns}")
+        return {"role": "system", "content": "\n".join(lines)}
+
+    def enforce(self, messages: list[dict]) -> list[dict] | None:
+        """Return the trimmed message list, or None if it is within budget."""
+        # Leading system messages: static prompt + call details
+        head = []
+        for m in messages:
+            if _role(m) != "system" or str(m.get("content", "")).startswith(SUMMARY_HEADER):
+                break
+            head.append(m)
+        body = [
+            m for m in messages[len(head):]
+            if not (_role(m) == "system" and str(m.get("content", "")).startswith(SUMMARY_HEADER))
+        ]
+
+        # Split the history into turns, each starting at a user message
+        turns = [[]]
+        for msg in body:
+            if _role(msg) == "user" and turns[-1]:
+                turns.append([])
+            turns[-1].append(msg)
+
+        sizes = [sum(message_tokens(m) for m in t) for t in turns]
+        total = sum(sizes)
+        self._history_tokens.append(total)
+        if total <= self._max_history_tokens or len(turns) <= self._keep_turns:
+            return None
+
+        fold = 0
+        while total > self._max_history_tokens and len(turns) - fold > self._keep_turns:
+            self._absorb(turns[fold])
+            total -= sizes[fold]
+            fold += 1
+        if not fold:
+            return None
+
+        self.folded_turns += fold
+        self._history_tokens[-1] = total
+        logger.debug(f"🗜️ Folded {fold} old turns into summary ({total} history tokens kept)")
+        kept = [m for t in turns[fold:] for m in t]
+        return head + [self._summary_message()] + kept
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if isinstance(frame, LLMContextFrame) and self._max_history_tokens > 0:
+            trimmed = self.enforce(frame.context.get_messages())
+            if trimmed is not None:
+                frame.context.set_messages(trimmed)
+
+        await self.push_frame(frame, direction)
+
+    def stats(self) -> dict:
+        return {
+            "folded_turns": self.folded_turns,
+            "fields": {k: v for k, v in self.fields.items() if not k.startswith("_")},
+            "max_history_tokens": max(self._history_tokens, default=0),
+        }
@@ -1,19 +1,31 @@
 """SQLite database for multi-agent voice system.
 
-Tables: agents, knowledge_base, call_logs
+Tables: agents, contacts, campaigns, call_logs, bookings
+Knowledge base: kb_documents (content-addressed, stored once) + agent_knowledge (agent ↔ document links),
+kb_chunks (per-document chunks), kb_sources (ingestion manifest, see kb_ingest.py)
+Rollups: call_stats_hourly, call_stats_daily (maintained by log_call/update_call_log)
+FTS5: transcript_fts (one row per transcript turn)
 """
 
 import sqlite3
 import os
+import json
+import hashlib
+import time
 from datetime import datetime
 from pathlib import Path
 
-DB_PATH = os.path.join(os.path.dirname(__file__), "voice_agent.db")
+from loguru import logger
+
+from payload_codec import codec
+from tokens import count_tokens
+
+DB_PATH = os.getenv("VOICE_AGENT_DB", os.path.join(os.path.dirname(__file__), "voice_agent.db"))
 KNOWLEDGE_DIR = Path(__file__).parent.parent / "knowledge"
 
 
-def get_db():
-    conn = sqlite3.connect(DB_PATH)
+def get_db(check_same_thread: bool = True):
+    conn = sqlite3.connect(DB_PATH, check_same_thread=check_same_thread)
     conn.row_factory = sqlite3.Row
     return conn
 
@@ -38,14 +50,48 @@ def init_db():
         )
     """)
 
+    # KB documents are stored once per distinct content; agents link to them by hash
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS kb_documents (
+            hash TEXT PRIMARY KEY,
+            content TEXT NOT NULL,
+            token_count INTEGER NOT NULL,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
     c.execute("""
-        CREATE TABLE IF NOT EXISTS knowledge_base (
+        CREATE TABLE IF NOT EXISTS agent_knowledge (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             agent_id TEXT NOT NULL,
             title TEXT NOT NULL,
-            content TEXT NOT NULL,
+            doc_hash TEXT NOT NULL,
             created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (agent_id) REFERENCES agents(id)
+            FOREIGN KEY (agent_id) REFERENCES agents(id),
+            FOREIGN KEY (doc_hash) REFERENCES kb_documents(hash)
+        )
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_agent_knowledge_agent ON agent_knowledge (agent_id, id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_agent_knowledge_doc ON agent_knowledge (doc_hash)")
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS kb_chunks (
+            doc_hash TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            heading TEXT,
+            text TEXT NOT NULL,
+            token_count INTEGER NOT NULL,
+            PRIMARY KEY (doc_hash, seq)
+        )
+    """)
+    # Ingestion manifest: lets re-ingestion skip files whose mtime/size (or content hash) didn't change
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS kb_sources (
+            path TEXT PRIMARY KEY,
+            mtime_ns INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            file_hash TEXT NOT NULL,
+            doc_hash TEXT NOT NULL,
+            title TEXT,
+            ingested_at TEXT DEFAULT CURRENT_TIMESTAMP
         )
     """)
 
@@ -103,10 +149,175 @@ def init_db():
         )
     """)
 
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS bookings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            idempotency_key TEXT NOT NULL UNIQUE,
+            agent_id TEXT,
+            call_sid TEXT,
+            cal_api_key TEXT,
+            event_type_id TEXT,
+            name TEXT,
+            email TEXT,
+            phone TEXT,
+            start_time TEXT NOT NULL,
+            status TEXT DEFAULT 'pending',
+            attempts INTEGER DEFAULT 0,
+            next_attempt_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            last_error TEXT,
+            cal_booking_uid TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (agent_id) REFERENCES agents(id)
+        )
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_bookings_due ON bookings (status, next_attempt_at)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_bookings_call_sid ON bookings (call_sid)")
+
+    # Columns added after the initial schema
+    _add_column(c, "agents", "output_filters", "TEXT")  # JSON list of phrases
+    _add_column(c, "agents", "llm_routing", "TEXT")  # JSON {"providers": [...], "hedge": bool}
+    _add_column(c, "call_logs", "metrics", "TEXT")  # JSON per-call pipeline metrics
+    _add_column(c, "call_logs", "outcome", "TEXT")  # scheduled, voicemail, booking-failed, ...
+    _add_column(c, "agents", "record_calls", "INTEGER DEFAULT 0")
+    _add_column(c, "campaigns", "record_calls", "INTEGER")  # NULL = use the agent's setting
+    _add_column(c, "call_logs", "recording_path", "TEXT")
+    _add_column(c, "call_logs", "analysis", "TEXT")  # JSON post-call classification + captured fields
+    _add_column(c, "call_logs", "analyzed_at", "TEXT")
+    _add_column(c, "agents", "kb_version", "TEXT")  # hash of the agent's (title, document) list
+    _add_column(c, "agents", "kb_tokens", "INTEGER DEFAULT 0")
+    _add_column(c, "agent_knowledge", "source", "TEXT")  # ingested file (kb_sources.path); NULL for pasted text
+    _add_column(c, "contacts", "timezone", "TEXT")  # IANA zone; "" = unknown, NULL = not resolved yet
+    added_attempts = _add_column(c, "contacts", "attempts", "INTEGER DEFAULT 0")  # dials placed by campaign runs
+    _add_column(c, "contacts", "next_attempt_at", "TEXT")  # retry not before (UTC)
+    if added_attempts:
+        # Once, when attempts is added: contacts already dialed count one dial, and those whose
+        # call went unanswered recently are requeued like any other retry
+        sids = [r[0] for r in c.execute(
+            "SELECT call_sid FROM contacts WHERE status != 'pending' AND IFNULL(call_sid, '') != ''"
+        ).fetchall()]
+        c.execute("UPDATE contacts SET attempts = 1 WHERE status != 'pending' AND IFNULL(call_sid, '') != ''")
+        if sids:
+            from dial_scheduler import schedule_retries
+
+            finished = []
+            for start in range(0, len(sids), 500):
+                chunk = sids[start:start + 500]
+                finished += [tuple(r) for r in c.execute(
+                    f"SELECT call_sid, status, outcome FROM call_logs WHERE call_sid IN ({', '.join('?' for _ in chunk)})",
+                    chunk,
+                )]
+            schedule_retries(c, finished)
+    _add_column(c, "call_logs", "local_hour", "INTEGER")  # callee's local hour when dialed
+
+    # Move the old one-copy-per-agent knowledge_base table into documents + links (same ids)
+    if c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'knowledge_base'").fetchone():
+        rows = c.execute("SELECT id, agent_id, title, content, created_at FROM knowledge_base ORDER BY id").fetchall()
+        for row in rows:
+            c.execute(
+                "INSERT INTO agent_knowledge (id, agent_id, title, doc_hash, created_at) VALUES (?, ?, ?, ?, ?)",
+                (row["id"], row["agent_id"], row["title"], _put_document(c, row["content"]), row["created_at"]),
+            )
+        for agent_id in {row["agent_id"] for row in rows}:
+            _refresh_kb_version(c, agent_id)
+        c.execute("DROP TABLE knowledge_base")
+    # Links seeded before ingestion existed: attach them to their source file so re-ingesting updates them
+    for agent_id, files in SEED_KB.items():
+        for title, filename in files:
+            c.execute(
+                "UPDATE agent_knowledge SET source = ? WHERE agent_id = ? AND title = ? AND source IS NULL",
+                (filename, agent_id, title),
+            )
+
+    # call_sid is how Twilio callbacks, transcripts and contacts find their call
+    c.execute("CREATE INDEX IF NOT EXISTS idx_call_logs_call_sid ON call_logs (call_sid)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_contacts_call_sid ON contacts (call_sid)")
+    # Campaign views and reports page through a campaign's contacts by id
+    c.execute("CREATE INDEX IF NOT EXISTS idx_contacts_campaign ON contacts (campaign_id, id)")
+    # Post-call analysis queue: only the not-yet-analyzed calls are in this index
+    c.execute("CREATE INDEX IF NOT EXISTS idx_call_logs_unanalyzed ON call_logs (id) WHERE analyzed_at IS NULL")
+
+    # Per-agent call counters, bumped incrementally on every call_logs write
+    rollups_exist = c.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'call_stats_daily'"
+    ).fetchone()
+    for table, bucket in (("call_stats_hourly", "hour"), ("call_stats_daily", "day")):
+        counters = ",\n".join(f"            {col} INTEGER DEFAULT 0" for col in ROLLUP_COLUMNS)
+        c.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                agent_id TEXT NOT NULL,
+                {bucket} TEXT NOT NULL,
+{counters},
+                PRIMARY KEY (agent_id, {bucket})
+            )
+        """)
+    if not rollups_exist:
+        _rebuild_rollups(c)
+
+    # What's been moved to monthly archive files (archive.py), so queries attach only the months they reach
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS archive_partitions (
+            month TEXT NOT NULL,
+            agent_id TEXT NOT NULL,
+            calls INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (month, agent_id)
+        )
+    """)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS archive_campaigns (
+            campaign_id INTEGER NOT NULL,
+            month TEXT NOT NULL,
+            contacts INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (campaign_id, month)
+        )
+    """)
+
+    # Trained zstd dictionaries for compressed payloads (payload_codec); a value's frame names its dict_id
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS zstd_dicts (
+            dict_id INTEGER PRIMARY KEY,
+            kind TEXT NOT NULL,
+            data BLOB NOT NULL,
+            samples INTEGER,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # Full-text index over transcript turns; rowid = call_logs.id * TURN_ROWID_STRIDE + turn
+    fts_exists = c.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'transcript_fts'"
+    ).fetchone()
+    c.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS transcript_fts USING fts5(
+            text,
+            role UNINDEXED,
+            tokenize = 'porter unicode61'
+        )
+    """)
+    if not fts_exists:
+        for row in c.execute("SELECT id, transcript FROM call_logs WHERE transcript IS NOT NULL").fetchall():
+            _index_transcript(c, row[0], codec.decode(row[1], c))
+
     conn.commit()
     conn.close()
 
 
+def _add_column(c, table: str, column: str, decl: str) -> bool:
+    """Add a column to an existing table if it isn't there yet; True if it was added."""
+    cols = [r[1] for r in c.execute(f"PRAGMA table_info({table})").fetchall()]
+    if column in cols:
+        return False
+    c.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+    return True
+
+
+def setup_db():
+    """Create/migrate the schema and seed agents + KB. Idempotent; run once at startup."""
+    init_db()
+    seed_agents()
+    seed_knowledge_base()
+
+
 def seed_agents():
     """Seed both agents with real data from agents.json."""
     conn = get_db()
@@ -124,8 +335,7 @@ You are Jamie from J&J Roofing Pros in Austin, Texas. You're a real person — n
 
 # Context
 
-You are on an outbound phone call. Today is {{current_date}}.
-Contact: {{first_name}} | Property: {{address}}
+You are on an outbound phone call. Today's date, the contact's name and their property address are in the call details that follow this prompt.
 
 # How to speak
 
@@ -172,7 +382,7 @@ You are Lance, the Senior Intake Director at Royalty Roofing Systems. You are sp
 
 # Environment
 
-You are making outbound phone calls to commercial building owners, facility managers, and decision-makers who have submitted an inquiry on our "Metal Roof Restoration Eligibility" page. You have access to company information, property data, and scheduling tools. When making the first call, Wait for the prospect to say 'Hello' or answer the phone before you start speaking. Today's date is {{current_date}}. Contact: {{first_name}} | Property: {{address}}
+You are making outbound phone calls to commercial building owners, facility managers, and decision-makers who have submitted an inquiry on our "Metal Roof Restoration Eligibility" page. You have access to company information, property data, and scheduling tools. When making the first call, Wait for the prospect to say 'Hello' or answer the phone before you start speaking. Today's date, the contact's name and their property address are in the call details that follow this prompt.
 
 # Tone
 
@@ -268,42 +478,38 @@ Your primary goal is to qualify leads and book site audits for Royalty Roofing S
     conn.close()
 
 
+SEED_KB = {
+    "jamie-jjroofing": [
+        ("JJ Roofing Company Info", "jj-roofing-company.md"),
+        ("Psychology of the Roofing Sale", "psychology-roofing-sale.md"),
+        ("D2D Sales Strategies", "d2d-sales-strategies.md"),
+    ],
+    "alex-royaltyroofing": [
+        ("Royalty Roofing Strategy & Tech", "royalty-roofing-strategy.md"),
+        ("Psychology of the Roofing Sale", "psychology-roofing-sale.md"),
+    ],
+}
+
+
 def seed_knowledge_base():
-    """Seed KB from actual markdown files."""
-    conn = get_db()
-    c = conn.cursor()
+    """Seed KB from actual markdown files (through the ingestion pipeline, in-process)."""
+    from kb_ingest import ingest
 
-    c.execute("SELECT COUNT(*) FROM knowledge_base")
-    if c.fetchone()[0] > 0:
-        conn.close()
+    conn = get_db()
+    seeded = conn.execute("SELECT COUNT(*) FROM agent_knowledge").fetchone()[0] > 0
+    conn.close()
+    if seeded:
         return
 
-    kb_mapping = {
-        "jamie-jjroofing": [
-            ("JJ Roofing Company Info", "jj-roofing-company.md"),
-            ("Psychology of the Roofing Sale", "psychology-roofing-sale.md"),
-            ("D2D Sales Strategies", "d2d-sales-strategies.md"),
-        ],
-        "alex-royaltyroofing": [
-            ("Royalty Roofing Strategy & Tech", "royalty-roofing-strategy.md"),
-            ("Psychology of the Roofing Sale", "psychology-roofing-sale.md"),
-        ],
-    }
-
-    for agent_id, files in kb_mapping.items():
-        for title, filename in files:
-            filepath = KNOWLEDGE_DIR / filename
-            if filepath.exists():
-                content = filepath.read_text(encoding="utf-8")
-                c.execute(
-                    "INSERT INTO knowledge_base (agent_id, title, content) VALUES (?, ?, ?)",
-                    (agent_id, title, content),
-                )
+    for agent_id, files in SEED_KB.items():
+        paths = []
+        for _, filename in files:
+            if (KNOWLEDGE_DIR / filename).exists():
+                paths.append(KNOWLEDGE_DIR / filename)
             else:
-                print(f"Warning: KB file not found: {filepath}")
-
-    conn.commit()
-    conn.close()
+                print(f"Warning: KB file not found: {KNOWLEDGE_DIR / filename}")
+        titles = {filename: title for title, filename in files}
+        ingest(paths, agent_ids=[agent_id], titles=titles, workers=0)
 
 
 # ── Query functions ──
@@ -329,44 +535,314 @@ def list_agents() -> list[dict]:
     return [dict(r) for r in rows]
 
 
-def get_knowledge_base(agent_id: str) -> str:
-    """Load and concatenate all KB entries for an agent."""
+def _get_agent_json(agent_id: str, column: str):
+    conn = get_db()
+    row = conn.execute(f"SELECT {column} FROM agents WHERE id = ?", (agent_id,)).fetchone()
+    conn.close()
+    if not row or not row[column]:
+        return None
+    try:
+        return json.loads(row[column])
+    except ValueError:
+        return None
+
+
+def get_output_filters(agent_id: str) -> list[str] | None:
+    """Agent's configured output filter phrases, or None to use the defaults."""
+    filters = _get_agent_json(agent_id, "output_filters")
+    if isinstance(filters, list) and all(isinstance(f, str) for f in filters):
+        return filters
+    return None
+
+
+def get_llm_routing(agent_id: str) -> dict | None:
+    """Agent's stored LLM routing config (unvalidated; llm_router.resolve_routing checks it), or None."""
+    return _get_agent_json(agent_id, "llm_routing")
+
+
+def recording_enabled(agent_id: str, call_sid: str = "") -> bool:
+    """Record this call? The campaign's record_calls overrides the agent's when set."""
+    conn = get_db()
+    row = conn.execute(
+        """SELECT a.record_calls AS agent_record, cp.record_calls AS campaign_record
+           FROM agents a
+           LEFT JOIN contacts ct ON ct.call_sid = ? AND ct.call_sid != ''
+           LEFT JOIN campaigns cp ON cp.id = ct.campaign_id
+           WHERE a.id = ?""",
+        (call_sid, agent_id),
+    ).fetchone()
+    conn.close()
+    if not row:
+        return False
+    if row["campaign_record"] is not None:
+        return bool(row["campaign_record"])
+    return bool(row["agent_record"])
+
+
+# ── Knowledge base ──
+
+# Rendered KB text by kb_version; agents with the same documents share an entry
+_kb_text_cache: dict[str, str] = {}
+KB_TEXT_CACHE_SIZE = 64
+
+
+def kb_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def _put_document(c, content: str, token_count: int | None = None, chunks: list[dict] | None = None) -> str:
+    """Store content (and its chunks) once; returns its hash."""
+    doc_hash = kb_hash(content)
+    if not c.execute("SELECT 1 FROM kb_documents WHERE hash = ?", (doc_hash,)).fetchone():
+        c.execute(
+            "INSERT INTO kb_documents (hash, content, token_count) VALUES (?, ?, ?)",
+            (doc_hash, content, count_tokens(content) if token_count is None else token_count),
+        )
+        if chunks:
+            c.executemany(
+                "INSERT OR REPLACE INTO kb_chunks (doc_hash, seq, heading, text, token_count) VALUES (?, ?, ?, ?, ?)",
+                [(doc_hash, i, ch.get("heading"), ch["text"], ch["token_count"]) for i, ch in enumerate(chunks)],
+            )
+    return doc_hash
+
+
+def _kb_version(rows) -> str | None:
+    listing = "\n".join(f"{r['title']}\0{r['doc_hash']}" for r in rows)
+    return hashlib.sha256(listing.encode("utf-8")).hexdigest()[:16] if rows else None
+
+
+def _refresh_kb_version(c, agent_id: str):
+    """Re-stamp the agent's KB version and token total after its document list changed."""
+    rows = c.execute(
+        """SELECT ak.title, ak.doc_hash, d.token_count FROM agent_knowledge ak
+           JOIN kb_documents d ON d.hash = ak.doc_hash
+           WHERE ak.agent_id = ? ORDER BY ak.id""",
+        (agent_id,),
+    ).fetchall()
+    c.execute(
+        "UPDATE agents SET kb_version = ?, kb_tokens = ? WHERE id = ?",
+        (_kb_version(rows), sum(r["token_count"] for r in rows), agent_id),
+    )
+
+
+def _gc_documents(c):
+    c.execute("DELETE FROM kb_documents WHERE hash NOT IN (SELECT doc_hash FROM agent_knowledge)")
+    c.execute("DELETE FROM kb_chunks WHERE doc_hash NOT IN (SELECT hash FROM kb_documents)")
+
+
+def list_knowledge(agent_id: str) -> list[dict]:
     conn = get_db()
     rows = conn.execute(
-        "SELECT title, content FROM knowledge_base WHERE agent_id = ? ORDER BY id",
+        """SELECT ak.id, ak.agent_id, ak.title, d.content, ak.doc_hash, d.token_count, ak.created_at
+           FROM agent_knowledge ak JOIN kb_documents d ON d.hash = ak.doc_hash
+           WHERE ak.agent_id = ? ORDER BY ak.id""",
         (agent_id,),
     ).fetchall()
     conn.close()
+    return [dict(r) for r in rows]
+
+
+def add_knowledge(agent_id: str, title: str, content: str) -> int:
+    conn = get_db()
+    c = conn.cursor()
+    c.execute(
+        "INSERT INTO agent_knowledge (agent_id, title, doc_hash) VALUES (?, ?, ?)",
+        (agent_id, title, _put_document(c, content)),
+    )
+    kb_id = c.lastrowid
+    _refresh_kb_version(c, agent_id)
+    conn.commit()
+    conn.close()
+    return kb_id
+
+
+def update_knowledge(agent_id: str, kb_id: int, title: str, content: str) -> bool:
+    conn = get_db()
+    c = conn.cursor()
+    c.execute(
+        "UPDATE agent_knowledge SET title = ?, doc_hash = ? WHERE id = ? AND agent_id = ?",
+        (title, _put_document(c, content), kb_id, agent_id),
+    )
+    updated = c.rowcount > 0
+    _refresh_kb_version(c, agent_id)
+    _gc_documents(c)
+    conn.commit()
+    conn.close()
+    return updated
+
+
+def delete_knowledge(agent_id: str, kb_id: int) -> bool:
+    conn = get_db()
+    c = conn.cursor()
+    c.execute("DELETE FROM agent_knowledge WHERE id = ? AND agent_id = ?", (kb_id, agent_id))
+    deleted = c.rowcount > 0
+    _refresh_kb_version(c, agent_id)
+    _gc_documents(c)
+    conn.commit()
+    conn.close()
+    return deleted
+
+
+def get_kb_manifest() -> dict[str, dict]:
+    """kb_sources rows by path, with whether their document is still stored."""
+    conn = get_db()
+    rows = conn.execute(
+        """SELECT s.*, EXISTS (SELECT 1 FROM kb_documents d WHERE d.hash = s.doc_hash) AS doc_exists
+           FROM kb_sources s"""
+    ).fetchall()
+    conn.close()
+    return {r["path"]: dict(r) for r in rows}
+
+
+def upsert_ingested_knowledge(sources: list[dict], agent_ids: list[str] | None = None) -> dict:
+    """Apply one ingestion run in a single transaction.
+
+    Each source: path, mtime_ns, size, file_hash, plus either the extracted
+    document (content, token_count, chunks, title) or doc_hash for a file
+    whose content didn't change. Sources are linked to `agent_ids`, or to the
+    agents already linking them; an agent's existing link to the same path
+    is updated in place. Sources with no agent to link aren't stored (the
+    document would be garbage-collected anyway); they're listed in `unlinked`.
+    """
+    stats = {"documents_added": 0, "links_added": 0, "links_updated": 0, "unlinked": []}
+    touched = set()
+    conn = get_db()
+    c = conn.cursor()
+    c.execute("BEGIN IMMEDIATE")
+    try:
+        for src in sources:
+            targets = agent_ids or [
+                r[0] for r in c.execute("SELECT DISTINCT agent_id FROM agent_knowledge WHERE source = ?", (src["path"],))
+            ]
+            if not targets:
+                stats["unlinked"].append(src["path"])
+                continue
+            if "content" in src:
+                existed = c.execute("SELECT 1 FROM kb_documents WHERE hash = ?", (kb_hash(src["content"]),)).fetchone()
+                doc_hash = _put_document(c, src["content"], src["token_count"], src["chunks"])
+                stats["documents_added"] += 0 if existed else 1
+            else:
+                doc_hash = src["doc_hash"]
+            c.execute(
+                """INSERT INTO kb_sources (path, mtime_ns, size, file_hash, doc_hash, title, ingested_at)
+                   VALUES (?, ?, ?, ?, ?, ?, datetime('now'))
+                   ON CONFLICT(path) DO UPDATE SET mtime_ns = excluded.mtime_ns, size = excluded.size,
+                     file_hash = excluded.file_hash, doc_hash = excluded.doc_hash,
+                     title = COALESCE(excluded.title, kb_sources.title), ingested_at = excluded.ingested_at""",
+                (src["path"], src["mtime_ns"], src["size"], src["file_hash"], doc_hash, src.get("title")),
+            )
+
+            title = src.get("title") or c.execute("SELECT title FROM kb_sources WHERE path = ?", (src["path"],)).fetchone()[0]
+            for agent_id in targets:
+                link = c.execute(
+                    "SELECT id, doc_hash FROM agent_knowledge WHERE agent_id = ? AND source = ?", (agent_id, src["path"])
+                ).fetchone()
+                if link:
+                    if link["doc_hash"] != doc_hash:
+                        c.execute("UPDATE agent_knowledge SET doc_hash = ? WHERE id = ?", (doc_hash, link["id"]))
+                        stats["links_updated"] += 1
+                        touched.add(agent_id)
+                else:
+                    c.execute(
+                        "INSERT INTO agent_knowledge (agent_id, title, doc_hash, source) VALUES (?, ?, ?, ?)",
+                        (agent_id, title or Path(src["path"]).stem, doc_hash, src["path"]),
+                    )
+                    stats["links_added"] += 1
+                    touched.add(agent_id)
+        for agent_id in touched:
+            _refresh_kb_version(c, agent_id)
+        _gc_documents(c)
+        c.execute("DELETE FROM kb_sources WHERE doc_hash NOT IN (SELECT hash FROM kb_documents)")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    stats["agents_updated"] = sorted(touched)
+    return stats
+
 
-    if not rows:
+def kb_storage_stats() -> dict:
+    """Distinct documents vs. agent links, and the bytes sharing saves."""
+    conn = get_db()
+    docs = conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(CAST(content AS BLOB))), 0) FROM kb_documents").fetchone()
+    links = conn.execute(
+        """SELECT COUNT(*), COALESCE(SUM(LENGTH(CAST(d.content AS BLOB))), 0)
+           FROM agent_knowledge ak JOIN kb_documents d ON d.hash = ak.doc_hash"""
+    ).fetchone()
+    conn.close()
+    return {"documents": docs[0], "links": links[0], "stored_bytes": docs[1], "linked_bytes": links[1]}
+
+
+def get_knowledge_base(agent_id: str) -> str:
+    """Load and concatenate all KB entries for an agent (cached by KB version)."""
+    conn = get_db()
+    row = conn.execute("SELECT kb_version FROM agents WHERE id = ?", (agent_id,)).fetchone()
+    version = row["kb_version"] if row else None
+    if not version:
+        conn.close()
         return ""
+    if version in _kb_text_cache:
+        conn.close()
+        return _kb_text_cache[version]
 
-    sections = []
-    for row in rows:
-        sections.append(f"### {row['title']}\n\n{row['content']}")
+    rows = conn.execute(
+        """SELECT ak.title, ak.doc_hash, d.content FROM agent_knowledge ak
+           JOIN kb_documents d ON d.hash = ak.doc_hash
+           WHERE ak.agent_id = ? ORDER BY ak.id""",
+        (agent_id,),
+    ).fetchall()
+    conn.close()
 
-    return "\n\n---\n\n".join(sections)
+    text = "\n\n---\n\n".join(f"### {row['title']}\n\n{row['content']}" for row in rows)
+    if len(_kb_text_cache) >= KB_TEXT_CACHE_SIZE:
+        _kb_text_cache.clear()
+    # Keyed by what was actually read, in case the KB changed since the version lookup
+    if rows:
+        _kb_text_cache[_kb_version(rows)] = text
+    return text
 
 
-def build_system_prompt(agent: dict, first_name: str, address: str) -> str:
-    """Build final system prompt with variables replaced and KB appended."""
-    template = agent["system_prompt_template"]
-    kb_content = get_knowledge_base(agent["id"])
+# Per-call placeholders. The static prompt refers to the call details instead,
+# so its text (the cacheable prefix) is identical for every call of an agent.
+CALL_VARIABLE_REFS = {
+    "{{first_name}}": "the contact",
+    "{{address}}": "their property",
+    "{{current_date}}": "(see call details)",
+    "{{current_time}}": "(see call details)",
+    "{{caller_timezone}}": "America/Chicago",
+}
 
-    current_date = datetime.now().strftime("%A, %B %d, %Y")
 
-    prompt = template.replace("{{first_name}}", first_name or "there")
-    prompt = prompt.replace("{{address}}", address or "your property")
-    prompt = prompt.replace("{{current_date}}", current_date)
-    prompt = prompt.replace("{{current_time}}", datetime.now().strftime("%I:%M %p"))
-    prompt = prompt.replace("{{caller_timezone}}", "America/Chicago")
+def build_static_prompt(agent: dict) -> str:
+    """Agent template + KB with no per-call content — shared by every call."""
+    prompt = agent["system_prompt_template"]
+    for var, ref in CALL_VARIABLE_REFS.items():
+        prompt = prompt.replace(var, ref)
 
+    kb_content = get_knowledge_base(agent["id"])
     if kb_content:
         prompt += f"\n\n## Knowledge Base\n\n{kb_content}"
 
     return prompt
 
 
+def build_call_context(first_name: str, address: str) -> str:
+    """Per-call details, sent as a separate message after the static prompt."""
+    now = datetime.now()
+    return (
+        "# Call details\n\n"
+        f"Today is {now.strftime('%A, %B %d, %Y')}, {now.strftime('%I:%M %p')} (America/Chicago).\n"
+        f"Contact: {first_name or 'there'} | Property: {address or 'your property'}"
+    )
+
+
+def build_system_prompt(agent: dict, first_name: str, address: str) -> tuple[str, str]:
+    """Build (static prompt, call context) for an outbound call."""
+    return build_static_prompt(agent), build_call_context(first_name, address)
+
+
 def build_greeting(agent: dict, first_name: str, address: str) -> str:
     """Build greeting with variables replaced."""
     greeting = agent["greeting_template"]
@@ -375,29 +851,445 @@ def build_greeting(agent: dict, first_name: str, address: str) -> str:
     return greeting
 
 
-def log_call(agent_id: str, call_sid: str, to_number: str, from_number: str, first_name: str = "", address: str = "") -> int:
+def log_call(
+    agent_id: str,
+    call_sid: str,
+    to_number: str,
+    from_number: str,
+    first_name: str = "",
+    address: str = "",
+    local_hour: int | None = None,
+) -> int:
     conn = get_db()
     c = conn.cursor()
     c.execute(
-        "INSERT INTO call_logs (agent_id, call_sid, to_number, from_number, first_name, address) VALUES (?, ?, ?, ?, ?, ?)",
-        (agent_id, call_sid, to_number, from_number, first_name, address),
+        """INSERT INTO call_logs (agent_id, call_sid, to_number, from_number, first_name, address, local_hour)
+           VALUES (?, ?, ?, ?, ?, ?, ?)""",
+        (agent_id, call_sid, to_number, from_number, first_name, address, local_hour),
     )
-    conn.commit()
     log_id = c.lastrowid
+    row = c.execute(f"SELECT {_ROLLUP_SOURCE} FROM call_logs WHERE id = ?", (log_id,)).fetchone()
+    _bump_rollups(c, row, _rollup_counts(row))
+    conn.commit()
     conn.close()
     return log_id
 
 
 def update_call_log(call_sid: str, **kwargs):
+    update_call_logs([(call_sid, kwargs)])
+
+
+def update_call_logs(updates: list[tuple], key: str = "call_sid"):
+    """Apply several (call_sid or id, fields) updates in one transaction."""
+    assert key in ("call_sid", "id")
     conn = get_db()
+    conn.execute("BEGIN IMMEDIATE")  # old → new rollup delta must not interleave with another writer
+    for value, kwargs in updates:
+        _update_call_log(conn, key, value, kwargs)
+    conn.commit()
+    conn.close()
+
+
+def _update_call_log(conn, key: str, value, kwargs: dict):
+    before = conn.execute(f"SELECT {_ROLLUP_SOURCE} FROM call_logs WHERE {key} = ?", (value,)).fetchall()
     sets = ", ".join(f"{k} = ?" for k in kwargs)
-    vals = list(kwargs.values()) + [call_sid]
-    conn.execute(f"UPDATE call_logs SET {sets} WHERE call_sid = ?", vals)
+    stored = {**kwargs, "transcript": codec.encode(kwargs["transcript"], "transcript", conn)} if "transcript" in kwargs else kwargs
+    vals = list(stored.values()) + [value]
+    conn.execute(f"UPDATE call_logs SET {sets} WHERE {key} = ?", vals)
+    if _ROLLUP_FIELDS & kwargs.keys():
+        for old in before:
+            new = conn.execute(f"SELECT {_ROLLUP_SOURCE} FROM call_logs WHERE id = ?", (old["id"],)).fetchone()
+            old_counts, new_counts = _rollup_counts(old), _rollup_counts(new)
+            _bump_rollups(conn, new, {k: new_counts[k] - old_counts[k] for k in ROLLUP_COLUMNS})
+    if "transcript" in kwargs:
+        for old in before:
+            _index_transcript(conn, old["id"], kwargs["transcript"])
+
+
+def refresh_campaign_counters(campaign_ids):
+    """Recount campaigns.called/scheduled/not_interested/no_answer from their contacts' calls.
+
+    A contact is archived with its call, so the counts are summed partition by
+    partition (hot, then each archived month) rather than over attach_history's views.
+    """
+    counts = """
+        SELECT (SELECT COUNT(*) FROM {s}.contacts WHERE campaign_id = :id AND status != 'pending'),
+               (SELECT COUNT(*) FROM {s}.contacts c JOIN {s}.call_logs cl ON cl.call_sid = c.call_sid
+                WHERE c.campaign_id = :id AND cl.outcome = 'scheduled'),
+               (SELECT COUNT(*) FROM {s}.contacts c JOIN {s}.call_logs cl ON cl.call_sid = c.call_sid
+                WHERE c.campaign_id = :id AND cl.outcome = 'not-interested'),
+               (SELECT COUNT(*) FROM {s}.contacts c JOIN {s}.call_logs cl ON cl.call_sid = c.call_sid
+                WHERE c.campaign_id = :id AND cl.outcome IN ('no-answer', 'voicemail'))
+    """
+    conn = get_db()
+    for campaign_id in set(campaign_ids):
+        totals = list(conn.execute(counts.format(s="main"), {"id": campaign_id}).fetchone())
+        for month in archive_months(campaign_id=campaign_id):
+            schemas = _attach(conn, [month])
+            for schema in schemas:
+                row = conn.execute(counts.format(s=schema), {"id": campaign_id}).fetchone()
+                totals = [a + b for a, b in zip(totals, row)]
+            _detach(conn, schemas)
+        conn.execute(
+            "UPDATE campaigns SET called = ?, scheduled = ?, not_interested = ?, no_answer = ? WHERE id = ?",
+            (*totals, campaign_id),
+        )
+        conn.commit()
+    conn.close()
+
+
+# ── Call stats rollups ──
+
+ROLLUP_COLUMNS = (
+    "calls", "completed", "no_answer", "failed", "duration_secs",
+    "scheduled", "booking_failed", "not_interested", "callback", "wrong_number",
+)
+OUTCOME_COLUMNS = {
+    "scheduled": "scheduled",
+    "booking-failed": "booking_failed",
+    "not-interested": "not_interested",
+    "callback": "callback",
+    "wrong-number": "wrong_number",
+    "voicemail": "no_answer",
+}
+_ROLLUP_FIELDS = {"status", "duration", "outcome", "agent_id", "created_at"}
+_ROLLUP_SOURCE = "id, " + ", ".join(sorted(_ROLLUP_FIELDS))
+
+
+def _rollup_counts(row) -> dict:
+    """What one call contributes to its hour/day bucket."""
+    counts = dict.fromkeys(ROLLUP_COLUMNS, 0)
+    counts["calls"] = 1
+    counts["duration_secs"] = row["duration"] or 0
+    status = row["status"] or ""
+    if status == "completed":
+        counts["completed"] = 1
+    elif status in ("no-answer", "busy"):
+        counts["no_answer"] = 1
+    elif status in ("failed", "canceled"):
+        counts["failed"] = 1
+    column = OUTCOME_COLUMNS.get(row["outcome"] or "")
+    if column:
+        counts[column] = 1  # voicemail counts as no_answer once, whatever the status
+    return counts
+
+
+def _bump_rollups(c, row, deltas: dict):
+    deltas = {k: v for k, v in deltas.items() if v}
+    if not deltas:
+        return
+    created = row["created_at"] or time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
+    agent_id = row["agent_id"] or ""
+    cols = ", ".join(deltas)
+    marks = ", ".join("?" for _ in deltas)
+    updates = ", ".join(f"{k} = {k} + excluded.{k}" for k in deltas)
+    for table, bucket, key in (
+        ("call_stats_hourly", "hour", created[:13] + ":00"),
+        ("call_stats_daily", "day", created[:10]),
+    ):
+        c.execute(
+            f"""INSERT INTO {table} (agent_id, {bucket}, {cols}) VALUES (?, ?, {marks})
+                ON CONFLICT (agent_id, {bucket}) DO UPDATE SET {updates}""",
+            [agent_id, key, *deltas.values()],
+        )
+
+
+def _rebuild_rollups(c):
+    """Recompute all rollups from call_logs (first run, or after manual edits)."""
+    c.execute("DELETE FROM call_stats_hourly")
+    c.execute("DELETE FROM call_stats_daily")
+    for row in c.execute(f"SELECT {_ROLLUP_SOURCE} FROM call_logs").fetchall():
+        _bump_rollups(c, row, _rollup_counts(row))
+
+
+def rebuild_rollups():
+    conn = get_db()
+    _rebuild_rollups(conn)
     conn.commit()
     conn.close()
 
 
-# Auto-init on import
-init_db()
-seed_agents()
-seed_knowledge_base()
+def get_call_stats(
+    granularity: str = "day",
+    agent_id: str | None = None,
+    date_from: str | None = None,
+    date_to: str | None = None,
+) -> list[dict]:
+    """Rollup rows per bucket (summed across agents unless agent_id is given)."""
+    table, bucket = ("call_stats_hourly", "hour") if granularity == "hour" else ("call_stats_daily", "day")
+    sums = ", ".join(f"SUM({col}) AS {col}" for col in ROLLUP_COLUMNS)
+    sql = f"SELECT {bucket} AS bucket, {sums} FROM {table} WHERE 1 = 1"
+    args = []
+    if agent_id:
+        sql += " AND agent_id = ?"
+        args.append(agent_id)
+    if date_from:
+        sql += f" AND {bucket} >= ?"
+        args.append(date_from)
+    if date_to:
+        sql += f" AND substr({bucket}, 1, 10) <= ?"
+        args.append(date_to[:10])
+    sql += f" GROUP BY {bucket} ORDER BY {bucket}"
+    conn = get_db()
+    rows = conn.execute(sql, args).fetchall()
+    conn.close()
+    return [dict(r) for r in rows]
+
+
+# ── Transcript search ──
+
+TURN_ROWID_STRIDE = 10000  # max turns indexed per call
+
+
+def _index_transcript(c, call_log_id: int, transcript_json: str | None):
+    """Replace a call's turns in transcript_fts."""
+    base = call_log_id * TURN_ROWID_STRIDE
+    c.execute("DELETE FROM transcript_fts WHERE rowid BETWEEN ? AND ?", (base, base + TURN_ROWID_STRIDE - 1))
+    try:
+        turns = json.loads(transcript_json) if transcript_json else []
+    except ValueError:
+        return
+    c.executemany(
+        "INSERT INTO transcript_fts (rowid, text, role) VALUES (?, ?, ?)",
+        [
+            (base + i, turn.get("text", ""), turn.get("role", ""))
+            for i, turn in enumerate(turns[:TURN_ROWID_STRIDE])
+            if isinstance(turn, dict) and turn.get("text")
+        ],
+    )
+
+
+def _fts_query(q: str) -> str:
+    """Free text → FTS5 query: every word must match; a trailing * keeps prefix search."""
+    terms = []
+    for word in q.split():
+        prefix = word.endswith("*")
+        word = word.rstrip("*").replace('"', '""')
+        if word:
+            terms.append(f'"{word}"*' if prefix else f'"{word}"')
+    return " ".join(terms)
+
+
+def search_transcripts(
+    q: str,
+    agent_id: str | None = None,
+    campaign_id: int | None = None,
+    date_from: str | None = None,
+    date_to: str | None = None,
+    role: str | None = None,
+    limit: int = 50,
+    offset: int = 0,
+) -> dict:
+    """Transcript turns matching `q`, with highlighted snippets.
+
+    bm25 scores depend on each partition's own term statistics and don't compare
+    across partitions, so results are ranked within a partition and partitions
+    follow each other newest first: the hot DB, then archived months.
+    """
+    match = _fts_query(q)
+    if not match:
+        return {"results": [], "took_ms": 0.0}
+
+    # {s}: the hot DB or an attached archive month; each holds its calls' turns, logs and contacts
+    sql = """
+        SELECT f.rowid % ? AS turn, f.role,
+               snippet(transcript_fts, 0, '<mark>', '</mark>', '…', 16) AS snippet,
+               f.rank,
+               cl.call_sid, cl.agent_id, cl.first_name, cl.to_number, cl.outcome, cl.created_at,
+               ct.campaign_id
+        FROM {s}.transcript_fts f
+        JOIN {s}.call_logs cl ON cl.id = f.rowid / ?
+        LEFT JOIN {s}.contacts ct ON ct.call_sid = cl.call_sid AND ct.call_sid != ''
+        WHERE transcript_fts MATCH ?
+    """
+    args = [TURN_ROWID_STRIDE, TURN_ROWID_STRIDE, match]
+    if agent_id:
+        sql += " AND cl.agent_id = ?"
+        args.append(agent_id)
+    if campaign_id is not None:
+        sql += " AND ct.campaign_id = ?"
+        args.append(campaign_id)
+    if date_from:
+        sql += " AND cl.created_at >= ?"
+        args.append(date_from)
+    if date_to:
+        # Date-only bounds include the whole day
+        sql += " AND cl.created_at < ?" if len(date_to) > 10 else " AND cl.created_at < date(?, '+1 day')"
+        args.append(date_to)
+    if role:
+        sql += " AND f.role = ?"
+        args.append(role)
+    sql += " ORDER BY f.rank LIMIT ?"
+    wanted = offset + limit
+
+    started = time.perf_counter()
+    conn = get_db()
+    rows = [dict(r) for r in conn.execute(sql.format(s="main"), [*args, wanted])]
+    # Archived months in the date range, only as many as the page reaches
+    for month in archive_months(date_from, date_to, agent_id=agent_id, campaign_id=campaign_id):
+        if len(rows) >= wanted:
+            break
+        schemas = _attach(conn, [month])
+        for schema in schemas:
+            rows += [dict(r) for r in conn.execute(sql.format(s=schema), [*args, wanted - len(rows)])]
+        _detach(conn, schemas)
+    conn.close()
+    return {
+        "results": rows[offset:offset + limit],
+        "took_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
+
+# ── Hot/cold partitions ──
+#
+# archive.py moves finished calls older than ARCHIVE_AFTER_DAYS, with their contacts and
+# transcript_fts turns, into one SQLite file per month (by call created_at) under
+# ARCHIVE_DIR. archive_partitions/archive_campaigns record what went where, so a query
+# ATTACHes only the months it can reach. Rollup counters are aggregates and stay as they
+# are; rebuilding them (only done when their tables are missing) would count hot rows only.
+#
+# SQLite attaches at most 10 databases to a connection. Search, get_call_log and the
+# campaign counters visit months one at a time; the attach_history views (call log pages,
+# campaign contacts/report) cover the hot DB plus the newest MAX_ATTACHED months only, and
+# log a warning when a query reaches further back.
+
+ARCHIVE_DIR = Path(os.getenv("VOICE_AGENT_ARCHIVE_DIR") or Path(DB_PATH).parent / "archive")
+MAX_ATTACHED = 9  # SQLite allows 10 attached databases by default
+HISTORY_TABLES = ("call_logs", "contacts")
+
+
+def archive_path(month: str) -> Path:
+    return ARCHIVE_DIR / f"calls-{month}.db"
+
+
+def archive_schema(month: str) -> str:
+    return "archive_" + month.replace("-", "_")
+
+
+def archive_months(
+    date_from: str | None = None,
+    date_to: str | None = None,
+    agent_id: str | None = None,
+    campaign_id: int | None = None,
+) -> list[str]:
+    """Archived months (YYYY-MM) that can hold matching calls, newest first."""
+    if campaign_id is not None:
+        sql, args = "SELECT DISTINCT month FROM archive_campaigns WHERE campaign_id = ?", [campaign_id]
+    elif agent_id:
+        sql, args = "SELECT DISTINCT month FROM archive_partitions WHERE agent_id = ?", [agent_id]
+    else:
+        sql, args = "SELECT DISTINCT month FROM archive_partitions WHERE 1", []
+    if date_from:
+        sql += " AND month >= ?"
+        args.append(date_from[:7])
+    if date_to:
+        sql += " AND month <= ?"
+        args.append(date_to[:7])
+    conn = get_db()
+    rows = conn.execute(sql + " ORDER BY month DESC", args).fetchall()
+    conn.close()
+    return [r[0] for r in rows]
+
+
+def _attach(conn, months: list[str]) -> list[str]:
+    schemas = []
+    for month in months:
+        path = archive_path(month)
+        if path.exists():
+            schema = archive_schema(month)
+            conn.execute(f"ATTACH DATABASE ? AS {schema}", (str(path),))
+            schemas.append(schema)
+    return schemas
+
+
+def _detach(conn, schemas: list[str]):
+    for schema in schemas:
+        conn.execute(f"DETACH DATABASE {schema}")
+
+
+def attach_history(conn, months: list[str]) -> tuple[list[str], dict[str, str]]:
+    """ATTACH archive months (the newest MAX_ATTACHED) and create TEMP views over hot + archived rows.
+
+    Returns (schemas, tables): `tables` maps call_logs/contacts to the name to query,
+    the plain table when no month was attached. Must be called outside a transaction.
+    """
+    if len(months) > MAX_ATTACHED:
+        logger.warning(
+            f"🗄️ Query spans {len(months)} archived months; only the newest {MAX_ATTACHED} "
+            f"({months[MAX_ATTACHED - 1]} onward) are included"
+        )
+    schemas = _attach(conn, months[:MAX_ATTACHED])
+    if not schemas:
+        return schemas, {t: t for t in HISTORY_TABLES}
+    for table in HISTORY_TABLES:
+        cols = [r[1] for r in conn.execute(f"PRAGMA main.table_info({table})")]
+        selects = [f"SELECT {', '.join(cols)} FROM main.{table}"]
+        for schema in schemas:
+            # Archives keep the columns they were written with; newer ones read as NULL
+            have = {r[1] for r in conn.execute(f"PRAGMA {schema}.table_info({table})")}
+            if have:
+                select = ", ".join(c if c in have else f"NULL AS {c}" for c in cols)
+                selects.append(f"SELECT {select} FROM {schema}.{table}")
+        conn.execute(f"DROP VIEW IF EXISTS temp.all_{table}")
+        conn.execute(f"CREATE TEMP VIEW all_{table} AS " + " UNION ALL ".join(selects))
+    return schemas, {t: f"all_{t}" for t in HISTORY_TABLES}
+
+
+def detach_history(conn, schemas: list[str]):
+    if schemas:
+        for table in HISTORY_TABLES:
+            conn.execute(f"DROP VIEW IF EXISTS temp.all_{table}")
+        _detach(conn, schemas)
+
+
+def get_call_log(call_sid: str) -> dict | None:
+    """Call log by SID: the hot DB first, then archived months newest first."""
+    conn = get_db()
+    row = conn.execute("SELECT * FROM call_logs WHERE call_sid = ?", (call_sid,)).fetchone()
+    if row:
+        conn.close()
+        return dict(row)
+    cols = [r[1] for r in conn.execute("PRAGMA main.table_info(call_logs)")]
+    for month in archive_months():
+        schemas = _attach(conn, [month])
+        for schema in schemas:
+            row = conn.execute(f"SELECT * FROM {schema}.call_logs WHERE call_sid = ?", (call_sid,)).fetchone()
+        _detach(conn, schemas)
+        if row:
+            conn.close()
+            return {c: row[c] if c in row.keys() else None for c in cols}
+    conn.close()
+    return None
+
+
+def call_log_partitions(agent_id: str | None = None, limit: int = 100, offset: int = 0) -> tuple[list[str], int]:
+    """Archive months a newest-first page of call logs can reach, and the total across partitions.
+
+    Months are disjoint by created_at, so the page only needs the newest months
+    whose archived calls, together with the hot rows newer than them, cover
+    offset + limit.
+    """
+    where, args = ("WHERE agent_id = ?", [agent_id]) if agent_id else ("", [])
+    conn = get_db()
+    hot_total = conn.execute(f"SELECT COUNT(*) FROM call_logs {where}", args).fetchone()[0]
+    archived = conn.execute(
+        f"SELECT month, SUM(calls) FROM archive_partitions {where} GROUP BY month ORDER BY month DESC", args
+    ).fetchall()
+    months, covered = [], 0
+    if archived:
+        newest = archived[0][0]
+        covered = conn.execute(
+            f"SELECT COUNT(*) FROM call_logs {where or 'WHERE 1'} AND created_at >= date(?, '+1 month')",
+            (*args, f"{newest}-01"),
+        ).fetchone()[0]
+    conn.close()
+    for month, calls in archived:
+        if covered >= offset + limit:
+            break
+        if len(months) == MAX_ATTACHED:
+            logger.warning(f"🗄️ Call log page reaches past the newest {MAX_ATTACHED} archived months; older calls are left out")
+            break
+        months.append(month)
+        covered += calls
+    return months, hot_total + sum(calls for _, calls in archived)
+
@@ -0,0 +1,411 @@
+"""Adaptive dial pacing for campaign runs.
+
+Most outbound dials never become a conversation. Dialing one contact at a time
+with a fixed sleep leaves pipelines idle. Dialing up to MAX_CALLS at once
+overshoots whenever answer rates are high. `DialPacer` closes the loop on
+what calls actually do:
+
+  answer rates   each recent placement (last `WINDOW` dials) ends up human,
+                 voicemail (Twilio AMD on /twiml, or the bot's voicemail
+                 detector) or unanswered. Answers arrive within seconds but
+                 no-answers only after the full ring, so rates count only
+                 placements at least `RESOLVE_SECS` old. They are smoothed
+                 toward a prior taken from recorded call history.
+  turn latency   p95 LLM + TTS time-to-first-byte over the last
+                 `LATENCY_WINDOW_SECS`, as reported live by each call's
+                 MetricsCollector.
+
+Every `CONTROL_SECS` the effective target for concurrent conversations is
+adjusted. It is cut by `DECREASE` when turn latency breaches the SLO. It grows
+by one, up to the configured `DIAL_TARGET_CONVERSATIONS`, while latency has
+headroom and the current target is actually being reached. The dialer places
+another call while `active + (ringing + 1) × connect rate ≤ target`, where
+ringing counts only calls placed within `ANSWER_SECS`, at most
+one per `MIN_DIAL_INTERVAL_SECS` (Twilio's default of 1 call per second per
+account). A voicemail holds a pipeline only briefly, so it counts as
+`VOICEMAIL_WEIGHT` of a conversation.
+
+Admission control stays the hard limit. The pacer sets its `pending_weight`
+to the connect rate, so ringing calls count as the conversations they're
+expected to become.
+
+Replay the controller against recorded outcome distributions (or built-in
+defaults when there's little history) with a synthetic latency model:
+
+    python dial_pacer.py --simulate [--minutes 120] [--target 15] [--slo-ms 1500]
+"""
+
+import asyncio
+import math
+import os
+import time
+from collections import deque
+
+from loguru import logger
+
+from admission import MAX_CALLS, RESERVATION_TTL_SECS, admission
+
+TARGET_CONVERSATIONS = int(os.getenv("DIAL_TARGET_CONVERSATIONS", str(max(1, MAX_CALLS * 3 // 4))))
+LATENCY_SLO_MS = float(os.getenv("DIAL_LATENCY_SLO_MS", "1500"))  # p95 LLM + TTS TTFB per turn
+MIN_DIAL_INTERVAL_SECS = 1.0
+CONTROL_SECS = 5.0
+WINDOW = 200  # placements the answer rates are measured over
+RESOLVE_SECS = 60.0  # Twilio gives up ringing by then; younger placements would bias rates toward answered
+ANSWER_SECS = 25.0  # people pick up within ~5 rings; a call ringing longer is almost surely unanswered
+PRIOR_WEIGHT = 20  # placements' worth of the prior mixed into the rates
+DEFAULT_PRIOR = {"human": 0.30, "voicemail": 0.15}
+VOICEMAIL_WEIGHT = 0.25
+LATENCY_WINDOW_SECS = 60.0
+MIN_LATENCY_SAMPLES = 10
+DECREASE = 0.75
+HEADROOM = 0.85  # grow only while p95 is under this share of the SLO
+COOLDOWN_SECS = 30.0  # no growth this soon after a cut
+POLL_SECS = 0.25
+
+
+def _p95(values) -> float:
+    s = sorted(values)
+    return s[min(len(s) - 1, int(len(s) * 0.95))]
+
+
+class DialPacer:
+    """Answer-rate and latency feedback for the campaign dialer; see the module docstring."""
+
+    def __init__(
+        self,
+        goal: int = TARGET_CONVERSATIONS,
+        slo_ms: float = LATENCY_SLO_MS,
+        prior: dict | None = None,
+        clock=time.monotonic,
+    ):
+        self.goal = goal
+        self.target = float(goal)
+        self.slo_ms = slo_ms
+        self.prior = prior or DEFAULT_PRIOR
+        self._clock = clock
+        self._fates: dict[str, str] = {}  # call_sid → ringing | human | voicemail | unanswered
+        self._order: deque[tuple[str, float]] = deque()  # (call_sid, placed at), oldest first
+        self._ttfb = {"llm": deque(), "tts": deque()}  # (time, ms)
+        self._last_cut = -math.inf
+        self._last_dial = -math.inf
+        self._task: asyncio.Task | None = None
+        self.breaches = 0
+
+    # ── Events ──
+
+    def placed(self, call_sid: str):
+        self._last_dial = self._clock()
+        self._fates[call_sid] = "ringing"
+        self._order.append((call_sid, self._last_dial))
+        while len(self._order) > WINDOW:
+            self._fates.pop(self._order.popleft()[0], None)
+
+    def connected(self, call_sid: str, machine: bool = False):
+        """Answered (/twiml); `machine` when Twilio's AMD says it's a machine."""
+        if self._fates.get(call_sid) == "ringing":
+            self._fates[call_sid] = "voicemail" if machine else "human"
+
+    def voicemail(self, call_sid: str):
+        """The bot heard a voicemail greeting on a call answered as human."""
+        if call_sid in self._fates:
+            self._fates[call_sid] = "voicemail"
+
+    def ended(self, call_sid: str):
+        """Terminal status callback; a call still ringing was never answered."""
+        if self._fates.get(call_sid) == "ringing":
+            self._fates[call_sid] = "unanswered"
+
+    def record_ttfb(self, kind: str, ms: float):
+        """A live call's LLM or TTS time-to-first-byte."""
+        if kind in self._ttfb:
+            self._ttfb[kind].append((self._clock(), ms))
+
+    # ── Estimates ──
+
+    def _expire(self):
+        # A call still ringing past Twilio's ring timeout lost its status callback
+        cutoff = self._clock() - RESERVATION_TTL_SECS
+        for sid, placed_at in self._order:
+            if placed_at >= cutoff:
+                break
+            if self._fates.get(sid) == "ringing":
+                self._fates[sid] = "unanswered"
+
+    @property
+    def ringing(self) -> int:
+        self._expire()
+        return sum(1 for fate in self._fates.values() if fate == "ringing")
+
+    def _may_answer(self) -> int:
+        """Calls still ringing recently enough to be picked up."""
+        cutoff = self._clock() - ANSWER_SECS
+        return sum(1 for sid, placed_at in self._order if placed_at >= cutoff and self._fates.get(sid) == "ringing")
+
+    def rates(self) -> dict[str, float]:
+        """Share of placements answered by a person / by voicemail, smoothed toward the prior."""
+        self._expire()
+        cutoff = self._clock() - RESOLVE_SECS
+        resolved = [self._fates[sid] for sid, placed_at in self._order if placed_at < cutoff and sid in self._fates]
+        resolved = ["unanswered" if f == "ringing" else f for f in resolved]
+        n = len(resolved) + PRIOR_WEIGHT
+        return {
+            kind: (resolved.count(kind) + self.prior[kind] * PRIOR_WEIGHT) / n
+            for kind in ("human", "voicemail")
+        }
+
+    def connect_weight(self) -> float:
+        """Expected conversations per dial."""
+        r = self.rates()
+        return r["human"] + VOICEMAIL_WEIGHT * r["voicemail"]
+
+    def turn_latency_ms(self) -> float | None:
+        """p95 LLM + p95 TTS TTFB over the latency window; None with too few turns."""
+        cutoff = self._clock() - LATENCY_WINDOW_SECS
+        for samples in self._ttfb.values():
+            while samples and samples[0][0] < cutoff:
+                samples.popleft()
+        llm, tts = self._ttfb["llm"], self._ttfb["tts"]
+        if len(llm) < MIN_LATENCY_SAMPLES:
+            return None
+        return _p95(ms for _, ms in llm) + (_p95(ms for _, ms in tts) if tts else 0.0)
+
+    # ── Control ──
+
+    def control(self, active: int):
+        """One control step: cut the target on an SLO breach, grow it back with headroom."""
+        now = self._clock()
+        latency = self.turn_latency_ms()
+        if latency is not None and latency > self.slo_ms:
+            self.target = max(1.0, self.target * DECREASE)
+            self._last_cut = now
+            self.breaches += 1
+        elif (
+            (latency is None or latency < self.slo_ms * HEADROOM)
+            and active >= self.target - 1
+            and now - self._last_cut >= COOLDOWN_SECS
+        ):
+            self.target = min(float(self.goal), self.target + 1)
+
+    def may_dial(self, active: int) -> bool:
+        """Whether one more placement keeps expected conversations within the target."""
+        if self._clock() - self._last_dial < MIN_DIAL_INTERVAL_SECS:
+            return False
+        return active + (self._may_answer() + 1) * self.connect_weight() <= self.target
+
+    async def wait_for_slot(self, label: str = ""):
+        """Hold the dialer until admission has headroom and pacing allows another call."""
+        while True:
+            await admission.wait_for_headroom(label)
+            if self.may_dial(admission.active):
+                return
+            await asyncio.sleep(POLL_SECS)
+
+    # ── Worker ──
+
+    def start(self, prior: dict | None = None):
+        if self._task and not self._task.done():
+            return
+        if prior:
+            self.prior = prior
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(CONTROL_SECS)
+            before = self.target
+            self.control(admission.active)
+            admission.pending_weight = sum(self.rates().values())  # share of dials that reach /ws
+            if int(self.target) != int(before):
+                logger.info(f"🎚️ Dial pacing target {before:.1f} → {self.target:.1f}: {self.snapshot()}")
+
+    def snapshot(self) -> dict:
+        latency = self.turn_latency_ms()
+        return {
+            "target_conversations": round(self.target, 1),
+            "goal_conversations": self.goal,
+            "ringing": self.ringing,
+            "answer_rates": {k: round(v, 3) for k, v in self.rates().items()},
+            "turn_latency_p95_ms": round(latency, 1) if latency is not None else None,
+            "latency_slo_ms": self.slo_ms,
+            "slo_breaches": self.breaches,
+        }
+
+
+dial_pacer = DialPacer()
+
+
+# ── Recorded outcomes ──
+
+def recorded_outcomes(days: int = 30, agent_id: str | None = None) -> dict:
+    """Dial fates and durations (seconds) of finished calls over the last `days`."""
+    from outcomes import TERMINAL_STATUSES
+    from db import get_db
+
+    sql = f"""SELECT CASE WHEN outcome = 'voicemail' THEN 'voicemail'
+                          WHEN status = 'completed' AND IFNULL(outcome, '') != 'no-answer' THEN 'human'
+                          ELSE 'unanswered' END AS fate,
+                     duration
+              FROM call_logs
+              WHERE status IN ({", ".join("?" for _ in TERMINAL_STATUSES)}) AND created_at >= datetime('now', ?)"""
+    args = [*TERMINAL_STATUSES, f"-{days} days"]
+    if agent_id:
+        sql += " AND agent_id = ?"
+        args.append(agent_id)
+    conn = get_db()
+    rows = conn.execute(sql, args).fetchall()
+    conn.close()
+    out = {"human": [], "voicemail": [], "unanswered": []}
+    for fate, duration in rows:
+        out[fate].append(duration or 0)
+    return out
+
+
+def prior_from(recorded: dict, min_calls: int = 50) -> dict | None:
+    n = sum(len(v) for v in recorded.values())
+    if n < min_calls:
+        return None
+    return {"human": len(recorded["human"]) / n, "voicemail": len(recorded["voicemail"]) / n}
+
+
+# ── Offline simulation ──
+
+def simulate(
+    recorded: dict,
+    minutes: float = 120,
+    goal: int = TARGET_CONVERSATIONS,
+    slo_ms: float = LATENCY_SLO_MS,
+    max_calls: int = MAX_CALLS,
+    latency_base_ms: float = 700.0,
+    latency_per_call_ms: float = 60.0,
+    paced: bool = True,
+    seed: int = 0,
+) -> dict:
+    """Replay dialing second by second; calls' fates and durations are drawn from `recorded`.
+
+    Turn latency is synthetic: base + per_call × active conversations, ±15%
+    noise, one turn per conversation every ~6s. `paced=False` is the old
+    dialer: one call per 2s while admission has a free slot.
+    """
+    import random
+
+    rng = random.Random(seed)
+    now = 0.0
+    pacer = DialPacer(goal=goal, slo_ms=slo_ms, prior=prior_from(recorded) or DEFAULT_PRIOR, clock=lambda: now)
+    fates = [f for f, durations in recorded.items() for _ in durations]
+    durations = {f: [d for d in recorded[f] if d > 0] or [default] for f, default in (("human", 90), ("voicemail", 12))}
+    ringing: dict[str, tuple[float, str]] = {}  # sid → (answered/given up at, fate)
+    sessions: dict[str, float] = {}  # sid → ends at
+    last_dial, n = -math.inf, 0
+    stats = {"dials": 0, "human": 0, "voicemail": 0, "rejected": 0, "latency": [], "active": [], "over_slo_secs": 0}
+    turn_latency = deque()
+
+    while now < minutes * 60:
+        for sid, (at, fate) in list(ringing.items()):
+            if at > now:
+                continue
+            del ringing[sid]
+            if fate == "unanswered":
+                pacer.ended(sid)
+            elif len(sessions) >= max_calls:
+                stats["rejected"] += 1  # answered, but /ws refuses the session
+                pacer.connected(sid)
+                pacer.ended(sid)
+            else:
+                pacer.connected(sid)
+                if fate == "voicemail":
+                    pacer.voicemail(sid)
+                stats[fate] += 1
+                sessions[sid] = now + rng.choice(durations[fate])
+        for sid, ends in list(sessions.items()):
+            if ends <= now:
+                del sessions[sid]
+                pacer.ended(sid)
+
+        active = len(sessions)
+        for _ in range(active):
+            if rng.random() < 1 / 6:
+                ms = max(50.0, rng.gauss(latency_base_ms + latency_per_call_ms * active, 0.15 * latency_base_ms))
+                pacer.record_ttfb("llm", ms)
+                turn_latency.append((now, ms))
+        while turn_latency and turn_latency[0][0] < now - LATENCY_WINDOW_SECS:
+            turn_latency.popleft()
+        if len(turn_latency) >= MIN_LATENCY_SAMPLES:
+            p95 = _p95(ms for _, ms in turn_latency)
+            stats["latency"].append(p95)
+            stats["over_slo_secs"] += p95 > slo_ms
+        stats["active"].append(active)
+
+        if paced and now % CONTROL_SECS == 0:
+            pacer.control(active)
+        while True:
+            if paced:
+                if not pacer.may_dial(active):
+                    break
+            elif now - last_dial < 2 or active + len(ringing) >= max_calls:
+                break
+            n += 1
+            sid = f"SIM{n}"
+            fate = rng.choice(fates) if fates else rng.choices(("human", "voicemail", "unanswered"), (30, 15, 55))[0]
+            ring = rng.uniform(30, 60) if fate == "unanswered" else rng.uniform(5, 20)
+            ringing[sid] = (now + ring, fate)
+            pacer.placed(sid)
+            last_dial = now
+            stats["dials"] += 1
+        now += 1.0
+
+    secs = minutes * 60
+    return {
+        "policy": "paced" if paced else "fixed 2s",
+        "dials_per_hour": round(stats["dials"] * 3600 / secs),
+        "conversations_per_hour": round(stats["human"] * 3600 / secs),
+        "voicemails_per_hour": round(stats["voicemail"] * 3600 / secs),
+        "avg_active": round(sum(stats["active"]) / len(stats["active"]), 1),
+        "rejected_sessions": stats["rejected"],
+        "p95_turn_latency_ms": round(_p95(stats["latency"]), 0) if stats["latency"] else None,
+        "time_over_slo": f"{stats['over_slo_secs'] / secs:.1%}",
+        "final_target": round(pacer.target, 1) if paced else None,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Simulate adaptive dial pacing against recorded call outcomes")
+    parser.add_argument("--simulate", action="store_true")
+    parser.add_argument("--minutes", type=float, default=120)
+    parser.add_argument("--days", type=int, default=30, help="call history to draw outcomes from")
+    parser.add_argument("--agent", default=None)
+    parser.add_argument("--target", type=int, default=TARGET_CONVERSATIONS)
+    parser.add_argument("--slo-ms", type=float, default=LATENCY_SLO_MS)
+    parser.add_argument("--max-calls", type=int, default=MAX_CALLS)
+    parser.add_argument("--latency-base-ms", type=float, default=700.0)
+    parser.add_argument("--latency-per-call-ms", type=float, default=60.0)
+    args = parser.parse_args()
+    if not args.simulate:
+        parser.print_help()
+        raise SystemExit
+
+    from db import init_db
+
+    init_db()
+    recorded = recorded_outcomes(args.days, args.agent)
+    if not prior_from(recorded):
+        # Too little history: 30% human, 15% voicemail, 55% unanswered; 30s–4min conversations
+        recorded = {"human": list(range(30, 241, 7)), "voicemail": list(range(8, 23)), "unanswered": [0] * 55}
+        print("(not enough call history; using default outcome distribution)")
+    print(json.dumps({k: len(v) for k, v in recorded.items()}))
+    for paced in (False, True):
+        print(json.dumps(simulate(
+            recorded, args.minutes, args.target, args.slo_ms, args.max_calls,
+            args.latency_base_ms, args.latency_per_call_ms, paced=paced,
+        )))
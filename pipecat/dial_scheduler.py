@@ -0,0 +1,361 @@
+"""Campaign dial scheduling: who to call next, and when.
+
+Each pending contact has a time zone, from the state in its address or else
+its phone's area code. It may be dialed only while its local time is inside
+`DIAL_HOURS`. A contact whose zone is unknown may be dialed only while every
+zone in `UNKNOWN_ZONES` is inside the window. `DialScheduler` keeps two heaps:
+
+  - waiting: contacts keyed by the earliest time they may be dialed (their
+    window opening, or a retry's `next_attempt_at`)
+  - ready: contacts callable now, best first: the historical answer rate at
+    their current local hour, then fewer attempts, then upload order
+
+The campaign runner asks for the next contact only once admission has room
+for another call. The pick is therefore made at the moment capacity frees up,
+from whoever is best to call at that moment.
+
+Unanswered calls (no-answer, busy, voicemail) are put back in the queue
+after `RETRY_BACKOFF_HOURS`, up to `MAX_ATTEMPTS` dials per contact. A run
+picks up contacts requeued since it started every `REQUEUE_CHECK_SECS` and
+once more before it ends.
+"""
+
+import heapq
+import os
+import re
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from loguru import logger
+
+from db import get_db
+
+DIAL_HOURS = tuple(int(h) for h in os.getenv("DIAL_HOURS", "9-20").split("-"))  # local [start, end)
+UNKNOWN_ZONES = ("America/New_York", "America/Los_Angeles")
+MAX_ATTEMPTS = int(os.getenv("DIAL_MAX_ATTEMPTS", "3"))
+RETRY_BACKOFF_HOURS = (4, 22)  # after the 1st and 2nd unanswered dial; lands on another hour of day
+RETRY_OUTCOMES = ("no-answer", "voicemail")
+MAX_WAIT_SECS = 3600  # a run waits this long for the next contact to become callable
+REQUEUE_CHECK_SECS = 300
+RATE_DAYS = 30
+RATE_PRIOR_WEIGHT = 20  # calls' worth of the overall rate mixed into each hour's rate
+
+# ── Time zones ──
+
+STATE_ZONES = {
+    **dict.fromkeys(
+        "CT DE DC FL GA ME MD MA NH NJ NY NC OH PA RI SC VT VA WV KY".split(), "America/New_York"
+    ),
+    **dict.fromkeys("AL AR IL IA KS LA MN MS MO NE ND OK SD TN TX WI".split(), "America/Chicago"),
+    **dict.fromkeys("CO MT NM UT WY".split(), "America/Denver"),
+    **dict.fromkeys("CA NV OR WA".split(), "America/Los_Angeles"),
+    "MI": "America/Detroit",
+    "IN": "America/Indiana/Indianapolis",
+    "ID": "America/Boise",
+    "AZ": "America/Phoenix",
+    "AK": "America/Anchorage",
+    "HI": "Pacific/Honolulu",
+    "PR": "America/Puerto_Rico",
+    **dict.fromkeys("ON QC".split(), "America/Toronto"),
+    **dict.fromkeys("NS PE NB".split(), "America/Halifax"),
+    "NL": "America/St_Johns",
+    "MB": "America/Winnipeg",
+    "SK": "America/Regina",
+    "AB": "America/Edmonton",
+    "BC": "America/Vancouver",
+}
+
+# Geographic NANP area codes by state/province
+_AREA_CODES = {
+    "AL": "205 251 256 334 659 938",
+    "AK": "907",
+    "AZ": "480 520 602 623 928",
+    "AR": "327 479 501 870",
+    "CA": "209 213 279 310 323 341 350 408 415 424 442 510 530 559 562 619 626 628 650 657 661 669 707 "
+          "714 747 760 805 818 820 831 840 858 909 916 925 949 951",
+    "CO": "303 719 720 970 983",
+    "CT": "203 475 860 959",
+    "DE": "302",
+    "DC": "202 771",
+    "FL": "239 305 321 352 386 407 448 561 656 689 727 754 772 786 813 850 863 904 941 954",
+    "GA": "229 404 470 478 678 706 762 770 912 943",
+    "HI": "808",
+    "ID": "208 986",
+    "IL": "217 224 309 312 331 447 464 618 630 708 730 773 779 815 847 861 872",
+    "IN": "219 260 317 463 574 765 812 930",
+    "IA": "319 515 563 641 712",
+    "KS": "316 620 785 913",
+    "KY": "270 364 502 606 859",
+    "LA": "225 318 337 504 985",
+    "ME": "207",
+    "MD": "227 240 301 410 443 667",
+    "MA": "339 351 413 508 617 774 781 857 978",
+    "MI": "231 248 269 313 517 586 616 679 734 810 906 947 989",
+    "MN": "218 320 507 612 651 763 952",
+    "MS": "228 601 662 769",
+    "MO": "314 417 557 573 636 660 816 975",
+    "MT": "406",
+    "NE": "308 402 531",
+    "NV": "702 725 775",
+    "NH": "603",
+    "NJ": "201 551 609 640 732 848 856 862 908 973",
+    "NM": "505 575",
+    "NY": "212 315 329 332 347 363 516 518 585 607 624 631 646 680 716 718 838 845 914 917 929 934",
+    "NC": "252 336 472 704 743 828 910 919 980 984",
+    "ND": "701",
+    "OH": "216 220 234 283 326 330 380 419 436 440 513 567 614 740 937",
+    "OK": "405 539 572 580 918",
+    "OR": "458 503 541 971",
+    "PA": "215 223 267 272 412 445 484 570 582 610 717 724 814 835 878",
+    "RI": "401",
+    "SC": "803 821 839 843 854 864",
+    "SD": "605",
+    "TN": "423 615 629 731 865 901 931",
+    "TX": "210 214 254 281 325 346 361 409 430 432 469 512 682 713 726 737 806 817 830 832 903 915 936 "
+          "940 945 956 972 979",
+    "UT": "385 435 801",
+    "VT": "802",
+    "VA": "276 434 540 571 686 703 757 804 826 948",
+    "WA": "206 253 360 425 509 564",
+    "WV": "304 681",
+    "WI": "262 274 353 414 534 608 715 920",
+    "WY": "307",
+    "PR": "787 939",
+    "ON": "226 249 289 343 365 382 416 437 519 548 613 647 683 705 742 753 807 905",
+    "QC": "354 367 418 438 450 468 514 579 581 819 873",
+    "NS": "782 902",
+    "NB": "428 506",
+    "NL": "709",
+    "MB": "204 431 584",
+    "SK": "306 474 639",
+    "AB": "368 403 587 780 825",
+    "BC": "236 250 257 604 672 778",
+}
+AREA_CODE_ZONES = {code: STATE_ZONES[state] for state, codes in _AREA_CODES.items() for code in codes.split()}
+# Area codes on the other side of a state's zone line
+AREA_CODE_ZONES.update({
+    "915": "America/Denver",  # El Paso
+    "270": "America/Chicago", "364": "America/Chicago",  # western Kentucky
+    "219": "America/Chicago",  # northwest Indiana
+    "423": "America/New_York", "865": "America/New_York",  # east Tennessee
+})
+
+# "…, TX 75001" / "…, TX" / "… TX 75001" (not a bare trailing "CT", which may be a court)
+_STATE_RE = re.compile(r"(?:,\s*([A-Z]{2})\.?|\s([A-Z]{2})(?=\s+\d{5}))(?:\s+\d{5}(?:-\d{4})?)?(?:,?\s*(?:USA?|United States))?\s*$")
+
+
+def contact_timezone(phone: str | None, address: str | None) -> str:
+    """IANA zone for a contact: the address's state, else the phone's area code; "" if neither is known."""
+    if address and (m := _STATE_RE.search(address.strip())) and (m.group(1) or m.group(2)) in STATE_ZONES:
+        return STATE_ZONES[m.group(1) or m.group(2)]
+    digits = re.sub(r"\D", "", phone or "")
+    if len(digits) == 11 and digits[0] == "1":
+        digits = digits[1:]
+    return AREA_CODE_ZONES.get(digits[:3], "") if len(digits) == 10 else ""
+
+
+def _zones(tz: str) -> tuple[ZoneInfo, ...]:
+    return tuple(ZoneInfo(z) for z in ((tz,) if tz else UNKNOWN_ZONES))
+
+
+def local_hour(now: datetime, tz: str) -> int:
+    """Callee's local hour; the first unknown-zone fallback when tz is ""."""
+    return now.astimezone(_zones(tz)[0]).hour
+
+
+def _next_open(now: datetime, zone: ZoneInfo) -> datetime:
+    local = now.astimezone(zone)
+    start, end = DIAL_HOURS
+    if start <= local.hour < end:
+        return now
+    opens = local.replace(hour=start, minute=0, second=0, microsecond=0)
+    if local.hour >= end:
+        opens += timedelta(days=1)
+    return opens.astimezone(timezone.utc)
+
+
+def next_dial_time(now: datetime, tz: str) -> datetime:
+    """Earliest time ≥ now inside the dialing window of every zone the contact may be in."""
+    t = now
+    for _ in range(8):
+        latest = max(_next_open(t, zone) for zone in _zones(tz))
+        if latest == t:
+            break
+        t = latest
+    return t
+
+
+# ── Answer rates ──
+
+def hourly_answer_rates(agent_id: str | None = None, days: int = RATE_DAYS) -> dict[int, float]:
+    """Share of dials answered by a person, by callee local hour, over the last `days`.
+
+    Each hour is smoothed toward the overall rate, so hours with few calls
+    don't swing the ordering.
+    """
+    sql = """SELECT local_hour, COUNT(*),
+                    SUM(status = 'completed' AND IFNULL(outcome, '') NOT IN ('no-answer', 'voicemail'))
+             FROM call_logs
+             WHERE local_hour IS NOT NULL AND status IN ('completed', 'busy', 'no-answer')
+               AND created_at >= datetime('now', ?)"""
+    args = [f"-{days} days"]
+    if agent_id:
+        sql += " AND agent_id = ?"
+        args.append(agent_id)
+    conn = get_db()
+    rows = conn.execute(sql + " GROUP BY local_hour", args).fetchall()
+    conn.close()
+    dials = sum(r[1] for r in rows)
+    prior = sum(r[2] for r in rows) / dials if dials else 0.5
+    by_hour = {r[0]: r for r in rows}
+    return {
+        h: (by_hour[h][2] + prior * RATE_PRIOR_WEIGHT) / (by_hour[h][1] + RATE_PRIOR_WEIGHT) if h in by_hour else prior
+        for h in range(24)
+    }
+
+
+# ── Scheduler ──
+
+def _utc(ts: str | None) -> datetime | None:
+    return datetime.fromisoformat(ts).replace(tzinfo=timezone.utc) if ts else None
+
+
+class DialScheduler:
+    """A campaign's pending contacts, released as they become callable, best first."""
+
+    def __init__(self, contacts: list[dict], rates: dict[int, float]):
+        self._rates = rates
+        self._waiting: list[tuple] = []  # (callable_at, id, contact)
+        self._ready: list[tuple] = []  # (-answer rate, attempts, id, contact)
+        self._scored_hour: datetime | None = None
+        self._queued: set[int] = set()
+        self.add(contacts)
+
+    def __len__(self):
+        return len(self._waiting) + len(self._ready)
+
+    def add(self, contacts: list[dict]) -> int:
+        """Queue contacts not already queued; returns how many were added."""
+        now = datetime.now(timezone.utc)
+        added = 0
+        for contact in contacts:
+            if contact["id"] not in self._queued:
+                self._queued.add(contact["id"])
+                self._wait(contact, max(now, _utc(contact.get("next_attempt_at")) or now))
+                added += 1
+        return added
+
+    def _wait(self, contact: dict, after: datetime):
+        heapq.heappush(self._waiting, (next_dial_time(after, contact["timezone"]), contact["id"], contact))
+
+    def _score(self, contact: dict, now: datetime) -> tuple:
+        return (-self._rates[local_hour(now, contact["timezone"])], contact["attempts"], contact["id"], contact)
+
+    def pop(self, now: datetime | None = None) -> dict | None:
+        """Best contact callable now, or None if none is."""
+        now = now or datetime.now(timezone.utc)
+        hour = now.replace(minute=0, second=0, microsecond=0)
+        if hour != self._scored_hour:
+            # Local hours moved on: re-rank, and send contacts whose window closed back to waiting
+            self._scored_hour = hour
+            ready, self._ready = self._ready, []
+            for *_, contact in ready:
+                if next_dial_time(now, contact["timezone"]) == now:
+                    self._ready.append(self._score(contact, now))
+                else:
+                    self._wait(contact, now)
+            heapq.heapify(self._ready)
+        while self._waiting and self._waiting[0][0] <= now:
+            contact = heapq.heappop(self._waiting)[2]
+            if next_dial_time(now, contact["timezone"]) == now:
+                heapq.heappush(self._ready, self._score(contact, now))
+            else:
+                self._wait(contact, now)
+        if not self._ready:
+            return None
+        contact = heapq.heappop(self._ready)[3]
+        self._queued.discard(contact["id"])
+        return contact
+
+    def next_at(self) -> datetime | None:
+        """When the next contact becomes callable; None when nothing is left."""
+        if self._ready:
+            return datetime.now(timezone.utc)
+        return self._waiting[0][0] if self._waiting else None
+
+
+def _pending_contacts(campaign_id: int, retries_only: bool = False) -> list[dict]:
+    """A campaign's pending contacts; resolves and stores time zones not yet known."""
+    sql = "SELECT * FROM contacts WHERE campaign_id = ? AND status = 'pending'"
+    if retries_only:
+        sql += " AND next_attempt_at IS NOT NULL"  # set by schedule_retries, cleared by claim
+    conn = get_db()
+    rows = [dict(r) for r in conn.execute(sql + " ORDER BY id", (campaign_id,))]
+    unresolved = [r for r in rows if r["timezone"] is None]
+    for r in unresolved:
+        r["timezone"] = contact_timezone(r["phone1"], r["address"])
+    if unresolved:
+        conn.executemany("UPDATE contacts SET timezone = ? WHERE id = ?", [(r["timezone"], r["id"]) for r in unresolved])
+        conn.commit()
+    conn.close()
+    return rows
+
+
+def load_scheduler(campaign_id: int, agent_id: str | None = None) -> DialScheduler:
+    """Scheduler over a campaign's pending contacts."""
+    return DialScheduler(_pending_contacts(campaign_id), hourly_answer_rates(agent_id))
+
+
+def add_requeued(scheduler: DialScheduler, campaign_id: int) -> int:
+    """Queue contacts requeued for retry since the scheduler was loaded; returns how many."""
+    added = scheduler.add(_pending_contacts(campaign_id, retries_only=True))
+    if added:
+        logger.info(f"🔁 Campaign {campaign_id}: {added} requeued contact(s) added to the running batch")
+    return added
+
+
+def claim(contact: dict) -> bool:
+    """Count a dial attempt, unless another run took this contact since it was loaded."""
+    conn = get_db()
+    cur = conn.execute(
+        """UPDATE contacts SET attempts = attempts + 1, next_attempt_at = NULL
+           WHERE id = ? AND status = 'pending' AND attempts = ?""",
+        (contact["id"], contact["attempts"]),
+    )
+    conn.commit()
+    conn.close()
+    return cur.rowcount == 1
+
+
+def schedule_retries(conn, finished: list[tuple[str, str, str]]) -> int:
+    """Put contacts whose latest dial went unanswered back in the queue after a backoff.
+
+    `finished` holds (call_sid, call status, outcome). Only contacts still on
+    that call, dialed in the last two days, are requeued, so re-analyzing old
+    calls doesn't redial anyone. Doesn't commit.
+    """
+    sids = [sid for sid, status, outcome in finished if sid and outcome in RETRY_OUTCOMES and status not in ("failed", "canceled")]
+    requeued, campaign_ids = 0, set()
+    for start in range(0, len(sids), 500):
+        chunk = sids[start:start + 500]
+        rows = conn.execute(
+            f"""SELECT id, attempts, campaign_id FROM contacts
+                WHERE call_sid IN ({", ".join("?" for _ in chunk)}) AND status = 'called'
+                  AND attempts BETWEEN 1 AND ? AND called_at >= datetime('now', '-2 days')""",
+            (*chunk, MAX_ATTEMPTS - 1),
+        ).fetchall()
+        for row in rows:
+            hours = RETRY_BACKOFF_HOURS[min(row["attempts"], len(RETRY_BACKOFF_HOURS)) - 1]
+            conn.execute(
+                "UPDATE contacts SET status = 'pending', next_attempt_at = datetime('now', ?) WHERE id = ?",
+                (f"+{hours} hours", row["id"]),
+            )
+            campaign_ids.add(row["campaign_id"])
+        requeued += len(rows)
+    if campaign_ids:
+        conn.execute(
+            f"UPDATE campaigns SET status = 'ready' WHERE status = 'completed' AND id IN ({', '.join('?' for _ in campaign_ids)})",
+            list(campaign_ids),
+        )
+        logger.info(f"🔁 Requeued {requeued} unanswered contact(s) for retry")
+    return requeued
@@ -0,0 +1,300 @@
+"""Streaming JSON responses for large row sets (campaign reports, contacts, call logs).
+
+`JSONResponse` needs the whole payload as `dict(row)` objects, then encodes it
+with the stdlib encoder in one go; a 50k-contact report with transcripts is
+tens of MB held several times over. Here:
+
+  - rows come from SQLite as plain tuples in keyset-paginated batches of
+    `FETCH_ROWS`. Each batch is its own short statement, so no read lock is
+    held while a slow client downloads (the DB isn't in WAL mode, and a
+    long-lived cursor would block call-time writes).
+  - each batch is encoded by orjson (the stdlib encoder without the
+    `fast-json` extra) and emitted as a slice of the JSON array; pieces are
+    coalesced into ~`CHUNK_BYTES` writes.
+  - the body is compressed on the fly with brotli (also in `fast-json`,
+    when accepted) or gzip, per `Accept-Encoding`.
+
+    python json_stream.py --bench --contacts 50000
+"""
+
+import json
+import zlib
+from collections.abc import Callable, Iterable, Iterator
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+try:
+    import orjson
+
+    def dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+except ImportError:  # stdlib fallback, same output
+    orjson = None
+
+    def dumps(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode()
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+FETCH_ROWS = 500
+CHUNK_BYTES = 64 * 1024
+GZIP_LEVEL = 5  # past ~5 gzip costs much more CPU for little size on this data
+BROTLI_QUALITY = 4
+
+
+def keyset_rows(
+    conn,
+    sql: str,
+    params: tuple,
+    after: str,
+    key: tuple[str, ...],
+    limit: int | None = None,
+    offset: int = 0,
+    decoders: dict[str, Callable] | None = None,
+) -> Iterator[bytes]:
+    """JSON array of a query's rows as objects, read in keyset-paginated batches.
+
+    `sql` has an `{after}` slot before its ORDER BY and ends in `LIMIT ? OFFSET ?`.
+    From the second batch on, `after` (e.g. "AND id > ?") fills the slot, bound to
+    the `key` columns of the previous batch's last row. `decoders` maps a column
+    to a function applied to its stored values (e.g. decompression).
+    """
+    yield b"["
+    cols = idx = last = None
+    remaining = limit
+    first = True
+    while remaining is None or remaining > 0:
+        n = FETCH_ROWS if remaining is None else min(FETCH_ROWS, remaining)
+        cur = conn.cursor()
+        cur.row_factory = None  # plain tuples; zipped into dicts below
+        if last is None:
+            cur.execute(sql.format(after=""), (*params, n, offset))
+        else:
+            cur.execute(sql.format(after=after), (*params, *last, n, 0))
+        rows = cur.fetchall()
+        if cols is None:
+            cols = [d[0] for d in cur.description]
+            idx = [cols.index(k) for k in key]
+            decode = [(cols.index(c), fn) for c, fn in (decoders or {}).items() if c in cols]
+        if not rows:
+            break
+        if decode:
+            rows = [list(r) for r in rows]
+            for r in rows:
+                for i, fn in decode:
+                    r[i] = fn(r[i])
+        body = dumps([dict(zip(cols, r)) for r in rows])[1:-1]
+        yield body if first else b"," + body
+        first = False
+        if len(rows) < n:
+            break
+        last = tuple(rows[-1][i] for i in idx)
+        if remaining is not None:
+            remaining -= len(rows)
+    yield b"]"
+
+
+def json_object(parts: dict) -> Iterator[bytes]:
+    """A JSON object whose values are plain values, or iterators of encoded JSON (e.g. `keyset_rows`)."""
+    yield b"{"
+    for i, (name, value) in enumerate(parts.items()):
+        yield (b"," if i else b"") + dumps(name) + b":"
+        if isinstance(value, Iterator):
+            yield from value
+        else:
+            yield dumps(value)
+    yield b"}"
+
+
+def _coalesce(pieces: Iterable[bytes], size: int) -> Iterator[bytes]:
+    buf, n = [], 0
+    for piece in pieces:
+        buf.append(piece)
+        n += len(piece)
+        if n >= size:
+            yield b"".join(buf)
+            buf, n = [], 0
+    if buf:
+        yield b"".join(buf)
+
+
+def _compress(chunks: Iterable[bytes], encoding: str) -> Iterator[bytes]:
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        process, finish = compressor.process, compressor.finish
+    else:
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # 31: gzip container
+        process, finish = compressor.compress, compressor.flush
+    for chunk in chunks:
+        out = process(chunk)
+        if out:
+            yield out
+    yield finish()
+
+
+def _closing(chunks: Iterable[bytes], conn) -> Iterator[bytes]:
+    try:
+        yield from chunks
+    finally:
+        conn.close()
+
+
+def negotiate_encoding(accept_encoding: str | None) -> str | None:
+    """"br", "gzip" or None (identity) for an Accept-Encoding header."""
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, param = part.partition(";")
+        q = 1.0
+        param = param.strip()
+        if param.startswith("q="):
+            try:
+                q = float(param[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    for encoding in (("br",) if brotli else ()) + ("gzip",):
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def stream_json(request: Request, parts: dict, conn=None) -> StreamingResponse:
+    """Stream `json_object(parts)`, compressed per Accept-Encoding; closes `conn` when done.
+
+    Starlette pulls sync iterators from its threadpool, so `conn` must be opened
+    with `check_same_thread=False`.
+    """
+    body = _coalesce(json_object(parts), CHUNK_BYTES)
+    headers = {"Vary": "Accept-Encoding"}
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    if encoding:
+        body = _compress(body, encoding)
+        headers["Content-Encoding"] = encoding
+    if conn is not None:
+        body = _closing(body, conn)
+    return StreamingResponse(body, media_type="application/json", headers=headers)
+
+
+# ── Benchmark ──
+
+def _bench(contacts: int):
+    """Campaign report: stock dict(row) + JSONResponse (+ GZipMiddleware) vs the streaming endpoint."""
+    import asyncio
+    import gzip
+    import os
+    import random
+    import tempfile
+    import time
+    import tracemalloc
+
+    tmp = tempfile.mkdtemp()
+    os.environ["VOICE_AGENT_DB"] = os.path.join(tmp, "bench.db")
+    os.environ["PRELOAD_BOT"] = "0"
+    from fastapi.responses import JSONResponse
+    from fastapi.testclient import TestClient
+    from starlette.requests import Request as _Request
+
+    import server
+    from db import get_db, init_db
+
+    init_db()
+    conn = get_db()
+    rng = random.Random(0)
+    words = "roof shingle leak estimate storm damage insurance inspection tuesday morning works great".split()
+    conn.execute("INSERT INTO campaigns (name, agent_id, total_contacts) VALUES ('bench', 'bench', ?)", (contacts,))
+    campaign_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+    logs, rows = [], []
+    for i in range(contacts):
+        called = i % 5 != 0
+        sid = f"CA{i:032d}" if called else ""
+        if called:
+            turns = [{"role": rng.choice(("user", "assistant")), "content": " ".join(rng.choices(words, k=12))}
+                     for _ in range(rng.randint(4, 16))]
+            logs.append(("bench", sid, f"+1555{i:07d}", "completed", rng.randint(10, 300), json.dumps(turns),
+                         rng.choice(("scheduled", "not-interested", "voicemail", None))))
+        rows.append(("bench", f"First{i}", f"Last{i}", f"+1555{i:07d}", f"{i} Main St", "called" if called else "pending",
+                     sid, campaign_id))
+    conn.executemany(
+        "INSERT INTO call_logs (agent_id, call_sid, to_number, status, duration, transcript, outcome) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        logs,
+    )
+    conn.executemany(
+        "INSERT INTO contacts (agent_id, first_name, last_name, phone1, address, status, call_sid, campaign_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        rows,
+    )
+    conn.commit()
+    conn.close()
+
+    def stock() -> bytes:
+        # The endpoint before streaming: fetchall → dict(row) → JSONResponse
+        conn = get_db()
+        campaign = conn.execute("SELECT * FROM campaigns WHERE id = ?", (campaign_id,)).fetchone()
+        contact_rows = conn.execute(
+            "SELECT c.*, cl.status as call_status, cl.duration, cl.outcome as call_outcome, cl.transcript FROM contacts c LEFT JOIN call_logs cl ON c.call_sid = cl.call_sid WHERE c.campaign_id = ? ORDER BY c.id",
+            (campaign_id,),
+        ).fetchall()
+        summary = {"total": len(contact_rows)}
+        conn.close()
+        return JSONResponse(content={"campaign": dict(campaign), "summary": summary,
+                                     "contacts": [dict(c) for c in contact_rows]}).body
+
+    def measure(fn):
+        t = time.perf_counter()
+        out = fn()
+        elapsed = time.perf_counter() - t
+        tracemalloc.start()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return out, elapsed, peak
+
+    def endpoint(encoding: str) -> bytes | int:
+        # Drive the endpoint's body iterator the way Starlette does, without buffering it
+        async def run():
+            scope = {"type": "http", "method": "GET", "headers": [(b"accept-encoding", encoding.encode())]}
+            response = await server.campaign_report(campaign_id, _Request(scope))
+            size = 0
+            async for chunk in response.body_iterator:
+                size += len(chunk)
+            return size
+
+        return asyncio.run(run())
+
+    results = []
+    body, secs, peak = measure(stock)
+    results.append(("stock", secs, peak, len(body)))
+    # Starlette's GZipMiddleware defaults to level 9
+    _, secs, peak = measure(lambda: gzip.compress(stock(), 9))
+    results.append(("stock+gzip9", secs, peak, len(gzip.compress(body, 9))))
+    for encoding in ("identity", "gzip") + (("br",) if brotli else ()):
+        size, secs, peak = measure(lambda: endpoint(encoding))
+        results.append((f"stream+{encoding}", secs, peak, size))
+
+    print(f"campaign report, {contacts} contacts ({len(logs)} with transcripts), orjson={'yes' if orjson else 'no'}")
+    for name, secs, peak, size in results:
+        print(f"{name:>16}: {secs * 1000:6.0f}ms  peak {peak / 1e6:6.1f}MB  {size / 1e6:6.2f}MB on the wire")
+
+    with TestClient(server.app) as client:
+        streamed = client.get(f"/campaigns/{campaign_id}/report").json()
+    stock_json = json.loads(body)
+    same = len(stock_json["contacts"]) == len(streamed["contacts"]) and all(
+        {k: v for k, v in b.items() if k != "call_log_id"} == a
+        for a, b in zip(stock_json["contacts"], streamed["contacts"])
+    )
+    print(f"identical contacts: {same}; summary: {streamed['summary']}")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark streaming JSON responses")
+    parser.add_argument("--bench", action="store_true")
+    parser.add_argument("--contacts", type=int, default=50000)
+    args = parser.parse_args()
+    if args.bench:
+        _bench(args.contacts)
+    else:
+        parser.print_help()
@@ -0,0 +1,228 @@
+"""Knowledge-base ingestion from Markdown/text and PDF files.
+
+Files are extracted in a process pool (PDF text via pypdf, the optional
+`pdf` extra), normalized, chunked by heading/paragraph to ~`CHUNK_TOKENS`
+tokens, and token-counted. The `kb_sources` manifest skips files whose mtime
+and size are unchanged without reading them, and files whose bytes hash the
+same after a touch. Everything is then applied in one transaction
+(`db.upsert_ingested_knowledge`): documents are stored once by content hash
+and each agent's link to a source path is updated in place.
+
+When a directory holds both `name.md` and `name.pdf`, the Markdown wins;
+PDFs are ingested when they're the only version.
+
+    python kb_ingest.py [paths ...] [--agent ID ...] [--workers 8] [--force]
+
+With no paths, the whole knowledge/ directory is ingested. Without --agent,
+changed files update the agents that already link them.
+"""
+
+import hashlib
+import os
+import re
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from loguru import logger
+
+from db import KNOWLEDGE_DIR, get_kb_manifest, upsert_ingested_knowledge
+from tokens import count_tokens
+
+TEXT_SUFFIXES = (".md", ".markdown", ".txt")
+PDF_SUFFIXES = (".pdf",)
+CHUNK_TOKENS = 400
+
+
+def source_key(path: Path) -> str:
+    """Manifest key: relative to knowledge/ when inside it, else absolute."""
+    path = path.resolve()
+    try:
+        return str(path.relative_to(KNOWLEDGE_DIR.resolve()))
+    except ValueError:
+        return str(path)
+
+
+def discover(paths: list[Path]) -> list[Path]:
+    """Expand directories; one file per document stem, Markdown over PDF."""
+    files = []
+    for path in paths:
+        if path.is_dir():
+            by_stem: dict[Path, Path] = {}
+            for f in sorted(path.rglob("*")):
+                suffix = f.suffix.lower()
+                if not f.is_file() or suffix not in TEXT_SUFFIXES + PDF_SUFFIXES:
+                    continue
+                stem = f.with_suffix("")
+                if stem not in by_stem or by_stem[stem].suffix.lower() in PDF_SUFFIXES:
+                    by_stem[stem] = f
+            files.extend(by_stem.values())
+        elif path.is_file():
+            files.append(path)
+        else:
+            logger.warning(f"📚 Not found: {path}")
+    return files
+
+
+# ── Extraction (runs in worker processes) ──
+
+def normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text).replace("\r\n", "\n").replace("\r", "\n")
+    text = text.replace("\f", "\n\n").replace("\u00ad", "")  # form feeds, soft hyphens
+    text = re.sub(r"[ \t]+\n", "\n", text)
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    return text.strip() + "\n"
+
+
+def _pdf_text(path: Path) -> tuple[str, str | None]:
+    try:
+        from pypdf import PdfReader
+    except ImportError as e:
+        raise RuntimeError("PDF ingestion needs the `pdf` extra (`pip install pypdf`)") from e
+    reader = PdfReader(str(path))
+    pages = [page.extract_text() or "" for page in reader.pages]
+    text = "\n\n".join(pages)
+    text = re.sub(r"(\w)-\n(\w)", r"\1\2", text)  # words hyphenated across lines
+    title = (reader.metadata.title if reader.metadata else None) or None
+    return text, title
+
+
+def chunk(text: str, max_tokens: int = CHUNK_TOKENS) -> list[dict]:
+    """Split on paragraphs, packing them up to max_tokens; each chunk remembers its heading."""
+    chunks, current, current_tokens, heading = [], [], 0, None
+    chunk_heading = None
+
+    def flush():
+        nonlocal current, current_tokens
+        if current:
+            body = "\n\n".join(current)
+            chunks.append({"heading": chunk_heading, "text": body, "token_count": count_tokens(body)})
+        current, current_tokens = [], 0
+
+    for para in text.split("\n\n"):
+        para = para.strip()
+        if not para:
+            continue
+        if para.startswith("#"):
+            flush()
+            heading = para.splitlines()[0].lstrip("#").strip()
+        tokens = count_tokens(para)
+        if current and current_tokens + tokens > max_tokens:
+            flush()
+        if not current:
+            chunk_heading = heading
+        current.append(para)
+        current_tokens += tokens
+    flush()
+    return chunks
+
+
+def extract(job: dict) -> dict:
+    """Read, normalize, chunk and count one file. Returns the job plus the document, or an error."""
+    path = Path(job["abs_path"])
+    try:
+        raw = path.read_bytes()
+        file_hash = hashlib.sha256(raw).hexdigest()
+        if job.get("known_file_hash") == file_hash:
+            return {**job, "file_hash": file_hash, "unchanged": True}
+        title = None
+        if path.suffix.lower() in PDF_SUFFIXES:
+            text, title = _pdf_text(path)
+        else:
+            text = raw.decode("utf-8", errors="replace")
+        text = normalize(text)
+        if title is None:
+            m = re.search(r"^#\s+(.+)$", text, re.M)
+            title = m.group(1).strip() if m else path.stem.replace("-", " ").replace("_", " ").title()
+        return {
+            **job,
+            "file_hash": file_hash,
+            "content": text,
+            "token_count": count_tokens(text),
+            "chunks": chunk(text),
+            "extracted_title": title,
+        }
+    except Exception as e:
+        return {**job, "error": f"{type(e).__name__}: {e}"}
+
+
+# ── Pipeline ──
+
+def ingest(
+    paths: list[Path] | None = None,
+    agent_ids: list[str] | None = None,
+    titles: dict[str, str] | None = None,
+    workers: int | None = None,
+    force: bool = False,
+) -> dict:
+    """Ingest files/directories; workers=0 extracts in-process. Returns run stats."""
+    started = time.perf_counter()
+    files = discover([Path(p) for p in (paths or [KNOWLEDGE_DIR])])
+    manifest = get_kb_manifest()
+    titles = titles or {}
+
+    jobs, unchanged = [], {}
+    for f in files:
+        key = source_key(f)
+        st = f.stat()
+        known = manifest.get(key)
+        job = {"path": key, "abs_path": str(f), "mtime_ns": st.st_mtime_ns, "size": st.st_size, "title": titles.get(key)}
+        if known and known["doc_exists"] and not force:
+            if (known["mtime_ns"], known["size"]) == (st.st_mtime_ns, st.st_size):
+                unchanged[key] = {**job, "file_hash": known["file_hash"], "doc_hash": known["doc_hash"]}
+                continue
+            job["known_file_hash"] = known["file_hash"]
+        jobs.append(job)
+
+    if workers == 0 or len(jobs) <= 1:
+        results = [extract(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers or min(len(jobs), os.cpu_count() or 1)) as executor:
+            results = list(executor.map(extract, jobs))
+    by_path = {r["path"]: r for r in results}
+
+    # Keep the given file order; it's the order new links (and the prompt's KB sections) get
+    sources, errors, extracted, skipped = [], [], 0, len(unchanged)
+    for r in (unchanged.get(source_key(f)) or by_path[source_key(f)] for f in files):
+        if "doc_hash" in r:
+            sources.append(r)
+        elif "error" in r:
+            logger.error(f"📚 Failed to ingest {r['path']}: {r['error']}")
+            errors.append({"path": r["path"], "error": r["error"]})
+        elif r.get("unchanged"):
+            skipped += 1
+            sources.append({**r, "doc_hash": manifest[r["path"]]["doc_hash"]})
+        else:
+            extracted += 1
+            sources.append({**r, "title": r["title"] or r["extracted_title"]})
+
+    stats = upsert_ingested_knowledge(sources, agent_ids)
+    stats.update({
+        "files": len(files),
+        "extracted": extracted,
+        "skipped_unchanged": skipped,
+        "errors": errors,
+        "seconds": round(time.perf_counter() - started, 3),
+    })
+    logger.info(
+        f"📚 KB ingest: {len(files)} files, {extracted} extracted, {skipped} unchanged, "
+        f"{stats['documents_added']} new documents, {len(errors)} errors ({stats['seconds']}s)"
+    )
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    from db import init_db
+
+    parser = argparse.ArgumentParser(description="Ingest Markdown/PDF files into the knowledge base")
+    parser.add_argument("paths", nargs="*", type=Path, help="files or directories (default: knowledge/)")
+    parser.add_argument("--agent", action="append", dest="agents", help="link to this agent (repeatable)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--force", action="store_true", help="re-extract even if unchanged")
+    args = parser.parse_args()
+    init_db()
+    print(json.dumps(ingest(args.paths or None, args.agents, workers=args.workers, force=args.force), indent=2))
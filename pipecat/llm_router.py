@@ -0,0 +1,397 @@
+"""Latency-aware LLM routing across OpenAI-compatible providers.
+
+`RoutedLLMService` is an OpenAILLMService whose completions come from a list of
+routes (OpenAI, Groq, Cerebras, or any OpenAI-compatible base_url). Each turn
+goes to the healthy route with the lowest rolling median TTFT. If that route
+hasn't produced its first chunk within its own p95 TTFT, a second route is
+fired as a hedge and whichever answers first wins; the other stream is closed.
+Errors before the first chunk fail over to the next route.
+
+Function calling, metrics and context handling are inherited unchanged, since
+every route speaks the same chat-completions streaming format. TTFT history is
+kept per provider/model for the whole process, so all calls share it.
+
+A route with a custom `base_url` only gets an API key from the env var named
+by its `api_key_env`; provider keys are never sent to other hosts, and keys
+are never stored in the config itself.
+
+    python llm_router.py --fake   # route/hedge/fail over between local fake endpoints
+"""
+
+import asyncio
+import importlib
+import os
+import statistics
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+from loguru import logger
+from pipecat.services.openai.llm import OpenAILLMService
+
+PROVIDERS = {
+    # provider: (service module, class name, API key env var) — imported only when routed to
+    "openai": ("pipecat.services.openai.llm", "OpenAILLMService", "OPENAI_API_KEY"),
+    "groq": ("pipecat.services.groq.llm", "GroqLLMService", "GROQ_API_KEY"),
+    "cerebras": ("pipecat.services.cerebras.llm", "CerebrasLLMService", "CEREBRAS_API_KEY"),
+}
+
+DEFAULT_ROUTING = {"providers": [{"provider": "openai", "model": "gpt-4o-mini"}], "hedge": True}
+ROUTE_KEYS = {"provider", "model", "base_url", "api_key_env"}
+
+UNHEALTHY_AFTER_FAILURES = 3
+UNHEALTHY_COOLDOWN_SECS = 30.0
+
+
+@dataclass
+class RouteStats:
+    """Rolling TTFT and health for one provider/model, shared across calls."""
+
+    ttfts: deque = field(default_factory=lambda: deque(maxlen=50))
+    consecutive_failures: int = 0
+    unhealthy_until: float = 0.0
+    wins: int = 0
+    errors: int = 0
+
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.unhealthy_until
+
+    def p50(self) -> float | None:
+        return statistics.median(self.ttfts) if self.ttfts else None
+
+    def p95(self) -> float | None:
+        if len(self.ttfts) < 5:
+            return None
+        s = sorted(self.ttfts)
+        return s[min(len(s) - 1, int(len(s) * 0.95))]
+
+    def record_success(self, ttft: float):
+        self.ttfts.append(ttft)
+        self.consecutive_failures = 0
+        self.wins += 1
+
+    def record_failure(self):
+        self.errors += 1
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= UNHEALTHY_AFTER_FAILURES:
+            self.unhealthy_until = time.monotonic() + UNHEALTHY_COOLDOWN_SECS
+            self.consecutive_failures = 0
+
+
+_route_stats: dict[str, RouteStats] = {}
+
+
+def provider_class(provider: str) -> tuple[type, str]:
+    """(service class, API key env var); unknown providers use the OpenAI client with their base_url."""
+    module, name, key_env = PROVIDERS.get(provider, PROVIDERS["openai"])
+    return getattr(importlib.import_module(module), name), key_env
+
+
+def routing_error(config) -> str | None:
+    """Why an llm_routing config can't be used, or None if it can."""
+    if not isinstance(config, dict):
+        return "llm_routing must be an object"
+    if not isinstance(config.get("hedge", True), bool):
+        return "llm_routing.hedge must be a boolean"
+    providers = config.get("providers")
+    if not isinstance(providers, list) or not providers:
+        return "llm_routing.providers must be a non-empty list"
+    for p in providers:
+        if not isinstance(p, dict) or not all(isinstance(p.get(k), str) and p[k] for k in ("provider", "model")):
+            return "each llm_routing provider needs string 'provider' and 'model'"
+        if unknown := set(p) - ROUTE_KEYS:
+            return f"unsupported llm_routing provider keys: {sorted(unknown)} (use api_key_env for keys)"
+        if p["provider"] not in PROVIDERS and not p.get("base_url"):
+            return f"provider {p['provider']!r} needs a base_url"
+        if any(k in p and not isinstance(p[k], str) for k in ("base_url", "api_key_env")):
+            return "base_url and api_key_env must be strings"
+    return None
+
+
+def resolve_routing(config: dict | None) -> dict:
+    """The config to route with: DEFAULT_ROUTING when unset or invalid."""
+    if config is None:
+        return DEFAULT_ROUTING
+    if error := routing_error(config):
+        logger.warning(f"Invalid llm_routing ({error}); using {DEFAULT_ROUTING['providers']}")
+        return DEFAULT_ROUTING
+    return config
+
+
+def preload_providers(configs: list[dict | None]):
+    """Import the service classes the given llm_routing configs use (startup warmup)."""
+    providers = set()
+    for config in configs:
+        for p in resolve_routing(config)["providers"]:
+            providers.add(p["provider"])
+    for provider in providers:
+        provider_class(provider)
+    return sorted(providers)
+
+
+def route_stats() -> dict[str, dict]:
+    """Snapshot of all routes' TTFT/health, for logging or an endpoint."""
+    return {
+        key: {
+            "p50_ms": round(s.p50() * 1000, 1) if s.p50() is not None else None,
+            "p95_ms": round(s.p95() * 1000, 1) if s.p95() is not None else None,
+            "healthy": s.healthy(),
+            "wins": s.wins,
+            "errors": s.errors,
+        }
+        for key, s in _route_stats.items()
+    }
+
+
+class LLMRoute:
+    """One provider/model, backed by a pipecat service used only as a client."""
+
+    def __init__(self, provider: str, model: str, base_url: str | None = None, api_key_env: str | None = None, **params):
+        service_cls, key_env = provider_class(provider)
+        if base_url and not api_key_env:
+            key_env = None  # the provider's key is only sent to the provider
+        elif api_key_env:
+            key_env = api_key_env
+        # A placeholder, not None: the OpenAI client would fall back to OPENAI_API_KEY
+        kwargs = {"api_key": (os.getenv(key_env) if key_env else None) or "none", "model": model}
+        if base_url:
+            kwargs["base_url"] = base_url
+        if params:
+            kwargs["params"] = service_cls.InputParams(**params)
+        self.key = f"{provider}/{model}"
+        self.service = service_cls(**kwargs)
+        # The router fails over itself; client-side retries would only delay that
+        self.service._client = self.service._client.with_options(max_retries=0)
+        self.stats = _route_stats.setdefault(self.key, RouteStats())
+
+    async def open(self, params_from_context) -> tuple:
+        """Start a streaming completion and wait for its first chunk.
+
+        Returns (stream, iterator, first_chunk, ttft_secs).
+        """
+        started = time.monotonic()
+        stream = await self.service.get_chat_completions(params_from_context)
+        iterator = stream.__aiter__()
+        try:
+            first = await iterator.__anext__()
+        except BaseException:
+            await _close(stream)
+            raise
+        return stream, iterator, first, time.monotonic() - started
+
+
+async def _close(stream):
+    if hasattr(stream, "aclose"):
+        await stream.aclose()
+    elif hasattr(stream, "close"):
+        await stream.close()
+
+
+async def _relay(stream, iterator, first):
+    try:
+        yield first
+        async for chunk in iterator:
+            yield chunk
+    finally:
+        await _close(stream)
+
+
+class RoutedLLMService(OpenAILLMService):
+    """OpenAILLMService that routes each completion to the fastest healthy route."""
+
+    def __init__(
+        self,
+        routes: list[LLMRoute],
+        hedge: bool = True,
+        hedge_min_secs: float = 0.3,
+        hedge_max_secs: float = 2.0,
+        **kwargs,
+    ):
+        primary = routes[0].service
+        super().__init__(api_key="unused", model=primary.model_name, **kwargs)
+        self._routes = routes
+        self._hedge = hedge and len(routes) > 1
+        self._hedge_min_secs = hedge_min_secs
+        self._hedge_max_secs = hedge_max_secs
+        self.turn_log = []  # (route key, ttft secs, hedged) per completion
+
+    @classmethod
+    def from_config(cls, config: dict | None, **params) -> "RoutedLLMService":
+        """Build from an agent's llm_routing JSON; `params` are the shared InputParams."""
+        config = resolve_routing(config)
+        routes = [LLMRoute(**{**params, **p}) for p in config["providers"]]
+        return cls(routes, hedge=config.get("hedge", True))
+
+    def _ranked_routes(self) -> list[LLMRoute]:
+        def rank(route: LLMRoute):
+            p50 = route.stats.p50()
+            # Healthy first; unknown TTFT keeps config order ahead of known-slow routes
+            return (not route.stats.healthy(), p50 if p50 is not None else 0.0)
+
+        return sorted(self._routes, key=rank)
+
+    def _hedge_delay(self, route: LLMRoute) -> float:
+        p95 = route.stats.p95()
+        if p95 is None:
+            return self._hedge_max_secs
+        return min(self._hedge_max_secs, max(self._hedge_min_secs, p95))
+
+    async def get_chat_completions(self, params_from_context, log_turn: bool = True):
+        """`log_turn=False` keeps side requests (speculation) out of `turn_log`."""
+        ranked = self._ranked_routes()
+        pending: dict[asyncio.Task, LLMRoute] = {}
+        hedged = False
+        last_error = None
+
+        def launch(route: LLMRoute):
+            pending[asyncio.create_task(route.open(params_from_context))] = route
+
+        launch(ranked.pop(0))
+        try:
+            while pending:
+                timeout = None
+                if self._hedge and not hedged and ranked and len(pending) == 1:
+                    timeout = self._hedge_delay(next(iter(pending.values())))
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    route = ranked.pop(0)
+                    logger.debug(f"{self}: hedging with {route.key} after {timeout * 1000:.0f}ms")
+                    hedged = True
+                    launch(route)
+                    continue
+
+                for task in done:
+                    route = pending.pop(task)
+                    try:
+                        stream, iterator, first, ttft = task.result()
+                    except Exception as e:
+                        last_error = e
+                        route.stats.record_failure()
+                        logger.warning(f"{self}: {route.key} failed: {e}")
+                        if ranked and not pending:
+                            launch(ranked.pop(0))  # fail over
+                        continue
+
+                    route.stats.record_success(ttft)
+                    if log_turn:
+                        self.turn_log.append((route.key, ttft, hedged))
+                        self.set_full_model_name(route.service.model_name)
+                    return _relay(stream, iterator, first)
+        finally:
+            for task in pending:
+                task.cancel()
+                task.add_done_callback(_close_abandoned)
+
+        raise last_error or RuntimeError("No LLM route available")
+
+    def stats(self) -> dict:
+        by_route = {}
+        for key, ttft, hedged in self.turn_log:
+            r = by_route.setdefault(key, {"turns": 0, "hedged": 0, "ttft_ms": []})
+            r["turns"] += 1
+            r["hedged"] += int(hedged)
+            r["ttft_ms"].append(round(ttft * 1000, 1))
+        return by_route
+
+
+def _close_abandoned(task: asyncio.Task):
+    """Close the stream of a hedge loser that finished after the winner was chosen."""
+    if task.cancelled() or task.exception():
+        return
+    stream = task.result()[0]
+    asyncio.ensure_future(_close(stream))
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    import socket
+    import threading
+
+    import uvicorn
+    from fastapi import FastAPI, Request
+    from fastapi.responses import StreamingResponse
+
+    parser = argparse.ArgumentParser(description="Exercise routing, hedging and failover against local fake endpoints")
+    parser.add_argument("--fake", action="store_true")
+    parser.add_argument("--turns", type=int, default=12)
+    args = parser.parse_args()
+    if not args.fake:
+        parser.print_help()
+        raise SystemExit
+
+    # model name → behaviour: "fast-N"/"slow-N" stream after N ms; "down" fails; "flaky" fails every other request
+    fake = FastAPI()
+    requests_seen: dict[str, int] = {}
+    auth_seen: set[str] = set()
+
+    @fake.post("/v1/chat/completions")
+    async def completions(request: Request):
+        body = await request.json()
+        model = body["model"]
+        n = requests_seen[model] = requests_seen.get(model, 0) + 1
+        auth_seen.add(request.headers.get("authorization", ""))
+        if model == "down" or (model == "flaky" and n % 2):
+            return StreamingResponse(iter(()), status_code=503)
+        delay = int(model.split("-")[1]) / 1000 if "-" in model else 0.0
+
+        async def stream():
+            await asyncio.sleep(delay)
+            for i, word in enumerate(["Hello", " from", f" {model}"]):
+                chunk = {"id": "x", "object": "chat.completion.chunk", "created": 0, "model": model,
+                         "choices": [{"index": 0, "delta": {"role": "assistant", "content": word} if i == 0 else {"content": word}, "finish_reason": None}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    server = uvicorn.Server(uvicorn.Config(fake, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    base_url = f"http://127.0.0.1:{port}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "sk-real-key-must-not-leak")
+
+    async def run(config: dict, turns: int) -> dict:
+        assert routing_error(config) is None, routing_error(config)
+        llm = RoutedLLMService.from_config(config)
+        params = {"messages": [{"role": "user", "content": "hi"}]}
+        for _ in range(turns):
+            text = ""
+            async for chunk in await llm.get_chat_completions(params):
+                if chunk.choices and chunk.choices[0].delta.content:
+                    text += chunk.choices[0].delta.content
+            assert text.startswith("Hello from"), text
+        return llm.stats()
+
+    def providers(*models: str) -> list[dict]:
+        return [{"provider": "openai", "model": m, "base_url": base_url} for m in models]
+
+    async def main():
+        checks = {}
+        # Fastest route wins once TTFT history exists
+        stats = await run({"providers": providers("slow-400", "fast-20")}, args.turns)
+        checks["routes to fast"] = stats.get("openai/fast-20", {}).get("turns", 0) >= args.turns - 2
+        # A stalled primary is hedged by the second route
+        stats = await run({"providers": providers("slow-2500", "fast-30")}, 1)
+        checks["hedged past slow"] = stats.get("openai/fast-30", {}).get("hedged") == 1
+        # Errors before the first chunk fail over
+        stats = await run({"providers": providers("down", "fast-10"), "hedge": False}, 3)
+        checks["fails over"] = stats.get("openai/fast-10", {}).get("turns") == 3
+        stats = await run({"providers": providers("flaky", "fast-15"), "hedge": False}, 4)
+        checks["flaky recovers"] = sum(r["turns"] for r in stats.values()) == 4
+        checks["no provider key sent to base_url"] = not any("sk-real-key" in a for a in auth_seen)
+        checks["invalid config rejected"] = all(routing_error(c) for c in (
+            ["openai"], {"providers": [{"provider": "groq"}]}, {"providers": [{"provider": "x", "model": "m"}]},
+            {"providers": [{"provider": "openai", "model": "m", "api_key": "sk-inline"}]},
+        ))
+        print(json.dumps({"requests": requests_seen, "routes": route_stats(), "checks": checks}, indent=2))
+        if not all(checks.values()):
+            raise SystemExit(1)
+
+    asyncio.run(main())
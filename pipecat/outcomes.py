@@ -0,0 +1,286 @@
+"""Post-call outcome classification.
+
+Finished calls wait in call_logs with `analyzed_at IS NULL`. `OutcomeAnalyzer`
+picks them up after each call ends and classifies the transcript with
+deterministic rules in a process pool: booked, declined, callback, wrong
+number, plus the qualification fields the caller gave (the same extraction
+the context manager uses when folding turns). Calls the rules can't decide
+can optionally be sent to the LLM, several transcripts per request.
+
+Results go to call_logs.outcome/analysis (through update_call_logs, so the
+stats rollups follow), contacts.outcome and the campaign counters. Unanswered
+campaign contacts are requeued for retry (dial_scheduler.schedule_retries).
+
+Backfill historical calls across all cores:
+
+    python outcomes.py backfill [--all] [--workers 8] [--llm]
+"""
+
+import asyncio
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import httpx
+from loguru import logger
+
+TERMINAL_STATUSES = ("completed", "busy", "no-answer", "failed", "canceled")
+# Set by the call itself (voicemail detector, booking outbox); rules never override these
+AUTHORITATIVE_OUTCOMES = ("scheduled", "booking-failed", "voicemail")
+OUTCOMES = ("scheduled", "booking-failed", "not-interested", "callback", "wrong-number", "voicemail", "no-answer", "no-decision")
+
+# Checked against each caller turn; the last matching turn decides
+OUTCOME_RULES = [
+    ("wrong-number", re.compile(
+        r"\b(wrong number|don'?t own (?:it|that|the)|not the owner|no longer own|sold (?:it|the|that)|"
+        r"never owned|don'?t live there|you have the wrong)\b", re.I)),
+    ("not-interested", re.compile(
+        r"\b(not interested|no thanks|no thank you|take me off|remove me|don'?t call|stop calling|"
+        r"do not call|not looking|we'?re good|already have a roofer|leave me alone)\b", re.I)),
+    ("callback", re.compile(
+        r"\b(call (?:me )?back|call again|busy right now|not a good time|in a meeting|driving right now|"
+        r"call me (?:later|tomorrow|next week)|try (?:me )?(?:later|again))\b", re.I)),
+]
+
+ANALYZE_BATCH = 500
+ANALYZE_DELAY_SECS = 5.0  # let the bot save its transcript after Twilio's status callback
+LLM_BATCH = 8
+LLM_MODEL = "gpt-4o-mini"
+
+
+def classify(call: dict) -> dict:
+    """Rule-based analysis of one call. Runs in worker processes."""
+    from context_manager import extract_fields  # pulls in pipecat; keep it out of server import
+
+    try:
+        transcript = json.loads(call.get("transcript") or "[]")
+    except ValueError:
+        transcript = []
+    messages = [
+        {"role": t.get("role"), "content": t.get("text", "")}
+        for t in transcript if isinstance(t, dict)
+    ]
+    user_turns = [m["content"] for m in messages if m["role"] == "user" and m["content"].strip()]
+    fields = {k: v for k, v in extract_fields(messages, {}).items() if not k.startswith("_")}
+    result = {"call_sid": call["call_sid"], "fields": fields, "user_turns": len(user_turns)}
+
+    booking = call.get("booking_status")
+    if booking == "booked":
+        return {**result, "outcome": "scheduled", "source": "booking"}
+    if booking == "failed":
+        return {**result, "outcome": "booking-failed", "source": "booking"}
+    if call.get("outcome") in AUTHORITATIVE_OUTCOMES:
+        return {**result, "outcome": call["outcome"], "source": "call"}
+    if not user_turns:
+        return {**result, "outcome": "no-answer", "source": "rules"}
+
+    for text in reversed(user_turns):
+        for outcome, pattern in OUTCOME_RULES:
+            if m := pattern.search(text):
+                return {**result, "outcome": outcome, "source": "rules", "evidence": m.group(0)}
+    return {**result, "outcome": "no-decision", "source": "rules"}
+
+
+# ── Optional LLM pass for undecided calls ──
+
+def _llm_classify_batch(calls: list[dict]) -> list[str | None]:
+    """One request for several transcripts; returns an outcome (or None) per call."""
+    items = []
+    for i, call in enumerate(calls):
+        try:
+            turns = json.loads(call.get("transcript") or "[]")
+        except ValueError:
+            turns = []
+        text = "\n".join(f"{t.get('role')}: {t.get('text', '')}" for t in turns[-24:] if isinstance(t, dict))
+        items.append(f"### Call {i}\n{text[-3000:]}")
+    prompt = (
+        "Classify each outbound roofing sales call by the caller's final intent. "
+        "Outcomes: not-interested, callback, wrong-number, no-decision. "
+        'Reply with JSON: {"results": [{"call": <number>, "outcome": "<outcome>"}]}\n\n' + "\n\n".join(items)
+    )
+    try:
+        resp = httpx.post(
+            "https://api.openai.com/v1/chat/completions",
+            headers={"Authorization": f"Bearer {os.getenv('OPENAI_API_KEY')}"},
+            json={
+                "model": LLM_MODEL,
+                "messages": [{"role": "user", "content": prompt}],
+                "response_format": {"type": "json_object"},
+                "temperature": 0,
+            },
+            timeout=30.0,
+        )
+        resp.raise_for_status()
+        data = json.loads(resp.json()["choices"][0]["message"]["content"])
+    except Exception as e:
+        logger.warning(f"🏷️ LLM outcome classification failed: {e}")
+        return [None] * len(calls)
+    outcomes = [None] * len(calls)
+    for r in data.get("results", []):
+        i = r.get("call")
+        if isinstance(i, int) and 0 <= i < len(calls) and r.get("outcome") in OUTCOMES:
+            outcomes[i] = r["outcome"]
+    return outcomes
+
+
+def _llm_pass(calls: list[dict], results: list[dict]):
+    undecided = [i for i, r in enumerate(results) if r["outcome"] == "no-decision"]
+    for start in range(0, len(undecided), LLM_BATCH):
+        idx = undecided[start:start + LLM_BATCH]
+        for i, outcome in zip(idx, _llm_classify_batch([calls[i] for i in idx])):
+            if outcome and outcome != "no-decision":
+                results[i]["outcome"] = outcome
+                results[i]["source"] = "llm"
+
+
+# ── Queue ──
+
+def _load_pending(limit: int) -> list[dict]:
+    from db import get_db
+    from payload_codec import codec
+
+    conn = get_db()
+    rows = conn.execute(
+        f"""SELECT cl.id, cl.call_sid, cl.status, cl.outcome, cl.transcript,
+                  (SELECT b.status FROM bookings b WHERE b.call_sid = cl.call_sid
+                   ORDER BY b.status = 'booked' DESC, b.id DESC LIMIT 1) AS booking_status
+           FROM call_logs cl
+           WHERE cl.analyzed_at IS NULL
+             AND cl.status IN ({", ".join("?" for _ in TERMINAL_STATUSES)})
+             AND (cl.transcript IS NOT NULL OR cl.status != 'completed'
+                  OR cl.created_at < datetime('now', '-1 hour'))
+           ORDER BY cl.id LIMIT ?""",
+        (*TERMINAL_STATUSES, limit),
+    ).fetchall()
+    calls = [{**dict(r), "transcript": codec.decode(r["transcript"], conn)} for r in rows]
+    conn.close()
+    return calls
+
+
+def _save(calls: list[dict], results: list[dict]):
+    from db import get_db, refresh_campaign_counters, update_call_logs
+    from dial_scheduler import schedule_retries
+
+    now = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
+    updates = []
+    for call, r in zip(calls, results):
+        fields = {"analysis": json.dumps({k: v for k, v in r.items() if k != "call_sid"}), "analyzed_at": now}
+        if r["outcome"] != call["outcome"]:
+            fields["outcome"] = r["outcome"]
+        updates.append((call["id"], fields))
+    update_call_logs(updates, key="id")
+
+    conn = get_db()
+    sids = [c["call_sid"] for c in calls if c["call_sid"]]
+    conn.executemany(
+        "UPDATE contacts SET outcome = ? WHERE call_sid = ?",
+        [(r["outcome"], c["call_sid"]) for c, r in zip(calls, results) if c["call_sid"]],
+    )
+    # Unanswered campaign dials go back in the queue
+    schedule_retries(conn, [(c["call_sid"], c["status"], r["outcome"]) for c, r in zip(calls, results)])
+    campaign_ids = []
+    for start in range(0, len(sids), 500):
+        chunk = sids[start:start + 500]
+        campaign_ids += [
+            row[0] for row in conn.execute(
+                f"SELECT DISTINCT campaign_id FROM contacts WHERE campaign_id IS NOT NULL "
+                f"AND call_sid IN ({', '.join('?' for _ in chunk)})",
+                chunk,
+            ).fetchall()
+        ]
+    conn.commit()
+    conn.close()
+    refresh_campaign_counters(campaign_ids)
+
+
+def analyze_pending(executor: ProcessPoolExecutor, use_llm: bool = False, limit: int = ANALYZE_BATCH) -> int:
+    """Classify one batch of finished calls; returns how many were analyzed."""
+    calls = _load_pending(limit)
+    if not calls:
+        return 0
+    results = list(executor.map(classify, calls, chunksize=max(1, len(calls) // 32)))
+    if use_llm:
+        _llm_pass(calls, results)
+    _save(calls, results)
+    return len(calls)
+
+
+class OutcomeAnalyzer:
+    """Runs analysis passes in the background after calls end; one per server process."""
+
+    def __init__(self, workers: int | None = None, use_llm: bool | None = None):
+        self._workers = workers or min(4, os.cpu_count() or 1)
+        self._use_llm = os.getenv("OUTCOME_LLM", "0") == "1" if use_llm is None else use_llm
+        self._executor: ProcessPoolExecutor | None = None
+        self._task: asyncio.Task | None = None
+        self._wake = asyncio.Event()
+
+    def start(self):
+        if self._task and not self._task.done():
+            return
+        self._executor = self._executor or ProcessPoolExecutor(max_workers=self._workers)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._executor:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def wake(self):
+        """A call just finished (status callback or transcript saved)."""
+        self._wake.set()
+
+    async def _run(self):
+        while True:
+            try:
+                while n := await asyncio.to_thread(analyze_pending, self._executor, self._use_llm):
+                    logger.info(f"🏷️ Classified outcomes for {n} call(s)")
+            except Exception as e:
+                logger.error(f"🏷️ Outcome analysis error: {e}")
+            await self._wake.wait()
+            self._wake.clear()
+            await asyncio.sleep(ANALYZE_DELAY_SECS)
+
+
+outcome_analyzer = OutcomeAnalyzer()
+
+
+def backfill(reanalyze: bool, workers: int, use_llm: bool, batch: int):
+    from db import get_db, init_db
+
+    init_db()
+    if reanalyze:
+        conn = get_db()
+        conn.execute("UPDATE call_logs SET analyzed_at = NULL")
+        conn.commit()
+        conn.close()
+    started = time.perf_counter()
+    total = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while n := analyze_pending(executor, use_llm, limit=batch):
+            total += n
+            logger.info(f"🏷️ {total} calls classified ({total / (time.perf_counter() - started):.0f}/s)")
+    print(f"Classified {total} calls in {time.perf_counter() - started:.1f}s with {workers} workers")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Post-call outcome classification")
+    sub = parser.add_subparsers(dest="command", required=True)
+    bf = sub.add_parser("backfill", help="classify historical calls")
+    bf.add_argument("--all", action="store_true", help="re-classify calls that were already analyzed")
+    bf.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    bf.add_argument("--llm", action="store_true", help="send undecided calls to the LLM in batches")
+    bf.add_argument("--batch", type=int, default=5000)
+    args = parser.parse_args()
+    backfill(args.all, args.workers, args.llm, args.batch)
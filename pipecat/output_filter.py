@@ -0,0 +1,156 @@
+"""Streaming filter for LLM "internal thought" leakage before TTS.
+
+Phrases are compiled once into an Aho-Corasick automaton. The automaton is fed
+character by character across TextFrames, so a phrase split over several
+streamed chunks is still caught, at constant cost per character. Frames that
+might be the start of a phrase are held back (at most one phrase length of
+text) until the match either completes — and the held frames are dropped — or
+becomes impossible and they are released.
+"""
+
+from collections import Counter, deque
+
+# Used when an agent has no output_filters configured
+DEFAULT_OUTPUT_FILTERS = [
+    "we need to",
+    "we wait",
+    "user hasn't",
+    "there's no action",
+    "waiting for user",
+    "no action",
+    "note:",
+    "internal:",
+    "[action",
+    "(action",
+    "wait for user",
+    "wait for response",
+    "(waiting",
+    "waiting for response",
+    "whenever you're ready",
+    "just need your",
+    "got it—just need",
+]
+
+# Pure punctuation frames never go to TTS
+_NOISE_TEXT = ("...", "…", ".", "..")
+
+
+def _normalize(text: str) -> str:
+    return text.lower().replace("’", "'")
+
+
+class PhraseAutomaton:
+    """Aho-Corasick automaton over lowercase phrases."""
+
+    def __init__(self, phrases: list[str]):
+        self.phrases = []
+        self._goto = [{}]
+        self._fail = [0]
+        self._depth = [0]
+        self._out = [None]  # phrase index ending at this state (longest via fail links)
+
+        for phrase in phrases:
+            phrase = _normalize(phrase.strip())
+            if not phrase or phrase in self.phrases:
+                continue
+            self.phrases.append(phrase)
+            state = 0
+            for ch in phrase:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._depth.append(self._depth[state] + 1)
+                    self._out.append(None)
+                    self._goto[state][ch] = nxt
+                state = nxt
+            self._out[state] = len(self.phrases) - 1
+
+        # BFS to fill failure links
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                if self._out[nxt] is None:
+                    self._out[nxt] = self._out[self._fail[nxt]]
+
+        self.max_len = max((len(p) for p in self.phrases), default=0)
+
+    def step(self, state: int, ch: str) -> int:
+        while state and ch not in self._goto[state]:
+            state = self._fail[state]
+        return self._goto[state].get(ch, 0)
+
+    def match(self, state: int) -> str | None:
+        idx = self._out[state]
+        return self.phrases[idx] if idx is not None else None
+
+    def depth(self, state: int) -> int:
+        return self._depth[state]
+
+
+class StreamingOutputFilter:
+    """Incremental phrase filter over a stream of text chunks.
+
+    `feed()` returns the items (the chunk text, or whatever payload was passed
+    with it, e.g. the original frame) that are safe to release downstream;
+    chunks that took part in a match are dropped. Call `flush()` at the end of
+    a response to release anything still held back.
+    """
+
+    def __init__(self, phrases: list[str] | None = None):
+        self.automaton = PhraseAutomaton(DEFAULT_OUTPUT_FILTERS if phrases is None else phrases)
+        self.hits = Counter()
+        self._state = 0
+        self._held = deque()  # (start_offset, length, payload)
+        self._pos = 0  # characters consumed in the current response
+
+    @property
+    def holding(self) -> bool:
+        return bool(self._held)
+
+    def reset(self):
+        self._state = 0
+        self._held.clear()
+        self._pos = 0
+
+    def feed(self, chunk: str, payload=None) -> list:
+        if chunk.strip() in _NOISE_TEXT:
+            return []
+
+        self._held.append((self._pos, len(chunk), chunk if payload is None else payload))
+        automaton = self.automaton
+        state = self._state
+        for ch in _normalize(chunk):
+            state = automaton.step(state, ch)
+            self._pos += 1
+            phrase = automaton.match(state)
+            if phrase:
+                self.hits[phrase] += 1
+                # Drop everything that was held, including the current chunk
+                self._held.clear()
+                self._state = 0
+                self._pos = 0
+                return []
+        self._state = state
+
+        # Release chunks that end before the longest possible partial match
+        safe_before = self._pos - automaton.depth(state)
+        released = []
+        while self._held and self._held[0][0] + self._held[0][1] <= safe_before:
+            released.append(self._held.popleft()[2])
+        return released
+
+    def flush(self) -> list:
+        released = [payload for _, _, payload in self._held]
+        self.reset()
+        return released
+
+    def stats(self) -> dict:
+        return dict(self.hits)
@@ -0,0 +1,330 @@
+"""zstd compression for transcripts and other turn payloads, with trained dictionaries.
+
+Transcripts repeat the same greeting and script lines call after call, so a
+zstd dictionary trained on our own history compresses them far better than
+zstd alone. Compressed values are stored as BLOBs in the same column; the
+zstd frame header carries the dictionary id, so every row says which
+dictionary version decodes it. Older rows (plain JSON text) read as-is.
+Dictionaries live in `zstd_dicts`. Retraining adds a new version: new
+writes use it, and old rows keep decoding with theirs until recompressed.
+
+Values are only decompressed when read for an API response or analysis;
+rollups, counters and search never touch them. The FTS index is built from
+the plaintext on the write path, before compression.
+
+Compression uses `zstandard`, a declared dependency since compressed rows
+can't be read without it; if it's missing anyway, new values are stored as
+text.
+
+    python payload_codec.py --train [--recompress] [--vacuum]
+    python payload_codec.py --stats
+    python payload_codec.py --bench --calls 5000
+"""
+
+import threading
+import time
+
+from loguru import logger
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+LEVEL = 9  # dictionary-compressed transcripts are small; 9 is still well under 100µs each
+DICT_SIZE = 64 * 1024
+TRAIN_SAMPLES = 5000  # most recent values of the kind
+MIN_TRAIN_SAMPLES = 200
+MIN_COMPRESS_BYTES = 64
+DICT_ID_BASE = 32768  # zstd reserves lower dictionary ids for a public registry
+RECOMPRESS_BATCH = 500
+
+# kind → (table, column) that holds it
+COLUMNS = {
+    "transcript": ("call_logs", "transcript"),
+}
+
+
+class PayloadCodec:
+    """Encoders per kind (current dictionary) and decoders per dictionary id; thread-safe."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._compressors: dict[str, tuple[int, object]] = {}  # kind → (dict_id, ZstdCompressor)
+        self._decompressors: dict[int, object] = {}  # dict_id → ZstdDecompressor
+        self._stopping = threading.Event()
+
+    def _query(self, conn, sql: str, params: tuple = ()):
+        if conn is not None:
+            return conn.execute(sql, params).fetchone()
+        from db import get_db
+
+        conn = get_db()
+        try:
+            return conn.execute(sql, params).fetchone()
+        finally:
+            conn.close()
+
+    def _compressor(self, kind: str, conn):
+        entry = self._compressors.get(kind)
+        if entry is None:
+            row = self._query(conn, "SELECT dict_id, data FROM zstd_dicts WHERE kind = ? ORDER BY dict_id DESC LIMIT 1", (kind,))
+            if row:
+                zdict = zstandard.ZstdCompressionDict(row[1])
+                entry = (row[0], zstandard.ZstdCompressor(level=LEVEL, dict_data=zdict))
+            else:
+                entry = (0, zstandard.ZstdCompressor(level=LEVEL))
+            self._compressors[kind] = entry
+        return entry
+
+    def _decompressor(self, dict_id: int, conn):
+        d = self._decompressors.get(dict_id)
+        if d is None:
+            if dict_id == 0:
+                d = zstandard.ZstdDecompressor()
+            else:
+                row = self._query(conn, "SELECT data FROM zstd_dicts WHERE dict_id = ?", (dict_id,))
+                if not row:
+                    raise LookupError(f"zstd dictionary {dict_id} not found")
+                d = zstandard.ZstdDecompressor(dict_data=zstandard.ZstdCompressionDict(row[0]))
+            self._decompressors[dict_id] = d
+        return d
+
+    def encode(self, text: str | None, kind: str = "transcript", conn=None) -> str | bytes | None:
+        """Value to store for `text`: a zstd frame, or the text itself when that's not smaller."""
+        if text is None or zstandard is None:
+            return text
+        data = text.encode()
+        if len(data) < MIN_COMPRESS_BYTES:
+            return text
+        with self._lock:
+            _, compressor = self._compressor(kind, conn)
+            out = compressor.compress(data)
+        return out if len(out) < len(data) else text
+
+    def decode(self, value: str | bytes | None, conn=None) -> str | None:
+        """Stored value → text."""
+        if value is None or isinstance(value, str):
+            return value
+        if zstandard is None:
+            raise RuntimeError("Reading compressed payloads needs `pip install zstandard`")
+        dict_id = zstandard.get_frame_parameters(value).dict_id
+        with self._lock:
+            decompressor = self._decompressor(dict_id, conn)
+            return decompressor.decompress(value).decode()
+
+    def dict_id(self, value) -> int | None:
+        """Dictionary a stored value was compressed with (0: none); None for text."""
+        if not isinstance(value, bytes) or zstandard is None:
+            return None
+        return zstandard.get_frame_parameters(value).dict_id
+
+    # ── Dictionary maintenance ──
+
+    def train(self, kind: str = "transcript", conn=None) -> int | None:
+        """Train a new dictionary version on recent values; returns its id, or None if too few samples."""
+        from db import get_db
+
+        table, column = COLUMNS[kind]
+        own = conn is None
+        conn = conn or get_db()
+        try:
+            rows = conn.execute(
+                f"SELECT {column} FROM {table} WHERE {column} IS NOT NULL ORDER BY id DESC LIMIT ?", (TRAIN_SAMPLES,)
+            ).fetchall()
+            samples = [self.decode(r[0], conn).encode() for r in rows]
+            samples = [s for s in samples if len(s) >= MIN_COMPRESS_BYTES]
+            if len(samples) < MIN_TRAIN_SAMPLES:
+                return None
+            last = conn.execute("SELECT MAX(dict_id) FROM zstd_dicts").fetchone()[0]
+            dict_id = (last or DICT_ID_BASE) + 1
+            started = time.perf_counter()
+            zdict = zstandard.train_dictionary(DICT_SIZE, samples, dict_id=dict_id, level=LEVEL)
+            conn.execute(
+                "INSERT INTO zstd_dicts (dict_id, kind, data, samples) VALUES (?, ?, ?, ?)",
+                (dict_id, kind, zdict.as_bytes(), len(samples)),
+            )
+            conn.commit()
+        finally:
+            if own:
+                conn.close()
+        with self._lock:
+            self._compressors.pop(kind, None)
+        logger.info(
+            f"🗜️ Trained {kind} dictionary {dict_id} on {len(samples)} samples "
+            f"({(time.perf_counter() - started) * 1000:.0f}ms)"
+        )
+        return dict_id
+
+    def recompress(self, kind: str = "transcript", stop: threading.Event | None = None) -> dict:
+        """Re-encode values not on the kind's current dictionary, a short transaction per batch."""
+        from db import get_db
+
+        table, column = COLUMNS[kind]
+        conn = get_db()
+        current, _ = self._compressor(kind, conn)
+        stats = {"rows": 0, "bytes_before": 0, "bytes_after": 0}
+        last_id = 0
+        try:
+            while not (stop and stop.is_set()):
+                rows = conn.execute(
+                    f"SELECT id, {column} FROM {table} WHERE id > ? AND {column} IS NOT NULL ORDER BY id LIMIT ?",
+                    (last_id, RECOMPRESS_BATCH),
+                ).fetchall()
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                updates = []
+                for row_id, value in rows:
+                    if self.dict_id(value) == current:
+                        continue
+                    new = self.encode(self.decode(value, conn), kind, conn)
+                    if new != value:
+                        updates.append((new, row_id, value))
+                        stats["rows"] += 1
+                        stats["bytes_before"] += len(value if isinstance(value, bytes) else value.encode())
+                        stats["bytes_after"] += len(new if isinstance(new, bytes) else new.encode())
+                if updates:
+                    conn.execute("BEGIN IMMEDIATE")
+                    # Only if unchanged since we read it
+                    conn.executemany(f"UPDATE {table} SET {column} = ? WHERE id = ? AND {column} = ?", updates)
+                    conn.commit()
+        finally:
+            conn.close()
+        return stats
+
+    def maintain(self):
+        """First run with enough history: train each kind's dictionary and compress existing rows."""
+        if zstandard is None:
+            return
+        from db import get_db
+
+        self._stopping.clear()
+        for kind in COLUMNS:
+            conn = get_db()
+            try:
+                has_dict = conn.execute("SELECT 1 FROM zstd_dicts WHERE kind = ?", (kind,)).fetchone()
+            finally:
+                conn.close()
+            if has_dict:
+                continue
+            try:
+                if self.train(kind) is None:
+                    continue
+                stats = self.recompress(kind, self._stopping)
+                logger.info(f"🗜️ Compressed {stats['rows']} {kind} values: {stats['bytes_before']} → {stats['bytes_after']} bytes")
+            except Exception as e:
+                logger.error(f"🗜️ {kind} dictionary maintenance failed: {e}")
+
+    def stop(self):
+        self._stopping.set()
+
+
+codec = PayloadCodec()
+
+
+def storage_stats(kind: str = "transcript") -> dict:
+    """Values per dictionary and their stored size."""
+    from db import get_db
+
+    table, column = COLUMNS[kind]
+    conn = get_db()
+    by_dict: dict[str, dict] = {}
+    for (value,) in conn.execute(f"SELECT {column} FROM {table} WHERE {column} IS NOT NULL"):
+        dict_id = codec.dict_id(value)
+        key = "text" if dict_id is None else str(dict_id)
+        entry = by_dict.setdefault(key, {"rows": 0, "bytes": 0})
+        entry["rows"] += 1
+        entry["bytes"] += len(value if isinstance(value, bytes) else value.encode())
+    dicts = [dict(r) for r in conn.execute(
+        "SELECT dict_id, kind, samples, LENGTH(data) AS size, created_at FROM zstd_dicts WHERE kind = ? ORDER BY dict_id", (kind,)
+    )]
+    conn.close()
+    return {"kind": kind, "by_dictionary": by_dict, "dictionaries": dicts}
+
+
+# ── Benchmark ──
+
+def _bench(calls: int):
+    """Synthetic transcripts: size and per-value cost of plain JSON vs zstd vs zstd + trained dictionary."""
+    import json
+    import random
+
+    rng = random.Random(0)
+    script = [
+        "Hi {name}, this is Jamie with JJ Roofing. We've been helping your neighbors on {street} after the recent storms.",
+        "We're offering free roof inspections in your area this week. Would you have fifteen minutes for one of our inspectors?",
+        "Totally understand. A lot of homeowners don't realize they have hail damage until a leak shows up.",
+        "Great! I have openings on {day} morning or afternoon. Which works better for you?",
+        "Perfect, I'll get you booked for {day} at {hour}. You'll get a text confirmation shortly.",
+        "No problem at all, thanks for your time {name}, have a great day!",
+        "Is this a good number to reach you at?",
+        "Our inspection is completely free and there's no obligation.",
+    ]
+    replies = [
+        "who is this", "yeah I guess", "we just had our roof done", "not interested thanks", "what day",
+        "maybe afternoon", "is it free", "my husband handles that", "sure that works", "call me back later",
+        "how long does it take", "I'm renting", "we did have some shingles come off", "ok",
+    ]
+    names = ["John", "Maria", "Dave", "Linda", "Chris", "Pat", "Sam", "Alex"]
+    streets = ["Oak St", "Maple Ave", "Cedar Ln", "Pine Rd", "Elm Ct"]
+    days = ["Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]
+
+    def transcript() -> str:
+        fill = {"name": rng.choice(names), "street": rng.choice(streets), "day": rng.choice(days), "hour": f"{rng.randint(8, 16)}:00"}
+        turns = [{"role": "assistant", "text": script[0].format(**fill)}]
+        for _ in range(rng.randint(2, 10)):
+            turns.append({"role": "user", "text": " ".join(rng.sample(replies, rng.randint(1, 2)))})
+            turns.append({"role": "assistant", "text": rng.choice(script[1:]).format(**fill)})
+        return json.dumps(turns)
+
+    values = [transcript().encode() for _ in range(calls)]
+    train, test = values[: calls // 2], values[calls // 2:]
+    zdict = zstandard.train_dictionary(DICT_SIZE, train, dict_id=DICT_ID_BASE + 1, level=LEVEL)
+    raw = sum(map(len, test))
+    print(f"{len(test)} transcripts, avg {raw / len(test):.0f} bytes JSON, dictionary {len(zdict.as_bytes()) // 1024}KB")
+    for name, c, d in (
+        ("zstd", zstandard.ZstdCompressor(level=LEVEL), zstandard.ZstdDecompressor()),
+        ("zstd+dict", zstandard.ZstdCompressor(level=LEVEL, dict_data=zdict), zstandard.ZstdDecompressor(dict_data=zdict)),
+    ):
+        t = time.perf_counter()
+        out = [c.compress(v) for v in test]
+        enc = (time.perf_counter() - t) / len(test) * 1e6
+        t = time.perf_counter()
+        assert [d.decompress(o) for o in out] == test
+        dec = (time.perf_counter() - t) / len(test) * 1e6
+        size = sum(map(len, out))
+        print(f"{name:>10}: {size / len(test):6.0f} bytes avg  {raw / size:5.1f}x  encode {enc:5.1f}µs  decode {dec:5.1f}µs")
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Transcript compression dictionaries")
+    parser.add_argument("--train", action="store_true", help="train a new dictionary version")
+    parser.add_argument("--recompress", action="store_true", help="re-encode rows not on the current dictionary")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM afterwards to return freed pages to the OS")
+    parser.add_argument("--stats", action="store_true")
+    parser.add_argument("--kind", default="transcript", choices=sorted(COLUMNS))
+    parser.add_argument("--bench", action="store_true")
+    parser.add_argument("--calls", type=int, default=5000)
+    args = parser.parse_args()
+    if zstandard is None:
+        parser.error("needs `pip install zstandard`")
+    if args.bench:
+        _bench(args.calls)
+    else:
+        from db import get_db, init_db
+
+        init_db()
+        if args.train and codec.train(args.kind) is None:
+            print(f"Not enough {args.kind} samples to train (need {MIN_TRAIN_SAMPLES})")
+        if args.recompress:
+            print(json.dumps(codec.recompress(args.kind)))
+        if args.vacuum:
+            conn = get_db()
+            conn.execute("VACUUM")
+            conn.close()
+        if args.stats or not (args.train or args.recompress or args.vacuum):
+            print(json.dumps(storage_stats(args.kind), indent=2))
@@ -0,0 +1,126 @@
+"""Per-agent warmup of the shared, cacheable prompt prefix.
+
+OpenAI caches prompt prefixes of 1024+ tokens for a few minutes of inactivity.
+Prompts are laid out so that the tools and the agent's static system prompt
+(template + knowledge base) are byte-identical for every call of an agent, and
+per-contact details come after them. One warmup request per agent keeps that
+prefix hot; it is re-sent only when the last request for the agent is older
+than `interval_secs`, instead of once per call.
+
+Running campaigns hold a lease on their agent, which keeps a background loop
+warming the prefix until the run has placed its last call; calls still in
+progress after that refresh the cache with their own turns (`mark_used`).
+
+Warmups go to the agent's primary route (the first `llm_routing` provider)
+with its model. They're skipped when that route isn't OpenAI itself, whose
+prefix cache is what this warms.
+"""
+
+import asyncio
+import os
+import time
+from collections import Counter
+
+import httpx
+from loguru import logger
+
+WARM_INTERVAL_SECS = 240.0  # OpenAI keeps cached prefixes ~5-10 min when idle
+
+
+class PrefixWarmer:
+    """Keeps each agent's static prompt prefix in the provider's prompt cache."""
+
+    def __init__(self, interval_secs: float = WARM_INTERVAL_SECS, model: str = "gpt-4o-mini"):
+        self._interval = interval_secs
+        self._model = model  # for agents registered without a route
+        self._prefixes: dict[str, dict] = {}  # agent_id → {"prompt": str, "tools": list | None, "model": str | None}
+        self._last_used: dict[str, float] = {}
+        self._leases = Counter()
+        self._loops: dict[str, asyncio.Task] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+        self.cache_stats: dict[str, dict] = {}  # agent_id → last warmup usage
+
+    def _stale(self, agent_id: str) -> bool:
+        return time.monotonic() - self._last_used.get(agent_id, 0.0) >= self._interval
+
+    def register(self, agent_id: str, prompt: str, tools: list | None = None, route: dict | None = None):
+        """Record the agent's current static prefix (tools only known once a call provides them).
+
+        `route` is the agent's primary llm_routing provider; non-OpenAI routes aren't warmed.
+        """
+        prefix = self._prefixes.setdefault(agent_id, {"prompt": prompt, "tools": None, "model": self._model})
+        if route is not None:
+            openai = route.get("provider") == "openai" and not route.get("base_url")
+            prefix["model"] = route.get("model") if openai else None
+        if prefix["prompt"] != prompt:
+            prefix["prompt"] = prompt
+            self._last_used.pop(agent_id, None)  # template/KB changed → new prefix
+        if tools is not None:
+            prefix["tools"] = tools
+
+    def mark_used(self, agent_id: str):
+        """A real LLM request for this agent just refreshed the cache."""
+        self._last_used[agent_id] = time.monotonic()
+
+    async def warm(self, agent_id: str, force: bool = False) -> bool:
+        prefix = self._prefixes.get(agent_id)
+        if not prefix or prefix["tools"] is None or not prefix["model"]:
+            return False
+        lock = self._locks.setdefault(agent_id, asyncio.Lock())
+        async with lock:
+            if not force and not self._stale(agent_id):
+                return False
+            body = {
+                "model": prefix["model"],
+                "messages": [
+                    {"role": "system", "content": prefix["prompt"]},
+                    {"role": "user", "content": "Hello?"},
+                ],
+                "max_tokens": 1,
+            }
+            if prefix["tools"]:
+                body["tools"] = prefix["tools"]
+            try:
+                async with httpx.AsyncClient() as client:
+                    resp = await client.post(
+                        "https://api.openai.com/v1/chat/completions",
+                        headers={
+                            "Authorization": f"Bearer {os.getenv('OPENAI_API_KEY')}",
+                            "Content-Type": "application/json",
+                        },
+                        json=body,
+                        timeout=5.0,
+                    )
+                usage = resp.json().get("usage", {}) if resp.status_code == 200 else {}
+                cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0)
+                self.cache_stats[agent_id] = {"prompt_tokens": usage.get("prompt_tokens", 0), "cached_tokens": cached}
+                self.mark_used(agent_id)
+                logger.info(
+                    f"🔥 Prompt prefix warmed for {agent_id} "
+                    f"(status={resp.status_code}, cached={cached}/{usage.get('prompt_tokens', 0)})"
+                )
+                return resp.status_code == 200
+            except Exception as e:
+                logger.warning(f"⚠️ Prompt prefix warmup failed for {agent_id}: {e}")
+                return False
+
+    def acquire(self, agent_id: str, prompt: str, route: dict | None = None):
+        """Hold the agent's prefix warm (e.g. while a campaign is dialing)."""
+        self.register(agent_id, prompt, route=route)
+        self._leases[agent_id] += 1
+        task = self._loops.get(agent_id)
+        if not task or task.done():
+            self._loops[agent_id] = asyncio.create_task(self._keep_warm(agent_id))
+
+    def release(self, agent_id: str):
+        self._leases[agent_id] = max(0, self._leases[agent_id] - 1)
+
+    async def _keep_warm(self, agent_id: str):
+        while self._leases[agent_id] > 0:
+            await self.warm(agent_id)
+            elapsed = time.monotonic() - self._last_used.get(agent_id, 0.0)
+            await asyncio.sleep(max(5.0, self._interval - elapsed))
+        self._loops.pop(agent_id, None)
+
+
+prefix_warmer = PrefixWarmer()
@@ -0,0 +1,101 @@
+"""Read-through cache with strong ETags for the admin API's agent and KB reads.
+
+The admin pages reload `/agents`, `/agents/{id}` and `/agents/{id}/knowledge`
+(every full KB document) on each visit. Responses are kept here as rendered
+JSON bytes, keyed by endpoint, each with a generation number. The write
+handlers in server.py call `invalidate()` to bump the generation of every
+key they affect, and the next read rebuilds that key.
+
+The ETag is a hash of the body, so it's strong: equal tags mean identical
+bytes. A request whose `If-None-Match` matches gets `304 Not Modified`
+without touching SQLite or re-sending the body. Responses carry
+`Cache-Control: no-cache`, so browsers keep them and revalidate on every load.
+
+Writes made by other processes (the `kb_ingest.py` CLI, `outcomes.py
+--backfill`) don't invalidate this process's cache. Entries are therefore
+rebuilt at least every `MAX_AGE_SECS`.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Callable
+
+from fastapi import Request
+from fastapi.responses import Response
+
+MAX_AGE_SECS = float(os.getenv("READ_CACHE_MAX_AGE_SECS", "60"))
+
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def _matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    # If-None-Match uses weak comparison: W/"x" matches "x"
+    tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+class ReadCache:
+    """Rendered JSON responses by key, dropped when their key's generation changes."""
+
+    def __init__(self, max_age_secs: float = MAX_AGE_SECS):
+        self._max_age = max_age_secs
+        self._entries: dict[str, tuple[int, float, bytes, str]] = {}  # key → (generation, built_at, body, etag)
+        self._generations: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def invalidate(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                self._generations[key] = self._generations.get(key, 0) + 1
+                self._entries.pop(key, None)
+
+    def get(self, key: str, build: Callable[[], object]) -> tuple[bytes, str] | None:
+        """(body, etag) for `key`, building it from `build()` on a miss. None if `build()` returns None."""
+        with self._lock:
+            generation = self._generations.get(key, 0)
+            entry = self._entries.get(key)
+        if entry and entry[0] == generation and time.monotonic() - entry[1] < self._max_age:
+            self.hits += 1
+            return entry[2], entry[3]
+
+        self.misses += 1
+        content = build()
+        if content is None:
+            return None
+        body = json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+        etag = _etag(body)
+        with self._lock:
+            # Skip the store if a write invalidated the key while we were building
+            if self._generations.get(key, 0) == generation:
+                self._entries[key] = (generation, time.monotonic(), body, etag)
+        return body, etag
+
+    def respond(self, request: Request, cached: tuple[bytes, str]) -> Response:
+        """200 with the body, or 304 when the client already has this ETag."""
+        body, etag = cached
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if _matches(request.headers.get("if-none-match"), etag):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+        }
+
+
+read_cache = ReadCache()
@@ -0,0 +1,301 @@
+"""Call audio recording: ring-buffered capture, flushed to μ-law WAV off the event loop.
+
+`CallRecorder` sits right after `transport.output()`, where it sees both the
+caller's audio (InputAudioRawFrame, passed through by the STT) and the bot's
+audio (OutputAudioRawFrame, pushed on once it was written to Twilio). Each
+frame is copied once into a preallocated per-direction ring buffer — no
+allocation, encoding or file I/O happens on the event loop. A single
+background thread drains every active call's rings every `FLUSH_SECS`,
+interleaves them as a stereo track (caller left, bot right), encodes to
+8-bit μ-law and appends to `recordings/<date>/<call_sid>.wav`.
+
+The bot track is padded with silence whenever the caller track gets ahead,
+so both channels stay time-aligned while the bot is quiet.
+
+Benchmark the per-frame capture cost with many concurrent calls:
+
+    python recording.py --bench --calls 100 --seconds 20
+"""
+
+import os
+import struct
+import threading
+import time
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+from loguru import logger
+from pipecat.frames.frames import Frame, InputAudioRawFrame, OutputAudioRawFrame
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+
+from audio_codec import ULAW_TABLE
+
+RECORDINGS_DIR = Path(os.getenv("RECORDINGS_DIR", Path(__file__).parent / "recordings"))
+SAMPLE_RATE = 8000
+RING_SECS = 30  # per direction; the writer drains every FLUSH_SECS, so this is ample headroom
+FLUSH_SECS = 0.5
+
+
+class AudioRing:
+    """Single-producer/single-consumer byte ring.
+
+    The event loop writes, the writer thread reads. Positions are running
+    totals; if the reader falls more than a full ring behind, the oldest
+    unread bytes are dropped and counted.
+    """
+
+    def __init__(self, capacity: int):
+        self._buf = bytearray(capacity)
+        self._view = memoryview(self._buf)
+        self._capacity = capacity
+        self.written = 0
+        self.read = 0
+        self.dropped = 0
+
+    def write(self, data):
+        data = memoryview(data)
+        n = len(data)
+        if n > self._capacity:
+            data = data[n - self._capacity:]
+            n = self._capacity
+        pos = self.written % self._capacity
+        first = min(n, self._capacity - pos)
+        self._view[pos:pos + first] = data[:first]
+        if first < n:
+            self._view[:n - first] = data[first:]
+        self.written += n
+
+    def write_silence(self, n: int):
+        while n > 0:
+            chunk = min(n, len(_SILENCE))
+            self.write(_SILENCE[:chunk])
+            n -= chunk
+
+    def available(self) -> int:
+        return self.written - self.read
+
+    def take(self, n: int) -> bytes:
+        """Read up to n unread bytes (writer thread only)."""
+        if self.written - self.read > self._capacity:
+            lost = self.written - self.read - self._capacity
+            self.dropped += lost
+            self.read += lost
+        n = min(n, self.written - self.read)
+        pos = self.read % self._capacity
+        first = min(n, self._capacity - pos)
+        out = bytes(self._view[pos:pos + first])
+        if first < n:
+            out += bytes(self._view[:n - first])
+        self.read += n
+        return out
+
+
+_SILENCE = memoryview(bytes(SAMPLE_RATE * 2))  # 1s of 16-bit silence
+
+
+class _WavWriter:
+    """Stereo 8 kHz μ-law WAV; the size fields are patched on close."""
+
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._f = open(path, "wb")
+        self._frames = 0
+        self._f.write(self._header())
+
+    def _header(self) -> bytes:
+        data_len = self._frames * 2
+        fmt = struct.pack("<HHIIHHH", 7, 2, SAMPLE_RATE, SAMPLE_RATE * 2, 2, 8, 0)
+        return (
+            b"RIFF" + struct.pack("<I", 4 + 8 + len(fmt) + 12 + 8 + data_len) + b"WAVE"
+            + b"fmt " + struct.pack("<I", len(fmt)) + fmt
+            + b"fact" + struct.pack("<II", 4, self._frames)
+            + b"data" + struct.pack("<I", data_len)
+        )
+
+    def append(self, user: bytes, bot: bytes):
+        stereo = np.empty(len(user), dtype=np.uint16)  # 2 channels × int16 per pair of samples
+        stereo[0::2] = np.frombuffer(user, dtype=np.uint16)
+        stereo[1::2] = np.frombuffer(bot, dtype=np.uint16)
+        self._f.write(ULAW_TABLE[stereo].tobytes())
+        self._frames += len(user) // 2
+
+    def close(self):
+        self._f.seek(0)
+        self._f.write(self._header())
+        self._f.close()
+
+
+class _RecordingWriter:
+    """One background thread that flushes every active recording."""
+
+    def __init__(self):
+        self._sessions: set["CallRecorder"] = set()
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def register(self, recorder: "CallRecorder"):
+        with self._lock:
+            self._sessions.add(recorder)
+            if not self._thread or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="call-recording-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(FLUSH_SECS)
+            with self._lock:
+                sessions = list(self._sessions)
+            for rec in sessions:
+                try:
+                    done = rec._flush()
+                except Exception as e:
+                    logger.error(f"🎙️ Recording flush failed for {rec.call_sid}: {e}")
+                    done = True
+                if done:
+                    with self._lock:
+                        self._sessions.discard(rec)
+            with self._lock:
+                if not self._sessions:
+                    self._thread = None
+                    return
+
+
+_writer = _RecordingWriter()
+
+
+class CallRecorder(FrameProcessor):
+    """Records caller and bot audio for one call. Place directly after transport.output()."""
+
+    def __init__(self, call_sid: str, sample_rate: int = SAMPLE_RATE, metrics: dict | None = None):
+        super().__init__()
+        self.call_sid = call_sid or f"call-{int(time.time() * 1000)}"
+        self.path = RECORDINGS_DIR / date.today().isoformat() / f"{self.call_sid}.wav"
+        self._sample_rate = sample_rate
+        capacity = sample_rate * 2 * RING_SECS
+        self._user = AudioRing(capacity)
+        self._bot = AudioRing(capacity)
+        self._wav: _WavWriter | None = None
+        self._stopped = False
+        self._closed = threading.Event()
+        self._skipped = 0
+        self._stats = (metrics if metrics is not None else {}).setdefault("recording", {})
+        _writer.register(self)
+
+    def capture(self, frame: Frame):
+        """Hot path: copy the frame's audio into its ring, nothing else."""
+        if isinstance(frame, InputAudioRawFrame):
+            if frame.sample_rate != self._sample_rate:
+                self._skipped += 1
+                return
+            self._user.write(frame.audio)
+            # Bot silent → pad its track so the channels stay aligned
+            gap = self._user.written - self._bot.written
+            if gap > 0:
+                self._bot.write_silence(gap)
+        elif isinstance(frame, OutputAudioRawFrame):
+            if frame.sample_rate != self._sample_rate:
+                self._skipped += 1
+                return
+            self._bot.write(frame.audio)
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+        if not self._stopped:
+            self.capture(frame)
+        await self.push_frame(frame, direction)
+
+    def _flush(self) -> bool:
+        """Writer thread: append what both tracks have; returns True once closed."""
+        stopped = self._stopped
+        n = min(self._user.available(), self._bot.available())
+        if stopped:
+            n = max(self._user.available(), self._bot.available())
+        n -= n % 2
+        if n:
+            user, bot = self._user.take(n), self._bot.take(n)
+            # Only at the end can one track be short; pad it with silence
+            user, bot = user.ljust(n, b"\0"), bot.ljust(n, b"\0")
+            if self._wav is None:
+                self._wav = _WavWriter(self.path)
+            self._wav.append(user, bot)
+        if stopped:
+            if self._wav is not None:
+                self._wav.close()
+            self._closed.set()
+            return True
+        return False
+
+    def stop(self) -> dict:
+        """Stop capturing; the writer thread finishes the file in the background."""
+        self._stopped = True
+        seconds = max(self._user.written, self._bot.written) / (self._sample_rate * 2)
+        self._stats.update({
+            "path": str(self.path),
+            "seconds": round(seconds, 1),
+            "dropped_bytes": self._user.dropped + self._bot.dropped,
+            "skipped_frames": self._skipped,
+        })
+        logger.info(f"🎙️ Recording stopped for {self.call_sid}: {self._stats}")
+        return self._stats
+
+    def wait_closed(self, timeout: float | None = None) -> bool:
+        return self._closed.wait(timeout)
+
+
+# ── Benchmark ──
+
+def _bench(calls: int, seconds: float):
+    """Per-frame capture cost with `calls` concurrent recordings and the writer thread running."""
+    global RECORDINGS_DIR
+    import tempfile
+
+    frame_bytes = SAMPLE_RATE * 2 // 50  # 20ms Twilio frames
+    rng = np.random.default_rng(0)
+    audio = rng.integers(-3000, 3000, frame_bytes // 2, dtype=np.int16).tobytes()
+    user_frame = InputAudioRawFrame(audio=audio, sample_rate=SAMPLE_RATE, num_channels=1)
+    bot_frame = OutputAudioRawFrame(audio=audio, sample_rate=SAMPLE_RATE, num_channels=1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        RECORDINGS_DIR = Path(tmp)
+        recorders = [CallRecorder(f"bench-{i}") for i in range(calls)]
+        ticks = int(seconds * 50)
+        timings = []
+        started = time.perf_counter()
+        for tick in range(ticks):
+            for i, rec in enumerate(recorders):
+                t0 = time.perf_counter_ns()
+                rec.capture(user_frame)
+                if (tick + i) % 3:  # bot talks ~2/3 of the time
+                    rec.capture(bot_frame)
+                timings.append(time.perf_counter_ns() - t0)
+            # Pace like real time so the writer thread competes as it would live
+            behind = started + (tick + 1) * 0.02 - time.perf_counter()
+            if behind > 0:
+                time.sleep(behind)
+        for rec in recorders:
+            rec.stop()
+        for rec in recorders:
+            rec.wait_closed(10)
+        sizes = sum(rec.path.stat().st_size for rec in recorders)
+        dropped = sum(rec._user.dropped + rec._bot.dropped for rec in recorders)
+
+    t = np.array(timings) / 1000
+    print(f"{calls} calls × {seconds:.0f}s, {len(t)} capture calls (20ms user + bot frames)")
+    print(f"capture µs: mean={t.mean():.2f} p50={np.percentile(t, 50):.2f} p99={np.percentile(t, 99):.2f} max={t.max():.1f}")
+    print(f"event-loop share: {t.sum() / 1e6 / seconds * 100:.2f}% of one core | written {sizes / 1e6:.1f} MB, dropped {dropped} bytes")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the call recording tap")
+    parser.add_argument("--bench", action="store_true")
+    parser.add_argument("--calls", type=int, default=100)
+    parser.add_argument("--seconds", type=float, default=20)
+    args = parser.parse_args()
+    if args.bench:
+        _bench(args.calls, args.seconds)
+    else:
+        parser.print_help()
@@ -0,0 +1,175 @@
+"""Cal.com availability cache for in-call booking.
+
+Each agent's open slots (next `DAYS_AHEAD` days) are fetched from Cal.com when
+a call connects and refreshed after `SLOT_TTL_SECS`. The `check_availability`
+tool answers from this cache, and `book_meeting` validates the requested time
+against it before posting, so a taken slot is caught locally instead of after
+a failed booking round trip.
+
+CAL_API_URL can point at a local fake Cal.com server for testing.
+"""
+
+import asyncio
+import os
+import time
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import httpx
+from loguru import logger
+
+CAL_API_URL = os.getenv("CAL_API_URL", "https://api.cal.com/v1").rstrip("/")
+CAL_TIMEZONE = ZoneInfo("America/Chicago")
+SLOT_TTL_SECS = 120.0
+DAYS_AHEAD = 7
+
+
+def parse_time(value: str) -> datetime | None:
+    """Parse an ISO 8601 time; naive times are taken as America/Chicago."""
+    try:
+        dt = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except (ValueError, AttributeError):
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=CAL_TIMEZONE)
+    return dt
+
+
+def speak_time(dt: datetime) -> str:
+    local = dt.astimezone(CAL_TIMEZONE)
+    return local.strftime("%A %B %d at %I:%M %p").replace(" 0", " ")
+
+
+class SlotCache:
+    """Open slots for one Cal.com event type, shared by all calls of the agent."""
+
+    def __init__(self, api_key: str, event_type_id: str):
+        self._api_key = api_key
+        self._event_type_id = event_type_id
+        self._slots: list[datetime] = []
+        self._fetched_at = 0.0
+        self._window: tuple[datetime, datetime] | None = None  # range the cached slots cover
+        self._lock = asyncio.Lock()
+
+    @property
+    def fresh(self) -> bool:
+        return time.monotonic() - self._fetched_at < SLOT_TTL_SECS
+
+    async def refresh(self, force: bool = False) -> list[datetime]:
+        async with self._lock:
+            if self.fresh and not force:
+                return self._slots
+            now = datetime.now(CAL_TIMEZONE)
+            started = time.monotonic()
+            async with httpx.AsyncClient() as client:
+                resp = await client.get(
+                    f"{CAL_API_URL}/slots",
+                    params={
+                        "apiKey": self._api_key,
+                        "eventTypeId": self._event_type_id,
+                        "startTime": now.isoformat(),
+                        "endTime": (now + timedelta(days=DAYS_AHEAD)).isoformat(),
+                        "timeZone": str(CAL_TIMEZONE),
+                    },
+                    timeout=5.0,
+                )
+                resp.raise_for_status()
+            slots = []
+            for day_slots in resp.json().get("slots", {}).values():
+                for slot in day_slots:
+                    dt = parse_time(slot.get("time", ""))
+                    if dt and dt > now:
+                        slots.append(dt)
+            self._slots = sorted(slots)
+            self._window = (now, now + timedelta(days=DAYS_AHEAD))
+            self._fetched_at = time.monotonic()
+            logger.info(
+                f"📅 Cal.com slots cached: {len(self._slots)} open in next {DAYS_AHEAD} days "
+                f"({(time.monotonic() - started) * 1000:.0f}ms)"
+            )
+            return self._slots
+
+    async def slots(self) -> list[datetime]:
+        """Cached slots; refreshes if stale, falls back to stale data on error."""
+        try:
+            return await self.refresh()
+        except Exception as e:
+            logger.warning(f"📅 Cal.com slot refresh failed, using cached slots: {e}")
+            return self._slots
+
+    async def prefetch(self):
+        try:
+            await self.refresh()
+        except Exception as e:
+            logger.warning(f"📅 Cal.com slot prefetch failed: {e}")
+
+    def remove(self, dt: datetime):
+        self._slots = [s for s in self._slots if s != dt]
+
+    async def is_open(self, dt: datetime) -> bool | None:
+        """True/False if known; None if availability couldn't be loaded or `dt` is
+        outside the cached window, so the booking is left to Cal.com."""
+        slots = await self.slots()
+        if self._window is None or not self._window[0] <= dt < self._window[1]:
+            return None
+        return dt in slots
+
+    def covers(self, day: date) -> bool:
+        """Whether the cached slots span all of `day` (days already past count as covered)."""
+        if self._window is None:
+            return False
+        day_end = datetime.combine(day + timedelta(days=1), datetime.min.time(), CAL_TIMEZONE)
+        return day_end <= self._window[1]
+
+    async def nearest(self, dt: datetime, n: int = 3) -> list[datetime]:
+        slots = await self.slots()
+        return sorted(slots, key=lambda s: abs(s - dt))[:n]
+
+    async def open_on(self, day: date | None, n: int = 6) -> list[datetime]:
+        slots = await self.slots()
+        if day is not None:
+            slots = [s for s in slots if s.astimezone(CAL_TIMEZONE).date() == day]
+        return slots[:n]
+
+
+_caches: dict[tuple[str, str], SlotCache] = {}
+
+
+def get_slot_cache(api_key: str, event_type_id: str) -> SlotCache | None:
+    if not api_key or not event_type_id:
+        return None
+    key = (api_key, str(event_type_id))
+    if key not in _caches:
+        _caches[key] = SlotCache(api_key, event_type_id)
+    return _caches[key]
+
+
+async def handle_check_availability(args: dict, cache: SlotCache | None) -> str:
+    """Handle the check_availability function call from the local cache."""
+    if cache is None:
+        return "Availability isn't connected for this agent. Ask the customer what day and time works for them."
+
+    day = None
+    if args.get("date"):
+        try:
+            day = date.fromisoformat(args["date"][:10])
+        except ValueError:
+            pass
+
+    slots = await cache.open_on(day)
+    if not slots and day is not None and not cache.covers(day):
+        # Past the cached week: no slots here doesn't mean the day is booked
+        return (
+            f"Availability for {day.strftime('%A %B %d')} can't be checked from here. If the customer wants that day, "
+            "book their preferred time and tell them it's requested and pending confirmation."
+        )
+    if not slots and day is not None:
+        alternatives = await cache.open_on(None)
+        if not alternatives:
+            return "There are no open inspection times in the next week. Let the customer know someone will call to schedule."
+        times = ", ".join(speak_time(s) for s in alternatives)
+        return f"Nothing open on {day.strftime('%A %B %d')}. The next open times are: {times}."
+    if not slots:
+        return "There are no open inspection times in the next week. Let the customer know someone will call to schedule."
+    times = ", ".join(speak_time(s) for s in slots)
+    return f"Open inspection times: {times}. ISO times for booking: {', '.join(s.astimezone(CAL_TIMEZONE).isoformat() for s in slots)}."
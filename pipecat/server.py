@@ -7,36 +7,117 @@ Endpoints:
 - POST /call-status — Twilio status callback
 - GET /agents — list all agents
 - GET /agents/{agent_id} — get agent details
+- GET /bookings — booking outbox status
+- GET /search — full-text search over call transcripts
+- GET /archive — archived call history by month
 """
 
 import os
 import json
+import asyncio
+import sqlite3
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
 from typing import Optional
 
 import uvicorn
 from dotenv import load_dotenv
 from fastapi import FastAPI, Request, WebSocket, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse
 from loguru import logger
 from twilio.rest import Client as TwilioClient
 from twilio.twiml.voice_response import Connect, Stream, VoiceResponse
 
 load_dotenv(override=True)
 
-# Import db module (auto-inits and seeds on import)
 from db import (
+    setup_db,
     get_db,
     get_agent,
     get_agent_by_phone,
     list_agents,
     build_system_prompt,
+    build_static_prompt,
     build_greeting,
+    ROLLUP_COLUMNS,
     log_call,
+    get_call_stats,
+    search_transcripts,
     update_call_log,
+    list_knowledge,
+    add_knowledge,
+    update_knowledge as db_update_knowledge,
+    delete_knowledge as db_delete_knowledge,
+    kb_storage_stats,
+    KNOWLEDGE_DIR,
+    archive_months,
+    attach_history,
+    call_log_partitions,
+    get_call_log,
 )
-
-app = FastAPI()
+from archive import archive_summary, archiver
+from dial_scheduler import (
+    MAX_WAIT_SECS,
+    REQUEUE_CHECK_SECS,
+    add_requeued,
+    claim,
+    contact_timezone,
+    load_scheduler,
+    local_hour,
+)
+from dial_pacer import dial_pacer, prior_from, recorded_outcomes
+from admission import admission
+from booking_outbox import booking_worker
+from outcomes import TERMINAL_STATUSES, outcome_analyzer
+from prompt_cache import prefix_warmer
+from read_cache import read_cache
+from json_stream import keyset_rows, stream_json
+from payload_codec import codec
+
+# Import bot.py (pipecat, Silero, providers) at startup instead of on the first call
+PRELOAD_BOT = os.getenv("PRELOAD_BOT", "1") == "1"
+
+
+def _preload_bot() -> dict:
+    import bot
+
+    return bot.preload()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = time.perf_counter()
+    setup_db()
+    logger.info(f"🗄️ Database ready ({(time.perf_counter() - started) * 1000:.0f}ms)")
+    if PRELOAD_BOT:
+        started = time.perf_counter()
+        timings = await asyncio.to_thread(_preload_bot)
+        logger.info(f"🔥 Bot preloaded in {(time.perf_counter() - started) * 1000:.0f}ms: {timings}")
+    # Samples event-loop lag and CPU for admission decisions
+    admission.start()
+    # Submits bookings queued by live calls, plus any left pending by a restart
+    booking_worker.start()
+    # Classifies finished calls; the first pass picks up anything left unanalyzed
+    outcome_analyzer.start()
+    # Paces campaign dialing from live answer rates and turn latency, seeded with recent history
+    dial_pacer.start(prior_from(await asyncio.to_thread(recorded_outcomes)))
+    # First run with enough call history: train the transcript dictionary and compress old rows
+    codec_task = asyncio.create_task(asyncio.to_thread(codec.maintain))
+    # Moves finished calls past the retention window into monthly archive files
+    archiver.start()
+    yield
+    codec.stop()
+    await codec_task
+    await archiver.stop()
+    await admission.stop()
+    await booking_worker.stop()
+    await outcome_analyzer.stop()
+    await dial_pacer.stop()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS for Next.js dev server
 app.add_middleware(
@@ -51,20 +132,58 @@ app.add_middleware(
 active_calls = {}
 
 
+def _invalidate_agent(agent_id: str):
+    read_cache.invalidate("agents", f"agent:{agent_id}", f"knowledge:{agent_id}")
+
+
 @app.get("/agents")
-async def get_agents():
+async def get_agents(request: Request):
     """List all active agents."""
-    agents = list_agents()
-    return JSONResponse(content={"agents": agents})
+    cached = read_cache.get("agents", lambda: {"agents": list_agents()})
+    return read_cache.respond(request, cached)
 
 
-@app.get("/agents/{agent_id}")
-async def get_agent_detail(agent_id: str):
-    """Get full agent details by ID."""
+def _stored_json(raw: str | None):
+    """Decode a JSON column; a malformed value reads as unset."""
+    if not raw:
+        return None
+    try:
+        return json.loads(raw)
+    except ValueError:
+        logger.warning(f"Ignoring malformed JSON column value: {raw[:80]!r}")
+        return None
+
+
+def _output_filters_error(data: dict) -> JSONResponse | None:
+    """422 unless output_filters is absent, null or a list of strings."""
+    filters = data.get("output_filters")
+    if filters is None or (isinstance(filters, list) and all(isinstance(f, str) for f in filters)):
+        return None
+    return JSONResponse(status_code=422, content={"error": "output_filters must be a list of strings"})
+
+
+def _llm_routing_error(data: dict) -> JSONResponse | None:
+    """422 unless llm_routing is absent, null or a usable routing config."""
+    from llm_router import routing_error
+
+    if data.get("llm_routing") is None or not (error := routing_error(data["llm_routing"])):
+        return None
+    return JSONResponse(status_code=422, content={"error": error})
+
+
+def _redacted_routing(routing):
+    """Stored llm_routing without inline API keys (configs saved before api_key_env)."""
+    if isinstance(routing, dict) and isinstance(routing.get("providers"), list):
+        providers = [{k: v for k, v in p.items() if k != "api_key"} if isinstance(p, dict) else p for p in routing["providers"]]
+        return {**routing, "providers": providers}
+    return routing
+
+
+def _agent_detail(agent_id: str) -> dict | None:
     agent = get_agent(agent_id)
     if not agent:
-        return JSONResponse(status_code=404, content={"error": "Agent not found"})
-    return JSONResponse(content={
+        return None
+    return {
         "id": agent["id"],
         "name": agent["name"],
         "company": agent["company"],
@@ -74,9 +193,21 @@ async def get_agent_detail(agent_id: str):
         "greeting_template": agent["greeting_template"],
         "cal_api_key": agent["cal_api_key"] or "",
         "cal_event_type_id": agent["cal_event_type_id"] or "",
+        "output_filters": _stored_json(agent["output_filters"]),
+        "llm_routing": _redacted_routing(_stored_json(agent["llm_routing"])),
+        "record_calls": bool(agent["record_calls"]),
         "active": bool(agent["active"]),
         "created_at": agent["created_at"],
-    })
+    }
+
+
+@app.get("/agents/{agent_id}")
+async def get_agent_detail(agent_id: str, request: Request):
+    """Get full agent details by ID."""
+    cached = read_cache.get(f"agent:{agent_id}", lambda: _agent_detail(agent_id))
+    if cached is None:
+        return JSONResponse(status_code=404, content={"error": "Agent not found"})
+    return read_cache.respond(request, cached)
 
 
 @app.post("/agents")
@@ -86,6 +217,8 @@ async def create_agent(request: Request):
     agent_id = data.get("id")
     if not agent_id:
         return JSONResponse(status_code=400, content={"error": "id is required"})
+    if error := _output_filters_error(data) or _llm_routing_error(data):
+        return error
 
     # Check if already exists
     if get_agent(agent_id):
@@ -93,8 +226,8 @@ async def create_agent(request: Request):
 
     conn = get_db()
     conn.execute(
-        """INSERT INTO agents (id, name, company, phone_number, voice_id, system_prompt_template, greeting_template, cal_api_key, cal_event_type_id, active)
-           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        """INSERT INTO agents (id, name, company, phone_number, voice_id, system_prompt_template, greeting_template, cal_api_key, cal_event_type_id, output_filters, llm_routing, record_calls, active)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
         (
             agent_id,
             data.get("name", ""),
@@ -105,11 +238,15 @@ async def create_agent(request: Request):
             data.get("greeting_template", ""),
             data.get("cal_api_key", ""),
             data.get("cal_event_type_id", ""),
+            json.dumps(data["output_filters"]) if data.get("output_filters") is not None else None,
+            json.dumps(data["llm_routing"]) if data.get("llm_routing") is not None else None,
+            1 if data.get("record_calls") else 0,
             1 if data.get("active", True) else 0,
         ),
     )
     conn.commit()
     conn.close()
+    _invalidate_agent(agent_id)
     return JSONResponse(content={"id": agent_id, "success": True})
 
 
@@ -121,11 +258,13 @@ async def update_agent(agent_id: str, request: Request):
         return JSONResponse(status_code=404, content={"error": "Agent not found"})
 
     data = await request.json()
+    if error := _output_filters_error(data) or _llm_routing_error(data):
+        return error
     conn = get_db()
     conn.execute(
         """UPDATE agents SET name=?, company=?, phone_number=?, voice_id=?,
            system_prompt_template=?, greeting_template=?, cal_api_key=?,
-           cal_event_type_id=?, active=? WHERE id=?""",
+           cal_event_type_id=?, output_filters=?, llm_routing=?, record_calls=?, active=? WHERE id=?""",
         (
             data.get("name", agent["name"]),
             data.get("company", agent["company"]),
@@ -135,12 +274,16 @@ async def update_agent(agent_id: str, request: Request):
             data.get("greeting_template", agent["greeting_template"]),
             data.get("cal_api_key", agent["cal_api_key"]),
             data.get("cal_event_type_id", agent["cal_event_type_id"]),
+            json.dumps(data["output_filters"]) if data.get("output_filters") is not None else agent["output_filters"],
+            json.dumps(data["llm_routing"]) if data.get("llm_routing") is not None else agent["llm_routing"],
+            1 if data.get("record_calls", agent["record_calls"]) else 0,
             1 if data.get("active", agent["active"]) else 0,
             agent_id,
         ),
     )
     conn.commit()
     conn.close()
+    _invalidate_agent(agent_id)
     return JSONResponse(content={"success": True})
 
 
@@ -155,21 +298,27 @@ async def delete_agent(agent_id: str):
     conn.execute("UPDATE agents SET active = 0 WHERE id = ?", (agent_id,))
     conn.commit()
     conn.close()
+    _invalidate_agent(agent_id)
     return JSONResponse(content={"success": True})
 
 
 # ── Knowledge Base CRUD ──
 
+def _agent_knowledge(agent_id: str) -> dict:
+    entries = list_knowledge(agent_id)
+    agent = get_agent(agent_id)
+    return {
+        "entries": entries,
+        "kb_version": agent.get("kb_version") if agent else None,
+        "kb_tokens": agent.get("kb_tokens", 0) if agent else 0,
+    }
+
+
 @app.get("/agents/{agent_id}/knowledge")
-async def get_agent_knowledge(agent_id: str):
+async def get_agent_knowledge(agent_id: str, request: Request):
     """Get all knowledge base entries for an agent."""
-    conn = get_db()
-    rows = conn.execute(
-        "SELECT id, agent_id, title, content, created_at FROM knowledge_base WHERE agent_id = ? ORDER BY id",
-        (agent_id,),
-    ).fetchall()
-    conn.close()
-    return JSONResponse(content={"entries": [dict(r) for r in rows]})
+    cached = read_cache.get(f"knowledge:{agent_id}", lambda: _agent_knowledge(agent_id))
+    return read_cache.respond(request, cached)
 
 
 @app.post("/agents/{agent_id}/knowledge")
@@ -181,15 +330,8 @@ async def create_knowledge(agent_id: str, request: Request):
     if not title or not content:
         return JSONResponse(status_code=400, content={"error": "title and content required"})
 
-    conn = get_db()
-    c = conn.cursor()
-    c.execute(
-        "INSERT INTO knowledge_base (agent_id, title, content) VALUES (?, ?, ?)",
-        (agent_id, title, content),
-    )
-    conn.commit()
-    kb_id = c.lastrowid
-    conn.close()
+    kb_id = add_knowledge(agent_id, title, content)
+    read_cache.invalidate(f"knowledge:{agent_id}")
     return JSONResponse(content={"id": kb_id, "success": True})
 
 
@@ -197,69 +339,134 @@ async def create_knowledge(agent_id: str, request: Request):
 async def update_knowledge(agent_id: str, kb_id: int, request: Request):
     """Update a knowledge base entry."""
     data = await request.json()
-    conn = get_db()
-    conn.execute(
-        "UPDATE knowledge_base SET title=?, content=? WHERE id=? AND agent_id=?",
-        (data.get("title", ""), data.get("content", ""), kb_id, agent_id),
-    )
-    conn.commit()
-    conn.close()
+    if not db_update_knowledge(agent_id, kb_id, data.get("title", ""), data.get("content", "")):
+        return JSONResponse(status_code=404, content={"error": "Knowledge entry not found"})
+    read_cache.invalidate(f"knowledge:{agent_id}")
     return JSONResponse(content={"success": True})
 
 
 @app.delete("/agents/{agent_id}/knowledge/{kb_id}")
 async def delete_knowledge(agent_id: str, kb_id: int):
     """Delete a knowledge base entry."""
-    conn = get_db()
-    conn.execute("DELETE FROM knowledge_base WHERE id=? AND agent_id=?", (kb_id, agent_id))
-    conn.commit()
-    conn.close()
+    if not db_delete_knowledge(agent_id, kb_id):
+        return JSONResponse(status_code=404, content={"error": "Knowledge entry not found"})
+    read_cache.invalidate(f"knowledge:{agent_id}")
     return JSONResponse(content={"success": True})
 
 
+@app.get("/knowledge/stats")
+async def knowledge_stats():
+    """Distinct stored KB documents vs. agent links (shared documents are stored once)."""
+    return JSONResponse(content=kb_storage_stats())
+
+
+@app.post("/knowledge/ingest")
+async def ingest_knowledge(request: Request):
+    """Ingest Markdown/PDF files under knowledge/ (all of it by default); unchanged files are skipped."""
+    from kb_ingest import ingest
+
+    data = await request.json() if await request.body() else {}
+    root = KNOWLEDGE_DIR.resolve()
+    paths = []
+    for p in data.get("paths") or []:
+        path = (root / p).resolve()
+        if not path.is_relative_to(root):
+            return JSONResponse(status_code=400, content={"error": f"path outside knowledge/: {p}"})
+        paths.append(path)
+    agent_ids = data.get("agent_ids") or None
+    for agent_id in agent_ids or []:
+        if not get_agent(agent_id):
+            return JSONResponse(status_code=404, content={"error": f"agent not found: {agent_id}"})
+
+    stats = await asyncio.to_thread(ingest, paths or None, agent_ids, force=bool(data.get("force")))
+    read_cache.invalidate(*(f"knowledge:{a}" for a in stats["agents_updated"]))
+    return JSONResponse(content=stats)
+
+
 # ── Call Logs ──
 
 @app.get("/call-logs")
-async def get_call_logs(agent_id: Optional[str] = Query(None), limit: int = Query(100), offset: int = Query(0)):
-    """List call logs with optional agent_id filter and pagination."""
-    conn = get_db()
-    if agent_id:
-        rows = conn.execute(
-            "SELECT * FROM call_logs WHERE agent_id = ? ORDER BY created_at DESC LIMIT ? OFFSET ?",
-            (agent_id, limit, offset),
-        ).fetchall()
-        total = conn.execute("SELECT COUNT(*) FROM call_logs WHERE agent_id = ?", (agent_id,)).fetchone()[0]
-    else:
-        rows = conn.execute(
-            "SELECT * FROM call_logs ORDER BY created_at DESC LIMIT ? OFFSET ?",
-            (limit, offset),
-        ).fetchall()
-        total = conn.execute("SELECT COUNT(*) FROM call_logs").fetchone()[0]
-    conn.close()
-    return JSONResponse(content={"logs": [dict(r) for r in rows], "total": total})
+async def get_call_logs(
+    request: Request, agent_id: Optional[str] = Query(None), limit: int = Query(100), offset: int = Query(0)
+):
+    """List call logs with optional agent_id filter and pagination, newest first across archived months."""
+    months, total = call_log_partitions(agent_id, limit, offset)
+    conn = get_db(check_same_thread=False)
+    _, tables = attach_history(conn, months)
+    where, params = ("WHERE agent_id = ?", (agent_id,)) if agent_id else ("WHERE 1", ())
+    logs = keyset_rows(
+        conn,
+        f"SELECT * FROM {tables['call_logs']} {where} {{after}} ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?",
+        params,
+        after="AND (created_at < ? OR (created_at = ? AND id < ?))",
+        key=("created_at", "created_at", "id"),
+        limit=max(0, limit),
+        offset=offset,
+        decoders={"transcript": codec.decode},
+    )
+    return stream_json(request, {"logs": logs, "total": total}, conn)
 
 
 @app.get("/call-logs/{call_sid}")
 async def get_call_log_detail(call_sid: str):
-    """Get a single call log by call SID."""
+    """Get a single call log by call SID (hot or archived)."""
+    log = get_call_log(call_sid)
+    if not log:
+        return JSONResponse(status_code=404, content={"error": "Call log not found"})
     conn = get_db()
-    row = conn.execute("SELECT * FROM call_logs WHERE call_sid = ?", (call_sid,)).fetchone()
+    log["transcript"] = codec.decode(log["transcript"], conn)
     conn.close()
-    if not row:
-        return JSONResponse(status_code=404, content={"error": "Call log not found"})
-    return JSONResponse(content=dict(row))
+    return JSONResponse(content=log)
+
+
+@app.get("/call-logs/{call_sid}/recording")
+async def get_call_recording(call_sid: str):
+    """Download the call's stereo μ-law WAV (caller left, bot right)."""
+    row = get_call_log(call_sid)
+    if not row or not row["recording_path"] or not os.path.exists(row["recording_path"]):
+        return JSONResponse(status_code=404, content={"error": "Recording not found"})
+    return FileResponse(row["recording_path"], media_type="audio/wav", filename=f"{call_sid}.wav")
+
+
+# ── Transcript search ──
+
+@app.get("/search")
+async def search(
+    q: str = Query(...),
+    agent_id: Optional[str] = Query(None),
+    campaign_id: Optional[int] = Query(None),
+    date_from: Optional[str] = Query(None),
+    date_to: Optional[str] = Query(None),
+    role: Optional[str] = Query(None),
+    limit: int = Query(50),
+    offset: int = Query(0),
+):
+    """Search transcript turns; results are ranked (bm25) with <mark>-highlighted snippets."""
+    try:
+        result = search_transcripts(q, agent_id, campaign_id, date_from, date_to, role, min(limit, 500), offset)
+    except sqlite3.OperationalError as e:
+        return JSONResponse(status_code=400, content={"error": f"Invalid search: {e}"})
+    return JSONResponse(content={"query": q, **result})
+
+
+# ── Archive ──
+
+@app.get("/archive")
+async def get_archive():
+    """Archived call history: calls and file size per month."""
+    return JSONResponse(content=await asyncio.to_thread(archive_summary))
 
 
 # ── Stats ──
 
 @app.get("/stats")
 async def get_stats():
-    """Dashboard statistics."""
+    """Dashboard statistics (from the daily rollups, not a scan of call_logs)."""
     conn = get_db()
     total_agents = conn.execute("SELECT COUNT(*) FROM agents WHERE active = 1").fetchone()[0]
-    total_calls = conn.execute("SELECT COUNT(*) FROM call_logs").fetchone()[0]
+    total_calls = conn.execute("SELECT COALESCE(SUM(calls), 0) FROM call_stats_daily").fetchone()[0]
     calls_today = conn.execute(
-        "SELECT COUNT(*) FROM call_logs WHERE date(created_at) = date('now')"
+        "SELECT COALESCE(SUM(calls), 0) FROM call_stats_daily WHERE day = date('now')"
     ).fetchone()[0]
     conn.close()
     return JSONResponse(content={
@@ -269,6 +476,65 @@ async def get_stats():
     })
 
 
+@app.get("/stats/timeseries")
+async def get_stats_timeseries(
+    granularity: str = Query("day"),
+    agent_id: Optional[str] = Query(None),
+    date_from: Optional[str] = Query(None),
+    date_to: Optional[str] = Query(None),
+):
+    """Calls, durations and outcomes per hour or day for dashboard charts."""
+    if granularity not in ("hour", "day"):
+        return JSONResponse(status_code=400, content={"error": "granularity must be 'hour' or 'day'"})
+    if not date_from:
+        days = 2 if granularity == "hour" else 30
+        date_from = (datetime.utcnow() - timedelta(days=days)).strftime("%Y-%m-%d")
+    points = get_call_stats(granularity, agent_id, date_from, date_to)
+    return JSONResponse(content={"granularity": granularity, "columns": list(ROLLUP_COLUMNS), "points": points})
+
+
+@app.get("/llm-routes")
+async def get_llm_routes():
+    """Rolling TTFT and health of each LLM provider/model used by live calls."""
+    from llm_router import route_stats
+    return JSONResponse(content={"routes": route_stats()})
+
+
+# ── Capacity ──
+
+@app.get("/capacity")
+async def get_capacity():
+    """Current load and whether new calls are being admitted/placed."""
+    snapshot = admission.snapshot()
+    snapshot["accepting_sessions"] = snapshot["state"] != "overloaded" and snapshot["active_sessions"] < snapshot["max_calls"]
+    snapshot["dialing"] = snapshot["state"] == "ok"
+    snapshot["pacing"] = dial_pacer.snapshot()
+    return JSONResponse(content=snapshot)
+
+
+# ── Bookings ──
+
+@app.get("/bookings")
+async def list_bookings(
+    agent_id: Optional[str] = Query(None), status: Optional[str] = Query(None), limit: int = Query(100)
+):
+    """Booking outbox rows (pending, submitting, booked, failed)."""
+    sql = "SELECT id, agent_id, call_sid, name, email, phone, start_time, status, attempts, next_attempt_at, last_error, cal_booking_uid, created_at, updated_at FROM bookings WHERE 1 = 1"
+    args = []
+    if agent_id:
+        sql += " AND agent_id = ?"
+        args.append(agent_id)
+    if status:
+        sql += " AND status = ?"
+        args.append(status)
+    sql += " ORDER BY id DESC LIMIT ?"
+    args.append(limit)
+    conn = get_db()
+    rows = conn.execute(sql, args).fetchall()
+    conn.close()
+    return JSONResponse(content={"bookings": [dict(r) for r in rows]})
+
+
 # ── Campaigns & Contacts ──
 
 @app.get("/campaigns")
@@ -283,20 +549,21 @@ async def list_campaigns(agent_id: Optional[str] = Query(None)):
 
 
 @app.get("/campaigns/{campaign_id}")
-async def get_campaign(campaign_id: int):
-    conn = get_db()
+async def get_campaign(campaign_id: int, request: Request):
+    conn = get_db(check_same_thread=False)
     campaign = conn.execute("SELECT * FROM campaigns WHERE id = ?", (campaign_id,)).fetchone()
     if not campaign:
         conn.close()
         return JSONResponse(content={"error": "Campaign not found"}, status_code=404)
-    contacts = conn.execute(
-        "SELECT * FROM contacts WHERE campaign_id = ? ORDER BY id", (campaign_id,)
-    ).fetchall()
-    conn.close()
-    return JSONResponse(content={
-        "campaign": dict(campaign),
-        "contacts": [dict(c) for c in contacts],
-    })
+    _, tables = attach_history(conn, archive_months(campaign_id=campaign_id))
+    contacts = keyset_rows(
+        conn,
+        f"SELECT * FROM {tables['contacts']} WHERE campaign_id = ? {{after}} ORDER BY id LIMIT ? OFFSET ?",
+        (campaign_id,),
+        after="AND id > ?",
+        key=("id",),
+    )
+    return stream_json(request, {"campaign": dict(campaign), "contacts": contacts}, conn)
 
 
 @app.post("/campaigns")
@@ -309,6 +576,7 @@ async def create_campaign(request: Request):
     name = body.get("name", "Untitled Campaign")
     agent_id = body.get("agent_id")
     csv_data = body.get("csv_data", "")
+    record_calls = body.get("record_calls")  # None → use the agent's setting
 
     if not agent_id:
         return JSONResponse(content={"error": "agent_id required"}, status_code=400)
@@ -320,8 +588,8 @@ async def create_campaign(request: Request):
     # Create campaign
     c = conn.cursor()
     c.execute(
-        "INSERT INTO campaigns (name, agent_id, status) VALUES (?, ?, 'ready')",
-        (name, agent_id),
+        "INSERT INTO campaigns (name, agent_id, status, record_calls) VALUES (?, ?, 'ready', ?)",
+        (name, agent_id, None if record_calls is None else int(bool(record_calls))),
     )
     campaign_id = c.lastrowid
 
@@ -349,9 +617,9 @@ async def create_campaign(request: Request):
             continue  # Skip rows without a phone number
 
         c.execute(
-            """INSERT INTO contacts (agent_id, first_name, last_name, phone1, phone2, address, email, campaign_id)
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
-            (agent_id, first_name, last_name, phone1, phone2, address, email, campaign_id),
+            """INSERT INTO contacts (agent_id, first_name, last_name, phone1, phone2, address, email, campaign_id, timezone)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (agent_id, first_name, last_name, phone1, phone2, address, email, campaign_id, contact_timezone(phone1, address)),
         )
         contacts_added += 1
 
@@ -367,11 +635,14 @@ async def create_campaign(request: Request):
 
 @app.post("/campaigns/{campaign_id}/start")
 async def start_campaign(campaign_id: int, request: Request):
-    """Start calling contacts in a campaign. Calls `batch_size` contacts."""
+    """Start calling contacts in a campaign, best-timed first (dial_scheduler) at an adaptive pace (dial_pacer).
+
+    Optional `batch_size` caps the calls this run places; without it the run dials until no contact is callable.
+    """
     import asyncio as _asyncio
 
     body = await request.json() if await request.body() else {}
-    batch_size = body.get("batch_size", 10)
+    batch_size = body.get("batch_size")
 
     conn = get_db()
     campaign = conn.execute("SELECT * FROM campaigns WHERE id = ?", (campaign_id,)).fetchone()
@@ -385,136 +656,195 @@ async def start_campaign(campaign_id: int, request: Request):
         conn.close()
         return JSONResponse(content={"error": "Agent not found"}, status_code=404)
 
-    # Get pending contacts
-    contacts = conn.execute(
-        "SELECT * FROM contacts WHERE campaign_id = ? AND status = 'pending' ORDER BY id LIMIT ?",
-        (campaign_id, batch_size),
-    ).fetchall()
-
-    if not contacts:
+    # Pending contacts, released as their local calling hours open and retry backoffs pass
+    scheduler = await _asyncio.to_thread(load_scheduler, campaign_id, agent_id)
+    if not len(scheduler):
         conn.close()
         return JSONResponse(content={"error": "No pending contacts", "called": 0})
+    next_at = scheduler.next_at()
+    if (next_at - datetime.now(timezone.utc)).total_seconds() > MAX_WAIT_SECS:
+        conn.close()
+        return JSONResponse(content={
+            "error": "No contacts callable now (outside calling hours or waiting to retry)",
+            "called": 0,
+            "next_dial_at": next_at.isoformat(),
+        })
 
     conn.execute("UPDATE campaigns SET status = 'running' WHERE id = ?", (campaign_id,))
     conn.commit()
     conn.close()
 
+    # Keep the agent's shared prompt prefix cached while this batch dials
+    from llm_router import resolve_routing
+
+    route = resolve_routing(_stored_json(agent["llm_routing"]))["providers"][0]
+    prefix_warmer.acquire(agent_id, build_static_prompt(dict(agent)), route)
+
+    # Twilio's client and SQLite block, so placement runs in worker threads; on the event loop
+    # it would stall live calls' audio and show up as the loop lag admission throttles on
+    def _dial(contact: dict, phone: str) -> tuple[str, dict, dict]:
+        from twilio.rest import Client
+        from db import build_system_prompt, build_greeting, get_agent
+
+        twilio_client = Client(os.getenv("TWILIO_ACCOUNT_SID"), os.getenv("TWILIO_AUTH_TOKEN"))
+        local_url = os.getenv("LOCAL_SERVER_URL", "http://localhost:5050")
+        agent_data = get_agent(agent_id)
+        system_prompt, call_context = build_system_prompt(agent_data, contact["first_name"], contact["address"])
+        greeting = build_greeting(agent_data, contact["first_name"], contact["address"])
+
+        twiml_url = f"{local_url}/twiml"
+        params = {
+            "agent_id": agent_id,
+            "system_prompt": system_prompt,
+            "call_context": call_context,
+            "greeting": greeting,
+            "voice_id": agent_data["voice_id"],
+            "to_number": phone,
+            "from_number": agent_data["phone_number"],
+            "cal_api_key": agent_data.get("cal_api_key", ""),
+            "cal_event_type_id": agent_data.get("cal_event_type_id", ""),
+        }
+
+        call = twilio_client.calls.create(
+            to=phone,
+            from_=agent_data["phone_number"],
+            url=twiml_url + "?" + "&".join(f"{k}={v}" for k, v in {"agent_id": agent_id}.items()),
+            status_callback=f"{local_url}/call-status",
+            status_callback_event=["completed", "busy", "no-answer", "failed"],
+            machine_detection="Enable",
+        )
+        return call.sid, params, agent_data
+
+    def _record_call(call_sid: str, phone: str, agent_data: dict, contact: dict, now: datetime):
+        from db import log_call
+
+        log_call(
+            agent_id, call_sid, phone, agent_data["phone_number"], contact["first_name"], contact["address"],
+            local_hour=local_hour(now, contact["timezone"]) if contact["timezone"] else None,
+        )
+        _conn = get_db()
+        _conn.execute(
+            "UPDATE contacts SET status = 'called', call_sid = ?, called_at = datetime('now') WHERE id = ?",
+            (call_sid, contact["id"]),
+        )
+        _conn.commit()
+        _conn.close()
+
+    def _mark_failed(contact: dict, error: str):
+        _conn = get_db()
+        _conn.execute("UPDATE contacts SET status = 'failed', notes = ? WHERE id = ?", (error, contact["id"]))
+        _conn.commit()
+        _conn.close()
+
+    def _update_campaign():
+        _conn = get_db()
+        called = _conn.execute("SELECT COUNT(*) FROM contacts WHERE campaign_id = ? AND status != 'pending'", (campaign_id,)).fetchone()[0]
+        called += _conn.execute("SELECT IFNULL(SUM(contacts), 0) FROM archive_campaigns WHERE campaign_id = ?", (campaign_id,)).fetchone()[0]
+        pending = _conn.execute("SELECT COUNT(*) FROM contacts WHERE campaign_id = ? AND status = 'pending'", (campaign_id,)).fetchone()[0]
+        status = "ready" if pending > 0 else "completed"
+        _conn.execute("UPDATE campaigns SET called = ?, status = ? WHERE id = ?", (called, status, campaign_id))
+        _conn.commit()
+        _conn.close()
+
     # Kick off calls in background
     async def _run_batch():
-        from db import get_db as _get_db, build_system_prompt, build_greeting, get_agent, log_call
-        for contact in contacts:
-            contact = dict(contact)
+        placed = 0
+        requeue_check_at = datetime.now(timezone.utc) + timedelta(seconds=REQUEUE_CHECK_SECS)
+        while batch_size is None or placed < batch_size:
+            # Dial as fast as answer rates and turn latency allow; pick who to call once there's room
+            await dial_pacer.wait_for_slot(f"campaign {campaign_id}")
+            now = datetime.now(timezone.utc)
+            if now >= requeue_check_at:
+                # Unanswered calls from this run come back as retries
+                await _asyncio.to_thread(add_requeued, scheduler, campaign_id)
+                requeue_check_at = now + timedelta(seconds=REQUEUE_CHECK_SECS)
+            contact = scheduler.pop(now)
+            if contact is None:
+                next_at = scheduler.next_at()
+                if next_at is None or (next_at - now).total_seconds() > MAX_WAIT_SECS:
+                    # One last look for retries that became due before ending the run
+                    if await _asyncio.to_thread(add_requeued, scheduler, campaign_id):
+                        continue
+                    break
+                await _asyncio.sleep((next_at - now).total_seconds())
+                continue
             phone = contact["phone1"]
-            if not phone:
+            if not phone or not await _asyncio.to_thread(claim, contact):
                 continue
+            placed += 1
 
             # Normalize phone
             if not phone.startswith("+"):
                 phone = "+1" + phone.replace("-", "").replace("(", "").replace(")", "").replace(" ", "")
 
             try:
-                from twilio.rest import Client
-                twilio_client = Client(os.getenv("TWILIO_ACCOUNT_SID"), os.getenv("TWILIO_AUTH_TOKEN"))
-
-                local_url = os.getenv("LOCAL_SERVER_URL", "http://localhost:5050")
-                agent_data = get_agent(agent_id)
-                system_prompt = build_system_prompt(agent_data, contact["first_name"], contact["address"])
-                greeting = build_greeting(agent_data, contact["first_name"], contact["address"])
-
-                twiml_url = f"{local_url}/twiml"
-                params = {
-                    "agent_id": agent_id,
-                    "system_prompt": system_prompt,
-                    "greeting": greeting,
-                    "voice_id": agent_data["voice_id"],
-                    "to_number": phone,
-                    "from_number": agent_data["phone_number"],
-                    "cal_api_key": agent_data.get("cal_api_key", ""),
-                    "cal_event_type_id": agent_data.get("cal_event_type_id", ""),
-                }
-
-                call = twilio_client.calls.create(
-                    to=phone,
-                    from_=agent_data["phone_number"],
-                    url=twiml_url + "?" + "&".join(f"{k}={v}" for k, v in {"agent_id": agent_id}.items()),
-                    status_callback=f"{local_url}/call-status",
-                    status_callback_event=["completed", "busy", "no-answer", "failed"],
-                    machine_detection="Enable",
-                )
-
-                call_sid = call.sid
-                log_call(agent_id, call_sid, phone, agent_data["phone_number"], contact["first_name"], contact["address"])
-
-                # Update contact
-                _conn = _get_db()
-                _conn.execute(
-                    "UPDATE contacts SET status = 'called', call_sid = ?, called_at = datetime('now') WHERE id = ?",
-                    (call_sid, contact["id"]),
-                )
-                _conn.commit()
-                _conn.close()
-
+                call_sid, params, agent_data = await _asyncio.to_thread(_dial, contact, phone)
+                admission.reserve(call_sid)
+                dial_pacer.placed(call_sid)
+                # /twiml reads the agent config for this call from active_calls
+                active_calls[call_sid] = {**params, "first_name": contact["first_name"], "address": contact["address"]}
+                await _asyncio.to_thread(_record_call, call_sid, phone, agent_data, contact, now)
                 logger.info(f"📞 Campaign {campaign_id}: Called {contact['first_name']} at {phone} (SID: {call_sid})")
 
-                # Wait between calls
-                await _asyncio.sleep(2)
-
             except Exception as e:
                 logger.error(f"❌ Campaign {campaign_id}: Failed to call {phone}: {e}")
-                _conn = _get_db()
-                _conn.execute("UPDATE contacts SET status = 'failed', notes = ? WHERE id = ?", (str(e), contact["id"]))
-                _conn.commit()
-                _conn.close()
+                await _asyncio.to_thread(_mark_failed, contact, str(e))
 
         # Update campaign stats
-        _conn = _get_db()
-        called = _conn.execute("SELECT COUNT(*) FROM contacts WHERE campaign_id = ? AND status != 'pending'", (campaign_id,)).fetchone()[0]
-        pending = _conn.execute("SELECT COUNT(*) FROM contacts WHERE campaign_id = ? AND status = 'pending'", (campaign_id,)).fetchone()[0]
-        status = "ready" if pending > 0 else "completed"
-        _conn.execute("UPDATE campaigns SET called = ?, status = ? WHERE id = ?", (called, status, campaign_id))
-        _conn.commit()
-        _conn.close()
+        await _asyncio.to_thread(_update_campaign)
 
-    _asyncio.create_task(_run_batch())
+    batch_task = _asyncio.create_task(_run_batch())
+    batch_task.add_done_callback(lambda _: prefix_warmer.release(agent_id))
 
     return JSONResponse(content={
         "status": "started",
-        "batch_size": len(contacts),
+        "batch_size": len(scheduler) if batch_size is None else min(batch_size, len(scheduler)),
         "campaign_id": campaign_id,
+        "next_dial_at": next_at.isoformat(),
     })
 
 
+def _report_from(tables: dict[str, str]) -> str:
+    return f"FROM {tables['contacts']} c LEFT JOIN {tables['call_logs']} cl ON c.call_sid = cl.call_sid WHERE c.campaign_id = ?"
+
+
 @app.get("/campaigns/{campaign_id}/report")
-async def campaign_report(campaign_id: int):
+async def campaign_report(campaign_id: int, request: Request):
     """Get campaign report with call outcomes."""
-    conn = get_db()
+    conn = get_db(check_same_thread=False)
     campaign = conn.execute("SELECT * FROM campaigns WHERE id = ?", (campaign_id,)).fetchone()
     if not campaign:
         conn.close()
         return JSONResponse(content={"error": "Campaign not found"}, status_code=404)
-
-    contacts = conn.execute(
-        "SELECT c.*, cl.status as call_status, cl.duration, cl.outcome as call_outcome, cl.transcript FROM contacts c LEFT JOIN call_logs cl ON c.call_sid = cl.call_sid WHERE c.campaign_id = ? ORDER BY c.id",
+    _, tables = attach_history(conn, archive_months(campaign_id=campaign_id))
+
+    # Counted in SQL so the contacts can stream after it
+    row = conn.execute(
+        f"""SELECT COUNT(*) AS total,
+                   SUM(IFNULL(c.status, '') != 'pending') AS called,
+                   SUM(c.status = 'pending') AS pending,
+                   SUM(cl.status = 'completed') AS completed,
+                   SUM(cl.outcome = 'scheduled') AS scheduled,
+                   SUM(cl.outcome = 'not-interested') AS not_interested,
+                   SUM(cl.outcome IN ('no-answer', 'voicemail')) AS no_answer,
+                   SUM(c.status = 'failed') AS failed
+            {_report_from(tables)}""",
         (campaign_id,),
-    ).fetchall()
-
-    summary = {
-        "total": len(contacts),
-        "called": sum(1 for c in contacts if c["status"] != "pending"),
-        "pending": sum(1 for c in contacts if c["status"] == "pending"),
-        "completed": sum(1 for c in contacts if c["call_status"] == "completed"),
-        "scheduled": sum(1 for c in contacts if c["call_outcome"] == "scheduled"),
-        "not_interested": sum(1 for c in contacts if c["call_outcome"] == "not-interested"),
-        "no_answer": sum(1 for c in contacts if c["call_outcome"] in ("no-answer", "voicemail")),
-        "failed": sum(1 for c in contacts if c["status"] == "failed"),
-    }
-
-    conn.close()
-    return JSONResponse(content={
-        "campaign": dict(campaign),
-        "summary": summary,
-        "contacts": [dict(c) for c in contacts],
-    })
+    ).fetchone()
+    summary = {k: row[k] or 0 for k in row.keys()}
+
+    # A contact's call_sid can match more than one log, so page by (contact id, log id)
+    contacts = keyset_rows(
+        conn,
+        f"""SELECT c.*, cl.status as call_status, cl.duration, cl.outcome as call_outcome, cl.transcript,
+                   cl.id as call_log_id
+            {_report_from(tables)} {{after}} ORDER BY c.id, cl.id LIMIT ? OFFSET ?""",
+        (campaign_id,),
+        after="AND c.id >= ? AND (c.id > ? OR IFNULL(cl.id, 0) > IFNULL(?, 0))",
+        key=("id", "id", "call_log_id"),
+        decoders={"transcript": codec.decode},
+    )
+    return stream_json(request, {"campaign": dict(campaign), "summary": summary, "contacts": contacts}, conn)
 
 
 @app.post("/make-call")
@@ -549,8 +879,15 @@ async def make_call(request: Request):
     if not local_server_url:
         return JSONResponse(status_code=500, content={"error": "LOCAL_SERVER_URL not set"})
 
+    if not admission.can_place():
+        return JSONResponse(
+            status_code=503,
+            content={"error": "At capacity, try again shortly", "capacity": admission.snapshot()},
+            headers={"Retry-After": "5"},
+        )
+
     # Build agent-specific prompt and greeting
-    system_prompt = build_system_prompt(agent, first_name, address)
+    system_prompt, call_context = build_system_prompt(agent, first_name, address)
     greeting = build_greeting(agent, first_name, address)
 
     account_sid = os.getenv("TWILIO_ACCOUNT_SID")
@@ -568,6 +905,8 @@ async def make_call(request: Request):
         status_callback_event=["completed"],
     )
 
+    admission.reserve(call.sid)
+
     # Store metadata for this call
     active_calls[call.sid] = {
         "to_number": to_number,
@@ -576,6 +915,7 @@ async def make_call(request: Request):
         "address": address,
         "agent_id": agent_id,
         "system_prompt": system_prompt,
+        "call_context": call_context,
         "greeting": greeting,
         "voice_id": agent["voice_id"],
         "cal_api_key": agent["cal_api_key"] or "",
@@ -604,6 +944,9 @@ async def get_twiml(request: Request):
     call_sid = form_data.get("CallSid", "")
 
     logger.info(f"📋 TwiML request: {call_sid} ({from_number} → {to_number})")
+    admission.release(call_sid)  # answered; its media session is admitted on /ws
+    # AnsweredBy comes from Twilio's answering-machine detection on campaign calls
+    dial_pacer.connected(call_sid, machine=form_data.get("AnsweredBy", "").startswith(("machine", "fax")))
 
     local_server_url = os.getenv("LOCAL_SERVER_URL")
     ws_url = local_server_url.replace("https://", "wss://") + "/ws"
@@ -621,6 +964,7 @@ async def get_twiml(request: Request):
     call_meta = active_calls.get(call_sid, {})
     stream.parameter(name="agent_id", value=call_meta.get("agent_id", ""))
     stream.parameter(name="system_prompt", value=call_meta.get("system_prompt", ""))
+    stream.parameter(name="call_context", value=call_meta.get("call_context", ""))
     stream.parameter(name="greeting", value=call_meta.get("greeting", ""))
     stream.parameter(name="voice_id", value=call_meta.get("voice_id", ""))
     stream.parameter(name="cal_api_key", value=call_meta.get("cal_api_key", ""))
@@ -635,13 +979,18 @@ async def get_twiml(request: Request):
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     """Handle WebSocket connection from Twilio Media Streams."""
-    from bot import bot
-    from pipecat.runner.types import WebSocketRunnerArguments
+    reason = admission.admit()
+    if reason:
+        logger.warning(f"🚦 Media session rejected: {reason}")
+        await websocket.close(code=1013)  # "try again later"; refused before the handshake completes
+        return
 
-    await websocket.accept()
-    logger.info("🔌 WebSocket connection accepted")
+    from bot import bot  # already imported by the startup preload unless PRELOAD_BOT=0
+    from pipecat.runner.types import WebSocketRunnerArguments
 
     try:
+        await websocket.accept()
+        logger.info("🔌 WebSocket connection accepted")
         runner_args = WebSocketRunnerArguments(websocket=websocket)
         await bot(runner_args)
     except Exception as e:
@@ -649,6 +998,8 @@ async def websocket_endpoint(websocket: WebSocket):
         import traceback
         traceback.print_exc()
         await websocket.close()
+    finally:
+        admission.end_session()
 
 
 @app.post("/call-status")
@@ -663,9 +1014,14 @@ async def call_status(request: Request):
 
     # Update call log in database
     update_call_log(call_sid, status=status, duration=int(duration))
+    if status in TERMINAL_STATUSES:
+        outcome_analyzer.wake()
 
     # Clean up active call metadata
     active_calls.pop(call_sid, None)
+    if status in TERMINAL_STATUSES:
+        admission.release(call_sid)
+        dial_pacer.ended(call_sid)
 
     return JSONResponse(content={"ok": True})
 
@@ -0,0 +1,270 @@
+"""Speculative LLM responses started from Deepgram interim transcripts.
+
+Deepgram sends interim results while the caller is still talking. Once an
+interim transcript stops changing, `SpeculativeResponder` sends the current
+context plus that text through the bot's LLM service (so the same routes,
+model and settings as a real turn) in the background. When the user turn is
+final and the LLM is about to be triggered, the final user text is compared
+with the speculated text: if they match (within `similarity`), the
+speculative reply is pushed downstream instead of starting a new request —
+what has streamed so far at once, the rest as it arrives, so TTS and the
+clause chunker start on the first tokens. If not, the speculation is
+cancelled or discarded and the LLM runs as usual.
+
+Replies that start with a tool call are never committed — the normal LLM path
+handles those, so function calls always go through the registered handlers.
+"""
+
+import asyncio
+import re
+import time
+from difflib import SequenceMatcher
+
+from loguru import logger
+from pipecat.frames.frames import (
+    Frame,
+    InterimTranscriptionFrame,
+    LLMContextFrame,
+    LLMFullResponseEndFrame,
+    LLMFullResponseStartFrame,
+    LLMTextFrame,
+    TranscriptionFrame,
+)
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+
+from llm_router import RoutedLLMService
+
+
+def normalize_transcript(text: str) -> str:
+    # Keep "@" and inner dots so spelled-out emails still compare
+    words = re.sub(r"[^\w\s'@.]", " ", text.lower()).split()
+    return " ".join(w.strip(".") for w in words if w.strip("."))
+
+
+def _last_assistant_message(messages: list) -> str:
+    """The bot's last message, used to check a speculation saw the same history."""
+    for msg in reversed(messages):
+        if isinstance(msg, dict) and msg.get("role") == "assistant":
+            return str(msg.get("content") or msg.get("tool_calls") or "")
+    return ""
+
+
+def transcript_similarity(a: str, b: str) -> float:
+    a, b = normalize_transcript(a).split(), normalize_transcript(b).split()
+    if not a and not b:
+        return 1.0
+    return SequenceMatcher(None, a, b).ratio()
+
+
+class _InterimTap(FrameProcessor):
+    """Observes interim transcripts upstream of the user aggregator."""
+
+    def __init__(self, responder: "SpeculativeResponder"):
+        super().__init__()
+        self._responder = responder
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+        if isinstance(frame, InterimTranscriptionFrame):
+            await self._responder.on_interim(frame.text)
+        elif isinstance(frame, TranscriptionFrame):
+            self._responder.on_final(frame.text)
+        await self.push_frame(frame, direction)
+
+
+class SpeculativeResponder(FrameProcessor):
+    """Commits speculative replies in place of the LLM when the final transcript matches.
+
+    Place directly before the LLM; put `interim_tap()` right after the STT.
+    """
+
+    def __init__(
+        self,
+        context,
+        llm: RoutedLLMService,
+        similarity: float = 0.9,
+        min_words: int = 2,
+        stable_interims: int = 2,
+        is_enabled=lambda: True,
+        metrics: dict | None = None,
+    ):
+        super().__init__()
+        self._context = context
+        self._llm = llm
+        self._similarity = similarity
+        self._min_words = min_words
+        self._stable_interims = stable_interims
+        self._is_enabled = is_enabled
+        self._tap = _InterimTap(self)
+
+        self._last_interim = ""
+        self._repeat = 0
+        self._finals = []  # final transcripts of the current user turn
+        self._spec_text = ""  # user text the running speculation was started from
+        self._spec_anchor = ""  # bot's last message when the speculation started
+        self._spec_task: asyncio.Task | None = None
+        self._spec_queue: asyncio.Queue | None = None  # ("text", delta)… then ("end", usage), ("tool_calls", None) or ("error", e)
+
+        self._stats = (metrics if metrics is not None else {}).setdefault(
+            "speculation", {"started": 0, "hits": 0, "misses": 0, "cancelled": 0, "wasted_tokens": 0}
+        )
+
+    def interim_tap(self) -> FrameProcessor:
+        return self._tap
+
+    # ── Interim tracking ──
+
+    async def on_interim(self, text: str):
+        if not self._is_enabled():
+            return
+        # Interims restart after each final, so speculate on finals-so-far + interim
+        full = " ".join(self._finals + [text]).strip()
+        norm = normalize_transcript(full)
+        if norm == self._last_interim:
+            self._repeat += 1
+        else:
+            self._last_interim = norm
+            self._repeat = 1
+            if self._spec_task and transcript_similarity(self._spec_text, full) < self._similarity:
+                await self._cancel("interim changed")
+        if (
+            self._repeat >= self._stable_interims
+            and len(norm.split()) >= self._min_words
+            and not self._spec_task
+        ):
+            self._start(full)
+
+    def on_final(self, text: str):
+        if not self._is_enabled():
+            return
+        if text.strip():
+            self._finals.append(text.strip())
+
+    def _start(self, user_text: str):
+        self._spec_text = user_text
+        self._spec_anchor = _last_assistant_message(self._context.get_messages())
+        self._stats["started"] += 1
+        self._spec_queue = asyncio.Queue()
+        self._spec_task = self.create_task(self._generate(user_text, self._spec_queue), "speculation")
+        logger.debug(f"🔮 Speculating on interim: {user_text!r}")
+
+    async def _cancel(self, reason: str):
+        if self._spec_task:
+            if not self._spec_task.done():
+                await self.cancel_task(self._spec_task)
+                self._stats["cancelled"] += 1
+            else:
+                self._count_wasted(self._spec_task)
+            self._stats["misses"] += 1
+            logger.debug(f"🔮 Speculation discarded ({reason}): {self._spec_text!r}")
+        self._spec_task, self._spec_queue = None, None
+        self._spec_text = ""
+
+    def _count_wasted(self, task: asyncio.Task):
+        if task.cancelled() or task.exception() or task.result() is None:
+            return
+        self._stats["wasted_tokens"] += task.result().get("completion_tokens", 0)
+
+    def _reset_turn(self):
+        self._finals = []
+        self._last_interim = ""
+        self._repeat = 0
+
+    # ── Speculative request ──
+
+    async def _generate(self, user_text: str, queue: asyncio.Queue) -> dict | None:
+        """Streams the reply into `queue`; returns usage, or None if the request failed."""
+        invocation = self._llm.get_llm_adapter().get_llm_invocation_params(self._context)
+        params = {**invocation, "messages": list(invocation["messages"]) + [{"role": "user", "content": user_text}]}
+        usage, tool_calls = {}, False
+        try:
+            stream = await self._llm.get_chat_completions(params, log_turn=False)
+            try:
+                async for chunk in stream:
+                    if chunk.usage:
+                        usage = {"completion_tokens": chunk.usage.completion_tokens}
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta
+                    if delta.tool_calls and not tool_calls:
+                        tool_calls = True
+                        queue.put_nowait(("tool_calls", None))
+                    if delta.content:
+                        queue.put_nowait(("text", delta.content))
+            finally:
+                if hasattr(stream, "aclose"):
+                    await stream.aclose()
+        except Exception as e:
+            queue.put_nowait(("error", e))
+            return None
+        queue.put_nowait(("end", usage))
+        return usage
+
+    # ── Commit gate ──
+
+    async def _try_commit(self, frame: LLMContextFrame) -> bool:
+        messages = frame.context.get_messages()
+        last = messages[-1] if messages else {}
+        if not isinstance(last, dict) or last.get("role") != "user" or not isinstance(last.get("content"), str):
+            await self._cancel("context does not end with a user message")
+            return False
+        if _last_assistant_message(messages[:-1]) != self._spec_anchor:
+            await self._cancel("bot history changed")
+            return False
+        score = transcript_similarity(self._spec_text, last["content"])
+        if score < self._similarity:
+            await self._cancel(f"final differs, similarity={score:.2f}")
+            return False
+
+        task, queue = self._spec_task, self._spec_queue
+        self._spec_task, self._spec_queue, self._spec_text = None, None, ""
+
+        started = time.monotonic()
+        kind, value = await queue.get()
+        if kind != "text":
+            if kind == "error":
+                logger.warning(f"🔮 Speculative request failed: {value}")
+            elif kind == "end":
+                self._stats["wasted_tokens"] += value.get("completion_tokens", 0)  # empty reply
+            elif not task.done():
+                await self.cancel_task(task)  # a tool call: the LLM handles it
+            self._stats["misses"] += 1
+            return False
+
+        self._stats["hits"] += 1
+        logger.debug(f"🔮 Speculation hit (first text after {(time.monotonic() - started) * 1000:.0f}ms)")
+        await self.push_frame(LLMFullResponseStartFrame())
+        try:
+            # Already-streamed deltas go out at once, the rest as they arrive
+            while kind == "text":
+                await self.push_frame(LLMTextFrame(value))
+                kind, value = await queue.get()
+        finally:
+            if not task.done():
+                await self.cancel_task(task)  # interrupted, or a late tool call
+        if kind != "end":
+            logger.warning(f"🔮 Committed speculative reply ended early ({kind})")
+        await self.push_frame(LLMFullResponseEndFrame())
+        return True
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if isinstance(frame, LLMContextFrame) and direction == FrameDirection.DOWNSTREAM:
+            committed = False
+            if self._spec_task:
+                committed = await self._try_commit(frame)
+            self._reset_turn()
+            if committed:
+                return
+
+        await self.push_frame(frame, direction)
+
+    async def cleanup(self):
+        if self._spec_task and not self._spec_task.done():
+            await self.cancel_task(self._spec_task)
+        await super().cleanup()
+
+    def stats(self) -> dict:
+        decided = self._stats["hits"] + self._stats["misses"]
+        return {**self._stats, "hit_rate": round(self._stats["hits"] / decided, 3) if decided else None}
@@ -0,0 +1,96 @@
+"""Cold-start and first-call latency guard.
+
+Each measurement runs in a fresh interpreter against a throwaway database, so
+nothing is warm from a previous step:
+
+  import   `import server` — must stay free of pipecat, schema work and seeding
+  startup  the server lifespan: schema/seed, bot preload, background workers
+  first    the per-call setup a call pays after startup (import bot + VAD)
+
+    python startup_bench.py [--runs 3] [--max-import 1.0] [--max-first-call 0.25]
+
+Exits non-zero when a median exceeds its budget, so it can gate CI.
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+HERE = Path(__file__).parent
+
+_IMPORT = """
+import time
+t = time.perf_counter()
+import server
+print(time.perf_counter() - t)
+"""
+
+_STARTUP = """
+import asyncio, time
+import server
+
+async def main():
+    t = time.perf_counter()
+    async with server.lifespan(server.app):
+        print(time.perf_counter() - t)
+
+asyncio.run(main())
+"""
+
+_FIRST_CALL = """
+import asyncio, time
+import server
+
+async def main():
+    async with server.lifespan(server.app):
+        t = time.perf_counter()
+        from bot import make_vad_analyzer
+        make_vad_analyzer()
+        print(time.perf_counter() - t)
+
+asyncio.run(main())
+"""
+
+
+def _measure(script: str, db_path: str) -> float:
+    env = {**os.environ, "VOICE_AGENT_DB": db_path}
+    out = subprocess.run(
+        [sys.executable, "-c", script], cwd=HERE, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return float(out.strip().splitlines()[-1])
+
+
+def run(runs: int) -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        _measure(_STARTUP, db_path)  # create + seed once so later runs measure a normal restart
+        for name, script in (("import", _IMPORT), ("startup", _STARTUP), ("first_call", _FIRST_CALL)):
+            samples = [_measure(script, db_path) for _ in range(runs)]
+            results[name] = {"median_s": round(statistics.median(samples), 3), "max_s": round(max(samples), 3)}
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Server cold-start and first-call latency")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--max-import", type=float, default=1.0, help="budget for `import server` (s)")
+    parser.add_argument("--max-first-call", type=float, default=0.25, help="budget for per-call setup after startup (s)")
+    args = parser.parse_args()
+
+    results = run(args.runs)
+    print(json.dumps(results, indent=2))
+    over = []
+    if results["import"]["median_s"] > args.max_import:
+        over.append(f"import {results['import']['median_s']}s > {args.max_import}s")
+    if results["first_call"]["median_s"] > args.max_first_call:
+        over.append(f"first call {results['first_call']['median_s']}s > {args.max_first_call}s")
+    if over:
+        print("Over budget: " + "; ".join(over))
+        sys.exit(1)
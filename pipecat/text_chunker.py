@@ -0,0 +1,179 @@
+"""Adaptive clause-level text chunking between the LLM and TTS.
+
+The first chunk of each LLM response is flushed at the first clause boundary
+(comma, dash, colon, or a conjunction like "and"/"but") once it is at least
+`min_first_chars` long, so TTS can start speaking before the whole sentence
+has streamed. After that first chunk the chunker falls back to full sentences,
+which gives the TTS enough text for natural prosody.
+
+Chunks of one response are pushed as plain TextFrames between the LLM's
+LLMFullResponseStartFrame/EndFrame, so Cartesia keeps them in a single
+context (continue=True) and the voice doesn't reset between clauses. The TTS
+service must be created with `aggregate_sentences=False` for this to help.
+
+`TimedSentenceAggregator` is the stock SentenceAggregator with the same
+first-chunk timing, so both arms of the TTS_CHUNKING A/B report comparable
+`stats()`.
+"""
+
+import re
+import time
+
+from loguru import logger
+from pipecat.frames.frames import (
+    EndFrame,
+    Frame,
+    InterimTranscriptionFrame,
+    InterruptionFrame,
+    LLMFullResponseEndFrame,
+    LLMFullResponseStartFrame,
+    TextFrame,
+)
+from pipecat.processors.aggregators.sentence import SentenceAggregator
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+from pipecat.utils.string import match_endofsentence
+
+# Clause boundaries: punctuation followed by whitespace, or whitespace before a
+# conjunction. The match end is where the chunk is cut.
+CLAUSE_BOUNDARY_RE = re.compile(
+    r"[,;:]\s+|\s*[—–]\s*|\s--?\s+|\s(?=(?:and|but|so|because|or|though|which)\s)",
+    re.IGNORECASE,
+)
+
+
+def find_clause_boundary(text: str, min_chars: int) -> int:
+    """Return the cut position of the last clause boundary at or after `min_chars`, else 0."""
+    cut = 0
+    for m in CLAUSE_BOUNDARY_RE.finditer(text, min_chars):
+        cut = m.end()
+    return cut
+
+
+class FirstChunkTimer:
+    """Per LLM response, the time from LLMFullResponseStartFrame until the first chunk reached TTS."""
+
+    def __init__(self):
+        self.latencies = []  # seconds, one per response
+        self._started_at = None
+
+    def response_started(self):
+        self._started_at = time.monotonic()
+
+    def reset(self):
+        self._started_at = None
+
+    def chunk_sent(self, text: str):
+        if self._started_at is None:
+            return
+        elapsed = time.monotonic() - self._started_at
+        self._started_at = None
+        self.latencies.append(elapsed)
+        logger.debug(f"✂️ First TTS chunk after {elapsed * 1000:.0f}ms: {text!r}")
+
+    def stats(self) -> dict:
+        lat = sorted(self.latencies)
+        if not lat:
+            return {"responses": 0}
+        return {
+            "responses": len(lat),
+            "first_chunk_avg_ms": round(sum(lat) / len(lat) * 1000, 1),
+            "first_chunk_p50_ms": round(lat[len(lat) // 2] * 1000, 1),
+            "first_chunk_max_ms": round(lat[-1] * 1000, 1),
+        }
+
+
+class TimedSentenceAggregator(SentenceAggregator):
+    """SentenceAggregator that records first-chunk latency like AdaptiveTextChunker."""
+
+    def __init__(self):
+        super().__init__()
+        self._timer = FirstChunkTimer()
+
+    def stats(self) -> dict:
+        return self._timer.stats()
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        if isinstance(frame, LLMFullResponseStartFrame):
+            self._timer.response_started()
+        elif isinstance(frame, InterruptionFrame):
+            self._timer.reset()
+        await super().process_frame(frame, direction)
+
+    async def push_frame(self, frame: Frame, direction: FrameDirection = FrameDirection.DOWNSTREAM):
+        if isinstance(frame, TextFrame) and direction == FrameDirection.DOWNSTREAM and frame.text.strip():
+            self._timer.chunk_sent(frame.text)
+        await super().push_frame(frame, direction)
+
+
+class AdaptiveTextChunker(FrameProcessor):
+    """Drop-in replacement for SentenceAggregator that flushes the first chunk early.
+
+    Records, per LLM response, how long after LLMFullResponseStartFrame the first
+    chunk reached TTS, so it can be compared with SentenceAggregator via `stats()`.
+    """
+
+    def __init__(self, min_first_chars: int = 24, max_first_chars: int = 120):
+        super().__init__()
+        self._min_first_chars = min_first_chars
+        self._max_first_chars = max_first_chars
+        self._aggregation = ""
+        self._first_chunk_sent = False
+        self._timer = FirstChunkTimer()
+
+    def stats(self) -> dict:
+        return self._timer.stats()
+
+    def _reset(self):
+        self._aggregation = ""
+        self._first_chunk_sent = False
+        self._timer.reset()
+
+    async def _push_chunk(self, text: str):
+        if not text.strip():
+            return
+        if not self._first_chunk_sent:
+            self._first_chunk_sent = True
+            self._timer.chunk_sent(text)
+        frame = TextFrame(text)
+        frame.includes_inter_frame_spaces = True
+        await self.push_frame(frame)
+
+    def _next_cut(self) -> int:
+        text = self._aggregation
+        end = match_endofsentence(text)
+        if end:
+            return end
+        if self._first_chunk_sent:
+            return 0
+        cut = find_clause_boundary(text, self._min_first_chars)
+        if not cut and len(text) >= self._max_first_chars:
+            # No punctuation yet in a long run-on: cut at the last space
+            cut = text.rfind(" ", self._min_first_chars) + 1
+        return cut
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if isinstance(frame, InterimTranscriptionFrame):
+            return
+
+        if isinstance(frame, TextFrame):
+            self._aggregation += frame.text
+            cut = self._next_cut()
+            while cut:
+                chunk, self._aggregation = self._aggregation[:cut], self._aggregation[cut:]
+                await self._push_chunk(chunk)
+                cut = self._next_cut()
+        elif isinstance(frame, LLMFullResponseStartFrame):
+            self._reset()
+            self._timer.response_started()
+            await self.push_frame(frame, direction)
+        elif isinstance(frame, (LLMFullResponseEndFrame, EndFrame)):
+            await self._push_chunk(self._aggregation)
+            self._reset()
+            await self.push_frame(frame, direction)
+        elif isinstance(frame, InterruptionFrame):
+            self._reset()
+            await self.push_frame(frame, direction)
+        else:
+            await self.push_frame(frame, direction)
@@ -0,0 +1,21 @@
+"""Token counting for prompt budgeting (tiktoken when available, else an estimate).
+
+tiktoken is the `tokens` extra: pip install ".[tokens]".
+"""
+
+from loguru import logger
+
+try:
+    import tiktoken
+
+    _encoding = tiktoken.get_encoding("o200k_base")  # gpt-4o family
+except Exception as e:  # tiktoken not installed or encoding unavailable offline
+    _encoding = None
+    logger.warning(f"🔢 tiktoken unavailable ({e}); estimating tokens at ~4 chars each — install the `tokens` extra")
+
+
+def count_tokens(text: str) -> int:
+    """Token count with the local tokenizer, or a ~4 chars/token estimate."""
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4